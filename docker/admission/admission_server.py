@@ -0,0 +1,191 @@
+"""
+Admission server that smooths load of scheduled downloads on Artifactory servers.
+
+Scheduled tasks of many workstations start in the same minute. Before a heavy download each client asks for a slot:
+1. POST /acquire with JSON {"client": "<id>", "server": "<Artifactory name>"} returns 200 with a token and a lease
+   time if a slot of the server is free, otherwise 429 with Retry-After header
+2. client renews the lease with POST /renew {"token": "<token>"} while download is running, expired leases are freed,
+   so crashed clients do not hold the slot forever
+3. POST /release {"token": "<token>"} frees the slot when download is completed
+
+Current slots are available at GET /status
+"""
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from threading import Lock
+
+SLOTS = int(os.environ.get("SLOTS_PER_SERVER", "20"))
+LEASE = int(os.environ.get("LEASE_SECONDS", "300"))
+RETRY_AFTER = int(os.environ.get("RETRY_AFTER_SECONDS", "60"))
+PORT = int(os.environ.get("PORT", "8080"))
+
+__version__ = "v1.0.0"
+
+
+class AdmissionController:
+    """
+    Counts leased download slots of each server
+    """
+
+    def __init__(self, slots, lease, retry_after):
+        """
+        Args:
+            slots: (int) number of concurrent downloads allowed for a single server
+            lease: (int) seconds after which slot is freed if client does not renew it
+            retry_after: (int) average number of seconds that rejected client waits before the next attempt
+        """
+        self.slots = slots
+        self.lease = lease
+        self.retry_after = retry_after
+        self.leases = {}
+        self.rejected = 0
+
+        self._lock = Lock()
+
+    def acquire(self, client, server):
+        """
+        Lease slot of the server to the client
+        Args:
+            client: (str) identifier of the client
+            server: (str) name of the server
+
+        Returns: (str) token of the lease or empty string if all slots are busy
+        """
+        with self._lock:
+            self.expire()
+            for token, lease in self.leases.items():
+                # repeated request of the same client, eg after lost response
+                if lease["client"] == client and lease["server"] == server:
+                    lease["expires"] = time.time() + self.lease
+                    return token
+
+            if sum(lease["server"] == server for lease in self.leases.values()) >= self.slots:
+                self.rejected += 1
+                return ""
+
+            token = uuid.uuid4().hex
+            self.leases[token] = {"client": client, "server": server, "expires": time.time() + self.lease}
+            return token
+
+    def renew(self, token):
+        """
+        Extend the lease
+        Args:
+            token: (str) token of the lease
+
+        Returns: (bool) True if lease is still active
+        """
+        with self._lock:
+            self.expire()
+            if token not in self.leases:
+                return False
+
+            self.leases[token]["expires"] = time.time() + self.lease
+            return True
+
+    def release(self, token):
+        """
+        Free the slot
+        Args:
+            token: (str) token of the lease
+
+        Returns: None
+        """
+        with self._lock:
+            self.leases.pop(token, None)
+
+    def expire(self):
+        """
+        Free slots of clients that did not renew the lease. Should be called with acquired lock
+        Returns: None
+        """
+        now = time.time()
+        for token in [token for token, lease in self.leases.items() if lease["expires"] < now]:
+            logging.info(f"Lease of {self.leases[token]['client']} expired")
+            del self.leases[token]
+
+    def get_retry_after(self):
+        """
+        Randomize time until the next attempt, so rejected clients do not come back at the same time
+        Returns: (int) number of seconds
+        """
+        return int(self.retry_after * random.uniform(0.5, 1.5))
+
+    def get_status(self):
+        with self._lock:
+            self.expire()
+            servers = {}
+            for lease in self.leases.values():
+                servers[lease["server"]] = servers.get(lease["server"], 0) + 1
+            return {"slots": self.slots, "active": servers, "rejected": self.rejected}
+
+
+class AdmissionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = f"DownloadAdmission/{__version__}"
+    controller = None
+
+    def do_GET(self):
+        if self.path == "/status":
+            self.send_json(200, self.controller.get_status())
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length)) if length else {}
+        except ValueError:
+            self.send_json(400, {"error": "Request must be JSON"})
+            return
+
+        if self.path == "/acquire":
+            token = self.controller.acquire(str(request.get("client", "")), str(request.get("server", "")))
+            if token:
+                self.send_json(200, {"token": token, "lease": self.controller.lease})
+            else:
+                retry_after = self.controller.get_retry_after()
+                self.send_json(429, {"retry_after": retry_after}, {"Retry-After": str(retry_after)})
+        elif self.path == "/renew":
+            if self.controller.renew(str(request.get("token", ""))):
+                self.send_json(200, {"lease": self.controller.lease})
+            else:
+                self.send_json(404, {"error": "Lease expired"})
+        elif self.path == "/release":
+            self.controller.release(str(request.get("token", "")))
+            self.send_json(200, {})
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} {format % args}")
+
+    def send_json(self, status, content, headers=None):
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    logging.basicConfig(stream=sys.stdout, format="%(asctime)s (%(levelname)s) %(message)s", level=logging.INFO)
+    AdmissionHandler.controller = AdmissionController(SLOTS, LEASE, RETRY_AFTER)
+    server = ThreadingHTTPServer(("", PORT), AdmissionHandler)
+    server.daemon_threads = True
+    logging.info(f"Admission server allows {SLOTS} downloads per server, listening on port {PORT}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,525 @@
+"""
+Site-local caching proxy for Artifactory.
+
+Proxy is added to the list of servers of the downloader like any other Artifactory. API requests are passed through
+to the upstream server, files are served from the local store:
+1. every request of a file is authorized by HEAD request to the upstream with credentials of the client, that also
+   returns checksum of the file that is used as a key in the store
+2. concurrent misses of the same file are coalesced into one upstream download, clients are served while the file is
+   being downloaded
+3. Range requests are served from the store, so the downloader can use several connections
+4. least recently used files are evicted when store exceeds its size limit
+
+New builds can be downloaded in advance via POST request to /_proxy/prefetch with JSON {"path": "<path of the file>"}
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from threading import Condition
+from threading import Lock
+from threading import Thread
+
+import requests
+
+UPSTREAM_URL = os.environ.get("UPSTREAM_URL", "http://ottvmartifact.win.ansys.com:8080").rstrip("/")
+CACHE_DIR = os.environ.get("CACHE_DIR", "/cache")
+CACHE_SIZE = int(os.environ.get("CACHE_SIZE_GB", "200")) * 1024**3
+PORT = int(os.environ.get("PORT", "8080"))
+
+TIMEOUT = 90
+READ_SIZE = 1024 * 1024
+# headers that must not be forwarded by a proxy
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+    "content-length",
+    "accept-encoding",
+}
+CHECKSUM_HEADERS = ["X-Checksum-Sha256", "X-Checksum-Sha1", "X-Checksum-Md5"]
+
+__version__ = "v1.0.0"
+
+
+class ProxyError(Exception):
+    pass
+
+
+class FileFill(Thread):
+    """
+    Downloads file from the upstream to the store. Clients read the file while it is downloaded
+    """
+
+    def __init__(self, store, key, url, headers, size, checksums):
+        """
+        Args:
+            store: (CacheStore) store of the proxy
+            key: (str) key of the file in the store
+            url: (str) URL of the file on the upstream
+            headers: (dict) headers of the client used to authorize on the upstream
+            size: (int) size of the file
+            checksums: (dict) checksum headers of the upstream
+        """
+        super().__init__(daemon=True)
+        self.store = store
+        self.key = key
+        self.url = url
+        self.headers = headers
+        self.size = size
+        self.checksums = checksums
+
+        self.path = store.part_path(key)
+        self.available = 0
+        self.error = None
+        self.done = False
+        self._progress = Condition()
+
+    def run(self):
+        try:
+            self.download()
+            self.store.complete(self)
+        except Exception as err:
+            logging.error(f"Failed to download {self.url}: {err}")
+            with self._progress:
+                self.error = err
+            # new clients must not join the fill once its file is removed
+            self.store.release(self)
+            if os.path.isfile(self.path):
+                os.remove(self.path)
+        finally:
+            with self._progress:
+                self.done = True
+                self._progress.notify_all()
+            self.store.release(self)
+
+    def download(self):
+        hasher = hashlib.sha256() if "X-Checksum-Sha256" in self.checksums else hashlib.sha1()
+        with requests.get(self.url, headers=self.headers, stream=True, timeout=TIMEOUT) as response:
+            response.raise_for_status()
+            with open(self.path, "wb") as file:
+                for data in response.iter_content(chunk_size=READ_SIZE):
+                    file.write(data)
+                    file.flush()
+                    hasher.update(data)
+                    with self._progress:
+                        self.available += len(data)
+                        self._progress.notify_all()
+
+        if self.available != self.size:
+            raise ProxyError(f"Only {self.available}/{self.size} bytes were downloaded")
+
+        expected = self.checksums.get("X-Checksum-Sha256") or self.checksums.get("X-Checksum-Sha1")
+        if expected and hasher.hexdigest() != expected.lower():
+            raise ProxyError("Checksum of downloaded file is different")
+
+    def wait_for(self, end):
+        """
+        Block until file is downloaded up to requested offset
+        Args:
+            end: (int) offset in the file, exclusive
+
+        Returns: (int) offset that is available
+        """
+        with self._progress:
+            while self.available < end and not self.done:
+                self._progress.wait(timeout=10)
+
+            if self.error is not None:
+                raise ProxyError(f"Upstream download failed: {self.error}")
+            return self.available
+
+
+class CacheStore:
+    """
+    Store of cached files. Completed files are named by their checksum, least recently used files are evicted when
+    size of the store exceeds the limit
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.partial_dir = os.path.join(cache_dir, "partial")
+        self.max_size = max_size
+        os.makedirs(self.objects_dir, exist_ok=True)
+        shutil.rmtree(self.partial_dir, ignore_errors=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+        self.fills = {}
+        self.statistics = {"hits": 0, "misses": 0, "coalesced": 0, "prefetched": 0, "bytes_served": 0}
+        self._lock = Lock()
+
+    def object_path(self, key):
+        return os.path.join(self.objects_dir, key)
+
+    def part_path(self, key):
+        return os.path.join(self.partial_dir, key)
+
+    def open(self, key, url, headers, size, checksums, prefetch=False):
+        """
+        Open cached file. If file is not in the store, start its download or join the running one
+        Args:
+            key: (str) key of the file in the store
+            url: (str) URL of the file on the upstream
+            headers: (dict) headers of the client used to authorize on the upstream
+            size: (int) size of the file
+            checksums: (dict) checksum headers of the upstream
+            prefetch: (bool) request is a prefetch, not a client download
+
+        Returns: (tuple) opened binary file and FileFill if file is still being downloaded, otherwise None
+        """
+        with self._lock:
+            fill = self.fills.get(key)
+            if fill is None and os.path.isfile(self.object_path(key)):
+                os.utime(self.object_path(key))
+                self.statistics["hits"] += 1
+                return open(self.object_path(key), "rb"), None
+
+            if fill is None:
+                fill = FileFill(self, key, url, headers, size, checksums)
+                self.fills[key] = fill
+                self.statistics["prefetched" if prefetch else "misses"] += 1
+                logging.info(f"Cache miss, download {url}")
+                open(fill.path, "wb").close()
+                fill.start()
+            else:
+                self.statistics["coalesced"] += 1
+
+            return open(fill.path, "rb"), fill
+
+    def complete(self, fill):
+        """
+        Move downloaded file to the store and evict least recently used files. Fill is removed in the same critical
+        section, so new clients either join the fill before the file is moved or open the completed file.
+        Clients that joined the fill keep reading the moved file through their handle
+        Args:
+            fill: (FileFill) completed download
+
+        Returns: None
+        """
+        with self._lock:
+            os.replace(fill.path, self.object_path(fill.key))
+            self.release_fill(fill)
+            self.evict()
+        logging.info(f"{fill.url} is cached as {fill.key}")
+
+    def add_served(self, size):
+        with self._lock:
+            self.statistics["bytes_served"] += size
+
+    def release(self, fill):
+        with self._lock:
+            self.release_fill(fill)
+
+    def release_fill(self, fill):
+        """
+        Forget the fill, new fill of the same key could be already running. Should be called with acquired lock
+        Args:
+            fill: (FileFill) download of the file
+
+        Returns: None
+        """
+        if self.fills.get(fill.key) is fill:
+            del self.fills[fill.key]
+
+    def evict(self):
+        files = [os.path.join(self.objects_dir, name) for name in os.listdir(self.objects_dir)]
+        files.sort(key=os.path.getmtime)
+        store_size = sum(os.path.getsize(file) for file in files)
+        for file in files:
+            if store_size <= self.max_size:
+                break
+
+            store_size -= os.path.getsize(file)
+            os.remove(file)
+            logging.info(f"{os.path.basename(file)} is evicted from the store")
+
+    def get_status(self):
+        with self._lock:
+            files = os.listdir(self.objects_dir)
+            status = dict(self.statistics)
+            status["files"] = len(files)
+            status["size"] = sum(os.path.getsize(self.object_path(name)) for name in files)
+            status["active_downloads"] = len(self.fills)
+        return status
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = f"ArtifactoryCachingProxy/{__version__}"
+    store = None
+
+    def do_GET(self):
+        if self.path == "/_proxy/status":
+            self.send_json(200, self.store.get_status())
+        elif "/api/" in self.path or "?" in self.path:
+            self.pass_through()
+        else:
+            self.serve_file()
+
+    def do_HEAD(self):
+        self.pass_through()
+
+    def do_POST(self):
+        if self.path == "/_proxy/prefetch":
+            self.prefetch()
+        else:
+            self.pass_through()
+
+    def do_PUT(self):
+        self.pass_through()
+
+    def do_DELETE(self):
+        self.pass_through()
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} {format % args}")
+
+    def client_headers(self):
+        return {key: value for key, value in self.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS | {"range"}}
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else None
+
+    def send_json(self, status, content):
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def pass_through(self):
+        """
+        Forward request to the upstream as is and stream response back to the client
+        """
+        headers = self.client_headers()
+        if "Range" in self.headers:
+            headers["Range"] = self.headers["Range"]
+
+        try:
+            response = requests.request(
+                self.command,
+                UPSTREAM_URL + self.path,
+                headers=headers,
+                data=self.read_body(),
+                stream=True,
+                allow_redirects=False,
+                timeout=TIMEOUT,
+            )
+        except requests.RequestException as err:
+            self.send_json(502, {"error": str(err)})
+            return
+
+        with response:
+            self.send_response(response.status_code)
+            for key, value in response.headers.items():
+                # Server and Date are set by the proxy itself
+                if key.lower() not in HOP_BY_HOP_HEADERS | {"server", "date"}:
+                    self.send_header(key, value)
+
+            if self.command == "HEAD":
+                if "Content-Length" in response.headers:
+                    self.send_header("Content-Length", response.headers["Content-Length"])
+                self.end_headers()
+                return
+
+            if response.status_code in (204, 304):
+                self.end_headers()
+                return
+
+            if response.status_code >= 300:
+                body = response.raw.read(decode_content=False)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for data in response.raw.stream(READ_SIZE, decode_content=False):
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    def authorize(self, path):
+        """
+        Authorize client on the upstream and get size and checksum of the file
+        Args:
+            path: (str) path of the file
+
+        Returns: (requests.Response) response of HEAD request or None if file cannot be cached
+        """
+        response = requests.head(UPSTREAM_URL + path, headers=self.client_headers(), timeout=TIMEOUT)
+        if response.status_code != 200 or "Content-Length" not in response.headers:
+            return None
+
+        if not any(header in response.headers for header in CHECKSUM_HEADERS):
+            # folders and generated content do not have a checksum
+            return None
+        return response
+
+    def serve_file(self):
+        """
+        Serve file or its range from the store
+        """
+        try:
+            head = self.authorize(self.path)
+        except requests.RequestException as err:
+            self.send_json(502, {"error": str(err)})
+            return
+
+        if head is None:
+            self.pass_through()
+            return
+
+        size = int(head.headers["Content-Length"])
+        start, end = parse_range(self.headers.get("Range", ""), size)
+        if start is None:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        checksums = {header: head.headers[header] for header in CHECKSUM_HEADERS if header in head.headers}
+        file, fill = self.store.open(
+            get_cache_key(checksums), UPSTREAM_URL + self.path, self.client_headers(), size, checksums
+        )
+        try:
+            self.send_file(file, fill, head, start, end)
+        except ProxyError as err:
+            # headers are already sent, client detects incomplete body and retries
+            logging.error(f"Failed to serve {self.path}: {err}")
+            self.close_connection = True
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        finally:
+            file.close()
+
+    def send_file(self, file, fill, head, start, end):
+        """
+        Send range of the file, waiting for the bytes that are not yet downloaded from the upstream
+        Args:
+            file: binary file opened in the store
+            fill: (FileFill) download of the file if file is not completed yet
+            head: (requests.Response) response of the upstream to HEAD request
+            start: (int) first byte of the range
+            end: (int) end of the range, exclusive
+
+        Returns: None
+        """
+        size = int(head.headers["Content-Length"])
+        self.send_response(206 if "Range" in self.headers else 200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Content-Type", head.headers.get("Content-Type", "application/octet-stream"))
+        if "Range" in self.headers:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        for header in ["ETag", "Last-Modified"] + CHECKSUM_HEADERS:
+            if header in head.headers:
+                self.send_header(header, head.headers[header])
+        self.end_headers()
+
+        position = start
+        while position < end:
+            available = fill.wait_for(min(position + READ_SIZE, end)) if fill is not None else end
+            # file is sent by the kernel (sendfile) without copying it to user space
+            sent = self.connection.sendfile(file, position, min(available, end) - position)
+            if not sent:
+                raise ProxyError(f"Cached file is truncated at {position}")
+            position += sent
+
+        self.store.add_served(end - start)
+
+    def prefetch(self):
+        """
+        Start download of the file to the store without serving it
+        """
+        try:
+            path = json.loads(self.read_body() or b"{}")["path"]
+        except (ValueError, KeyError):
+            self.send_json(400, {"error": "JSON with path of the file is expected"})
+            return
+
+        try:
+            head = self.authorize(path)
+        except requests.RequestException as err:
+            self.send_json(502, {"error": str(err)})
+            return
+
+        if head is None:
+            self.send_json(404, {"error": f"{path} cannot be cached"})
+            return
+
+        checksums = {header: head.headers[header] for header in CHECKSUM_HEADERS if header in head.headers}
+        file, _ = self.store.open(
+            get_cache_key(checksums),
+            UPSTREAM_URL + path,
+            self.client_headers(),
+            int(head.headers["Content-Length"]),
+            checksums,
+            prefetch=True,
+        )
+        file.close()
+        self.send_json(202, {"key": get_cache_key(checksums)})
+
+
+def parse_range(range_header, size):
+    """
+    Parse single byte range of Range header
+    Args:
+        range_header: (str) value of the header, eg bytes=0-1023
+        size: (int) size of the file
+
+    Returns: (tuple) start and exclusive end of the range, (None, None) if range is not satisfiable
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or not any(match.groups()):
+        return 0, size
+
+    first, last = match.groups()
+    if not first:
+        start, end = max(0, size - int(last)), size
+    else:
+        start, end = int(first), min(int(last) + 1, size) if last else size
+
+    if start >= end:
+        return None, None
+    return start, end
+
+
+def get_cache_key(checksums):
+    """
+    Get key of the file in the store from the strongest checksum provided by the upstream
+    Args:
+        checksums: (dict) checksum headers of the upstream
+
+    Returns: (str) key of the file
+    """
+    for header in CHECKSUM_HEADERS:
+        if header in checksums:
+            return f"{header.split('-')[-1].lower()}_{checksums[header].lower()}"
+
+
+def main():
+    logging.basicConfig(stream=sys.stdout, format="%(asctime)s (%(levelname)s) %(message)s", level=logging.INFO)
+    ProxyHandler.store = CacheStore(CACHE_DIR, CACHE_SIZE)
+    server = ThreadingHTTPServer(("", PORT), ProxyHandler)
+    server.daemon_threads = True
+    logging.info(f"Caching proxy of {UPSTREAM_URL} is listening on port {PORT}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,62 @@
 import argparse
+import bisect
+import ctypes
 import datetime
 import errno
+import fnmatch
+import hashlib
+import io
 import json
 import logging
 import os
+import platform
+import posixpath
 import random
 import re
 import shutil
+import socket
+import struct
 import subprocess
 import sys
+import tarfile
 import time
 import traceback
 import zipfile
 import zlib
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from contextlib import contextmanager
+from functools import partial
 from functools import wraps
+from http.client import HTTPException
+from queue import Queue
+from threading import Condition
+from threading import Event
+from threading import Lock
+from threading import Thread
 from types import SimpleNamespace
+from urllib.parse import quote
 
 import psutil
 import py7zr
+import requests
+from artifactory import ArtifactoryFileStat
 from artifactory import ArtifactoryPath
-from artifactory import md5sum
 from artifactory_du import artifactory_du
 from dohq_artifactory import ArtifactoryException
+from dohq_artifactory.exception import raise_for_status
 from influxdb import InfluxDBClient
 from office365.runtime.auth.authentication_context import AuthenticationContext
+from office365.runtime.auth.providers.acs_token_provider import ACSTokenProvider
+from office365.runtime.auth.token_response import TokenResponse
 from office365.runtime.client_request_exception import ClientRequestException
+from office365.runtime.http.request_options import RequestOptions
 from office365.sharepoint.client_context import ClientContext
+from pid import PidFile
+from pid import PidFileError
 from plyer import notification
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 from urllib3.exceptions import HTTPError
 
@@ -40,6 +70,72 @@ STATISTICS_SERVER = "OTTBLD02"
 STATISTICS_PORT = 8086
 
 TIMEOUT = 90
+DISCOVERY_CONCURRENCY = 16
+RANGE_READ_SIZE = 1024 * 1024
+STREAM_BUFFER_SIZE = 1024 * 1024
+STREAM_MEMORY_BUDGET = 64 * 1024 * 1024
+STREAM_READ_AHEAD = 8
+BANDWIDTH_RELOAD_PERIOD = 30
+BANDWIDTH_LOG_PERIOD = 60
+ADMISSION_TIMEOUT = 10
+ADMISSION_RETRY_AFTER = 60
+ADMISSION_MAX_WAIT = 2 * 60 * 60
+RANGE_RETRIES = 3
+RANGE_RETRY_DELAY = 5
+RANGE_TARGET_SECONDS = 20
+MIN_RANGE_SIZE = 8 * 1024 * 1024
+RETRY_AFTER_LIMIT = 60
+PARTIAL_MANIFEST_SUFFIX = ".part.json"
+DELTA_SEED_SUFFIX = ".seed"
+CHUNK_MANIFEST_SUFFIX = ".chunks.json"
+CHUNK_DIGEST_SIZE = 16 * 1024 * 1024
+DELTA_TAIL_SIZE = 1024 * 1024
+MIRRORS_FILE = "mirrors.json"
+MIRROR_PROBE_COUNT = 3
+MIRROR_PROBE_SIZE = 512 * 1024
+MIRROR_PING_TIMEOUT = 5
+MIRROR_RANKING_DECAY = 0.5
+METADATA_CACHE_FILE = "metadata_cache.json"
+# seconds during which cached metadata is used without request, after that it is revalidated with conditional request
+REPOSITORIES_TTL = 60 * 60
+BUILD_SEARCH_TTL = 5 * 60
+# folder could be listed while build is still being uploaded, so its listing is revalidated soon
+BUILD_FOLDER_TTL = 5 * 60
+BUILD_INFO_TTL = 7 * 24 * 60 * 60
+METADATA_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+PROCESS_LOCK_TIMEOUT = 30
+SLOW_SOURCE_RATIO = 0.25
+# product flags of Workbench installer, package of the product is stored in the folder named after the flag
+WB_PRODUCT_FLAGS = [
+    "-additive",
+    "-aqwa",
+    "-autodyn",
+    "-cfdpost",
+    "-cfx",
+    "-chemkinpro",
+    "-ansyscust",
+    "-discovery",
+    "-spaceclaim",
+    "-energico",
+    "-ensight",
+    "-fensapice",
+    "-fluent",
+    "-forte",
+    "-icemcfd",
+    "-lsdyna",
+    "-mechapdl",
+    "-mfl",
+    "-optislang",
+    "-polyflow",
+    "-reactionwb",
+    "-sherlock",
+    "-speos",
+    "-speoshpc",
+    "-turbogrid",
+    "-icepak",
+]
+UNPACK_WORKERS = min(16, 2 * (os.cpu_count() or 1))
+UNPACK_BUFFER_SIZE = 1024 * 1024
 
 ARTIFACTORY_DICT = {
     "Azure": "http://azwec7artsrv01.ansys.com:8080/artifactory",
@@ -61,13 +157,19 @@ ARTIFACTORY_DICT = {
 }
 
 SHAREPOINT_SITE_URL = r"https://ansys.sharepoint.com/sites/BetaDownloader"
+SHAREPOINT_CREDENTIALS_FILE = "sharepoint_credentials.bin"
+# token is renewed this number of seconds before it expires
+SHAREPOINT_TOKEN_MARGIN = 10 * 60
+# other run could wait for interactive web login
+SHAREPOINT_REFRESH_TIMEOUT = 5 * 60
+CRYPTPROTECT_UI_FORBIDDEN = 0x01
 
 
 class DownloaderError(Exception):
     pass
 
 
-def retry(exceptions, tries=4, delay=3, backoff=1, logger=None, proc_lock=False):
+def retry(exceptions, tries=4, delay=3, backoff=1, logger=None, proc_lock=False, failover=None):
     """
         Retry calling the decorated function using an exponential backoff.
 
@@ -78,6 +180,8 @@ def retry(exceptions, tries=4, delay=3, backoff=1, logger=None, proc_lock=False)
         backoff (int): backoff multiplier e.g. value of 2 will double the delay each retry
         logger (logging): logger to use. If None, print
         proc_lock (bool): if retry is applied to proc lock function
+        failover (str): name of the method that is called with the exception. If it returns True, function is
+            called again immediately without consuming an attempt, eg after switch to another server
 
     Returns: decorator
 
@@ -91,6 +195,9 @@ def retry(exceptions, tries=4, delay=3, backoff=1, logger=None, proc_lock=False)
                 try:
                     return func(self, *args, **kwargs)
                 except exceptions as e:
+                    if failover and getattr(self, failover)(e):
+                        continue
+
                     msg = f"{e}. Error occurred, attempt: {tries - mtries + 1}/{tries}"
 
                     if proc_lock:
@@ -161,12 +268,32 @@ class Downloader:
         self.product_version (str): version to use in env variables eg 202
         self.setup_exe (str): path to the setup.exe from downloaded and unpacked zip
         self.remote_build_date (str): build date that receive from SharePoint
+        self.remote_hashes (dict): MD5 and SHA256 of the build archive stored in SharePoint list
+        self.file_hashes (dict): MD5 and SHA256 of the downloaded archive calculated during download
+        self.build_cache (BuildCache): local cache of downloaded archives, None if cache is disabled
+        self.mirror (str): name of Artifactory server that is used for download
+        self.mirror_queue (list): names of healthy Artifactory mirrors to fail over to in auto mode, best first
+        self.mirror_paths (dict): URL to the build on each probed mirror
+        self.build_stats (dict): size and checksums of build archives received from AQL search, keys are URLs
+        self.metadata_cache (MetadataCache): Artifactory metadata persisted between runs
+        self.connection_pool (ConnectionPool): keep-alive HTTP connections shared by all requests of the run
+        self.credential_cache (CredentialCache): SharePoint app credentials and token protected for the current user
+        self.servers (dict): Artifactory servers from ARTIFACTORY_DICT and custom servers from settings
+        self.rate_limiter (BandwidthLimiter): limiter of transfer rate shared by all connections of the process
+        self.scheduled_run (bool): True if run is started by the scheduled task, start of the run is randomly delayed
+        self.check_paths (list): settings files of products to check for updates without installation
+        self.report_file (str): file where JSON report of the update check is written
+        self.record_history (bool): write progress to the installation history, disabled for update check
+        self.stream_extractor (StreamingExtractor): thread that unpacks archive during download
+        self.archive_unpacked (bool): True if archive was already unpacked during download
         self.hash (str): hash code used for this run of the program
         self.pid: pid (process ID of the current Python run, required to allow kill in UI)
         self.ctx: context object to authorize in SharePoint using office365 module
+        self.sharepoint_token_renewed (bool): True if token rejected by SharePoint was already renewed in this run
         self.settings_folder (str): default folder where all configurations would be saved
         self.history_file (str): file where installation progress would be written (this file is tracked by UI)
         self.history (dict): dict with history of installation processes
+        self.history_lock (Lock): serializes writes of the history from concurrent phases of the run
         self.logging_file (str): file where detailed log for all runs is saved
 
         """
@@ -178,9 +305,23 @@ class Downloader:
         self.product_version = ""
         self.setup_exe = ""
         self.remote_build_date = ""
+        self.remote_hashes = {}
+        self.file_hashes = {}
+        self.build_cache = None
+        self.mirror = ""
+        self.mirror_queue = []
+        self.mirror_paths = {}
+        self.build_stats = {}
+        self.stream_extractor = None
+        self.archive_unpacked = False
+        self.scheduled_run = False
+        self.check_paths = []
+        self.report_file = ""
+        self.record_history = True
 
         self.pid = str(os.getpid())
         self.ctx = None
+        self.sharepoint_token_renewed = False
         self.warnings_list = []
 
         self.hash = generate_hash_str()
@@ -192,10 +333,13 @@ class Downloader:
         self.check_and_make_directories(self.settings_folder)
 
         self.history = {}
+        self.history_lock = Lock()
         self.history_file = os.path.join(self.settings_folder, "installation_history.json")
         self.get_installation_history()
 
         self.logging_file = os.path.join(self.settings_folder, "downloader.log")
+        self.metadata_cache = MetadataCache(os.path.join(self.settings_folder, METADATA_CACHE_FILE))
+        self.credential_cache = CredentialCache(os.path.join(self.settings_folder, SHAREPOINT_CREDENTIALS_FILE))
 
         self.settings_path = settings_path if settings_path else self.parse_args(version)
         with open(self.settings_path, "r") as file:
@@ -218,6 +362,59 @@ class Downloader:
             # v3.0.0
             self.settings.wb_assoc = ""
 
+        if not hasattr(self.settings, "max_connections"):
+            # v3.1.0
+            self.settings.max_connections = 4
+
+        if not hasattr(self.settings, "stream_unpack"):
+            # v3.1.0
+            self.settings.stream_unpack = True
+
+        if not hasattr(self.settings, "build_cache_size"):
+            # v3.1.0
+            self.settings.build_cache_size = 0
+
+        if not hasattr(self.settings, "delta_download"):
+            # v3.1.0
+            self.settings.delta_download = True
+
+        if not hasattr(self.settings, "max_sources"):
+            # v3.1.0
+            self.settings.max_sources = 3
+
+        if not hasattr(self.settings, "servers"):
+            # v3.1.0
+            self.settings.servers = SimpleNamespace()
+
+        if not hasattr(self.settings, "tree_download"):
+            # v3.1.0
+            self.settings.tree_download = False
+
+        if not hasattr(self.settings, "bandwidth_profiles"):
+            # v3.1.0
+            self.settings.bandwidth_profiles = []
+
+        if not hasattr(self.settings, "start_jitter"):
+            # v3.1.0
+            self.settings.start_jitter = 15
+
+        if not hasattr(self.settings, "http_pool_size"):
+            # v3.1.0
+            self.settings.http_pool_size = 16
+
+        if not hasattr(self.settings, "http_timeout"):
+            # v3.1.0
+            self.settings.http_timeout = TIMEOUT
+
+        if not hasattr(self.settings, "admission_url"):
+            # v3.1.0
+            self.settings.admission_url = ""
+
+        # custom servers, eg site-local caching proxy, are used the same way as Artifactory servers
+        self.servers = dict(ARTIFACTORY_DICT, **vars(self.settings.servers))
+        self.rate_limiter = BandwidthLimiter(self.load_bandwidth_profiles)
+        self.connection_pool = ConnectionPool(self.settings.http_pool_size)
+
         if "ElectronicsDesktop" in self.settings.version:
             self.product_version = self.settings.version[1:4]
             if float(self.product_version) >= 221:
@@ -240,15 +437,137 @@ class Downloader:
                 self.settings.install_path, "ANSYS Inc", "Shared Files", "Licensing", "tools", "lmcenter"
             )
 
+    def load_bandwidth_profiles(self):
+        """
+        Read bandwidth profiles from the settings file. File is read again during transfer, so limits could be
+        changed without restart of the download
+        Returns: (list) profiles with start and end time of the day (HH:MM) and rate limit in Mbit/s
+        """
+        try:
+            with open(self.settings_path) as file:
+                return json.load(file).get("bandwidth_profiles", [])
+        except (OSError, ValueError):
+            return [vars(profile) for profile in self.settings.bandwidth_profiles]
+
     def authorize_sharepoint(self):
         """
-        Function that uses PnP to authorize user in SharePoint using Windows account and to get actual client_id and
-        client_secret
+        Authorize in SharePoint with app credentials. Credentials and token are taken from the credential cache,
+        PowerShell is invoked only if cache is missing or credentials are rejected
         Returns: ctx: authorization context for Office365 library
 
         """
         self.update_installation_history(status="In-Progress", details="Authorizing in SharePoint")
 
+        credentials = self.credential_cache.load()
+        token = self.get_sharepoint_token(credentials)
+        if token is None:
+            credentials = self.refresh_sharepoint_credentials(credentials)
+            token = self.get_sharepoint_token(credentials)
+            if token is None:
+                raise DownloaderError("SharePoint rejected authentication tokens")
+
+        context_auth = AuthenticationContext(url=SHAREPOINT_SITE_URL)
+        context_auth.register_provider(lambda: token)
+
+        ctx = ClientContext(SHAREPOINT_SITE_URL, context_auth)
+        return ctx
+
+    def get_sharepoint_token(self, credentials):
+        """
+        Get app only access token for SharePoint. Cached token is used until it expires, new token is saved to the
+        credential cache
+        Args:
+            credentials: (dict) client_id, client_secret and token of the app
+
+        Returns: (TokenResponse) token or None if credentials are missing or rejected
+        """
+        if not credentials:
+            return None
+
+        token = credentials.get("token", {})
+        try:
+            if float(token.get("expiresOn", 0)) > time.time() + SHAREPOINT_TOKEN_MARGIN:
+                return TokenResponse(**token)
+        except ValueError:
+            pass
+
+        provider = ACSTokenProvider(SHAREPOINT_SITE_URL, credentials["client_id"], credentials["client_secret"])
+        try:
+            token = provider.get_app_only_access_token()
+        except (RequestException, AttributeError) as err:
+            # provider fails on errors without response, eg connection error or timeout
+            raise DownloaderError(f"Cannot connect to SharePoint authentication service: {err.__context__ or err}")
+        except ValueError as err:
+            response = getattr(err.__context__, "response", None)
+            if response is None or response.status_code >= 500:
+                raise DownloaderError(f"SharePoint authentication service is not available: {err}")
+
+            logging.warning(f"SharePoint rejected app credentials: {err}")
+            return None
+
+        credentials["token"] = vars(token)
+        self.credential_cache.save(credentials)
+        return token
+
+    def renew_sharepoint_token(self, error):
+        """
+        SharePoint may revoke token before it expires. If request is rejected, token is removed from the credential
+        cache and client is authorized again. Token is renewed only once per run
+        Args:
+            error: (Exception) error raised by SharePoint request
+
+        Returns: (bool) True if request could be repeated with the new token
+        """
+        response = getattr(error, "response", None)
+        if response is None or response.status_code not in (401, 403) or self.sharepoint_token_renewed:
+            return False
+
+        logging.warning(f"SharePoint rejected access token: {error}. Renew token")
+        self.sharepoint_token_renewed = True
+        credentials = self.credential_cache.load()
+        if credentials.pop("token", None) is not None:
+            self.credential_cache.save(credentials)
+
+        self.ctx = self.authorize_sharepoint()
+        return True
+
+    def refresh_sharepoint_credentials(self, rejected):
+        """
+        Get new app credentials from SharePoint and save them to the credential cache. Only one run refreshes
+        credentials at a time, concurrent runs wait and use credentials saved by it
+        Args:
+            rejected: (dict) credentials from the cache that are missing or rejected
+
+        Returns: (dict) client_id and client_secret of the app
+        """
+        deadline = time.time() + SHAREPOINT_REFRESH_TIMEOUT
+        while True:
+            try:
+                with PidFile(
+                    "sharepoint_credentials",
+                    piddir=os.path.dirname(self.credential_cache.cache_file),
+                    register_term_signal_handler=False,
+                    register_atexit=False,
+                ):
+                    credentials = self.credential_cache.load()
+                    if credentials.get("client_secret", "") != rejected.get("client_secret", ""):
+                        logging.info("SharePoint credentials are refreshed by another run")
+                        return credentials
+
+                    credentials = self.get_sharepoint_secrets()
+                    self.credential_cache.save(credentials)
+                    return credentials
+            except PidFileError:
+                if time.time() > deadline:
+                    raise DownloaderError("Cannot retrieve authentication tokens for SharePoint, another run is stuck")
+                time.sleep(1)
+
+    def get_sharepoint_secrets(self):
+        """
+        Function that uses PnP to authorize user in SharePoint using Windows account and to get actual client_id and
+        client_secret
+        Returns: (dict) client_id and client_secret of the app
+        """
         command = "powershell.exe "
         command += "Connect-PnPOnline -Url https://ansys.sharepoint.com/sites/BetaDownloader -UseWebLogin;"
         command += '(Get-PnPListItem -List secret_list -Fields "Title","client_id","client_secret").FieldValues'
@@ -267,50 +586,68 @@ class Downloader:
         except NameError:
             raise DownloaderError("Cannot retrieve authentication tokens for SharePoint")
 
-        secret_list.sort(key=lambda elem: elem["Title"], reverse=True)
-
-        context_auth = AuthenticationContext(url=SHAREPOINT_SITE_URL)
-        context_auth.acquire_token_for_app(
-            client_id=secret_list[0]["client_id"], client_secret=secret_list[0]["client_secret"]
-        )
+        if not secret_list:
+            raise DownloaderError("Cannot retrieve authentication tokens for SharePoint")
 
-        ctx = ClientContext(SHAREPOINT_SITE_URL, context_auth)
-        return ctx
+        secret_list.sort(key=lambda elem: elem["Title"], reverse=True)
+        return {"client_id": secret_list[0]["client_id"], "client_secret": secret_list[0]["client_secret"]}
 
     def run(self):
         """
-        Function that executes the download-installation process
+        Function that executes the download-installation process.
+        Only the checks before download run concurrently: free space is checked during the start jitter, while the
+        process scan and directory checks run next to each other. Everything from download onward (download, process
+        recheck, installation, statistics) is sequential
         :return: None
         """
         try:
             set_logger(self.logging_file)
             logging.info(f"Settings path is set to {self.settings_path}")
 
-            if self.settings.artifactory == "SharePoint":
-                self.ctx = self.authorize_sharepoint()
-
             self.update_installation_history(status="In-Progress", details="Verifying configuration")
-            self.check_and_make_directories(self.settings.install_path, self.settings.download_path)
             if "ElectronicsDesktop" in self.settings.version or "Workbench" in self.settings.version:
                 space_required = 15
-
-                # License Manager can be updated even if running
-                self.check_process_lock()
+                check_installation = self.check_process_lock
             else:
-                if not self.settings.license_file:
-                    raise DownloaderError("No license file defined. Please select it in Advanced Settings")
-
-                if not os.path.isfile(self.settings.license_file):
-                    raise DownloaderError(f"No license file was detected under {self.settings.license_file}")
-
+                # License Manager can be updated even if running
                 space_required = 1
+                check_installation = self.check_license_file
+
+            # checks before download run as phases, independent phases overlap. All server requests wait for the
+            # start jitter, so scheduled machines do not hit SharePoint and Artifactory at once.
+            # Download, installation and statistics below stay sequential: previous build is uninstalled only after the
+            # new one is unpacked, and failed statistics upload must be in the warnings of the Success entry
+            run_phases(
+                {
+                    "authorize": (self.authorize, ["wait_start_jitter"]),
+                    "check_installation": (check_installation, []),
+                    "make_directories": (
+                        partial(
+                            self.check_and_make_directories, self.settings.install_path, self.settings.download_path
+                        ),
+                        [],
+                    ),
+                    "check_download_space": (
+                        partial(self.check_free_space, self.settings.download_path, space_required),
+                        ["make_directories"],
+                    ),
+                    "check_install_space": (
+                        partial(self.check_free_space, self.settings.install_path, space_required),
+                        ["make_directories"],
+                    ),
+                    "wait_start_jitter": (self.wait_start_jitter, ["check_installation", "make_directories"]),
+                    "get_build_link": (self.get_build_link, ["authorize"]),
+                }
+            )
 
-            self.check_free_space(self.settings.download_path, space_required)
-            self.check_free_space(self.settings.install_path, space_required)
-
-            self.get_build_link()
             if self.settings.force_install or self.newer_version_exists:
-                self.download_file()
+                with AdmissionSlot(
+                    self.settings.admission_url,
+                    f"{platform.node()}_{self.settings.version}",
+                    self.mirror or self.settings.artifactory,
+                    status_func=lambda msg: self.update_installation_history(status="In-Progress", details=msg),
+                ):
+                    self.download_file(stream_unpack=self.settings.stream_unpack)
 
                 if "ElectronicsDesktop" in self.settings.version or "Workbench" in self.settings.version:
                     self.check_process_lock()  # download can take time, better to recheck again
@@ -331,8 +668,49 @@ class Downloader:
             logging.error(traceback.format_exc())
             self.update_installation_history(status="Failed", details="Unexpected error, see logs")
             self.send_statistics(error=traceback.format_exc())
+        finally:
+            self.metadata_cache.save()
+            requests_count, connections = self.connection_pool.statistics()
+            logging.info(
+                f"HTTP requests: {requests_count}, opened connections: {connections}, "
+                f"reused connections: {max(requests_count - connections, 0)}"
+            )
         self.clean_temp()
 
+    def authorize(self):
+        """
+        Authorize on the server if it requires client context (SharePoint)
+        Returns: None
+        """
+        if self.settings.artifactory == "SharePoint":
+            self.ctx = self.authorize_sharepoint()
+
+    def check_license_file(self):
+        """
+        Verify that license file required for License Manager installation is selected and exists
+        Returns: None
+        """
+        if not self.settings.license_file:
+            raise DownloaderError("No license file defined. Please select it in Advanced Settings")
+
+        if not os.path.isfile(self.settings.license_file):
+            raise DownloaderError(f"No license file was detected under {self.settings.license_file}")
+
+    def wait_start_jitter(self):
+        """
+        Delay scheduled run by random time, so scheduled tasks of many machines that are set to the same time do not
+        hit the servers at once
+        Returns: None
+        """
+        if not self.scheduled_run or not self.settings.start_jitter:
+            return
+
+        delay = random.uniform(0, self.settings.start_jitter * 60)
+        msg = f"Start is delayed by {int(delay / 60)} min to spread load on servers"
+        logging.info(msg)
+        self.update_installation_history(status="In-Progress", details=msg)
+        time.sleep(delay)
+
     @staticmethod
     def check_and_make_directories(*paths):
         """
@@ -394,35 +772,119 @@ class Downloader:
         Returns:
             (bool) True if remote is newer or no version is installed, False if remote is the same or older
         """
+        if "LicenseManager" in self.settings.version:
+            # always update LM
+            return True
+
+        installed_product_version = self.get_installed_build_date()
+        if not installed_product_version:
+            return True
+
+        return build_is_newer(self.get_new_build_date(), installed_product_version)
+
+    def get_installed_build_date(self):
+        """
+        Get build date of the installed product
+        Returns: (int) build date or 0 if product is not installed or build date cannot be parsed
+        """
         if "Workbench" in self.settings.version:
             product_installed = os.path.join(self.product_root_path, "package.id")
         elif "LicenseManager" in self.settings.version:
-            # always update LM
-            return True
+            try:
+                return self.get_license_manager_build_date()
+            except DownloaderError:
+                return 0
         else:
             product_installed = self.installed_product_info
 
-        if os.path.isfile(product_installed):
-            if "Workbench" in self.settings.version:
-                with open(product_installed) as file:
-                    installed_product_version = next(file).rstrip().split()[-1]  # get first line
-                    try:
-                        installed_product_version = int(installed_product_version.split("P")[0])
-                    except ValueError:
-                        installed_product_version = 0
-            else:
-                installed_product_version = self.get_edt_build_date(product_installed)
+        if not os.path.isfile(product_installed):
+            return 0
 
-            logging.info(f"Installed version of {self.settings.version} is {installed_product_version}")
-            new_product_version = self.get_new_build_date()
+        if "Workbench" in self.settings.version:
+            with open(product_installed) as file:
+                installed_product_version = next(file).rstrip().split()[-1]  # get first line
+                try:
+                    installed_product_version = int(installed_product_version.split("P")[0])
+                except ValueError:
+                    installed_product_version = 0
+        else:
+            installed_product_version = self.get_edt_build_date(product_installed)
 
-            if not all([new_product_version, installed_product_version]):
-                # some of the versions could not be parsed, need installation
-                return True
+        logging.info(f"Installed version of {self.settings.version} is {installed_product_version}")
+        return installed_product_version
 
-            if new_product_version <= installed_product_version:
-                return False
-        return True
+    def check_updates(self):
+        """
+        Check for updates of products from all settings files in self.check_paths in one concurrent pass, nothing is
+        downloaded or installed. Connection pool and caches are shared between products, SharePoint credentials are
+        refreshed at most once. Report with installed and remote build dates is printed and written to
+        self.report_file
+        Returns: (dict) report
+        """
+        set_logger(self.logging_file)
+        self.record_history = False
+        reports = {}
+        checkers = []
+        for settings_path in self.check_paths:
+            try:
+                checker = Downloader(__version__, settings_folder=self.settings_folder, settings_path=settings_path)
+                checker.record_history = False
+                checker.connection_pool = self.connection_pool
+                checker.metadata_cache = self.metadata_cache
+                checker.credential_cache = self.credential_cache
+                if checker.settings.artifactory == "SharePoint":
+                    # products are authorized one after another, next ones use cached credentials and token
+                    checker.ctx = checker.authorize_sharepoint()
+            except Exception as err:
+                reports[settings_path] = {"settings": settings_path, "error": str(err) or repr(err)}
+                continue
+            checkers.append(checker)
+
+        for checker, report in zip(checkers, run_concurrently([checker.check_update for checker in checkers])):
+            reports[checker.settings_path] = report
+        self.metadata_cache.save()
+
+        report = {
+            "checked": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "products": [reports[settings_path] for settings_path in self.check_paths],
+        }
+        print(json.dumps(report, indent=4))
+        if self.report_file:
+            temp_file = f"{self.report_file}.{os.getpid()}.tmp"
+            with open(temp_file, "w") as file:
+                json.dump(report, file, indent=4)
+            os.replace(temp_file, self.report_file)
+        return report
+
+    def check_update(self):
+        """
+        Find the latest build of the product and compare it with installed build
+        Returns: (dict) report of the product, error is reported instead of raising it
+        """
+        report = {
+            "settings": self.settings_path,
+            "version": self.settings.version,
+            "server": self.settings.artifactory,
+            "installed": 0,
+            "remote": 0,
+            "update": False,
+            "error": "",
+        }
+        try:
+            self.get_build_link()
+            report["server"] = self.mirror or self.settings.artifactory
+            report["installed"] = self.get_installed_build_date()
+            report["remote"] = self.get_new_build_date()
+        except Exception as err:
+            # other products are still checked
+            logging.error(f"Update check of {self.settings_path} failed: {err}")
+            report["error"] = str(err) or repr(err)
+            return report
+
+        report["update"] = "LicenseManager" in self.settings.version or build_is_newer(
+            report["remote"], report["installed"]
+        )
+        return report
 
     def get_new_build_date(self, distribution="winx64"):
         """
@@ -464,119 +926,417 @@ class Downloader:
             self.get_sharepoint_build_info()
             return
 
-        if not hasattr(self.settings.password, self.settings.artifactory):
-            raise DownloaderError(f"Please provide password for {self.settings.artifactory}")
+        if self.settings.artifactory == "auto":
+            self.select_mirror(distribution)
+            return
+
+        self.mirror = self.settings.artifactory
+        self.build_artifactory_path = self.find_artifactory_build(self.settings.artifactory, distribution)
+
+    def find_artifactory_build(self, server_name, distribution="winx64"):
+        """
+        Get the list of folders with builds on Artifactory server and find the latest build of requested version
+        Args:
+            server_name: (str) name of the server from self.servers
+            distribution: (str) winx64 or linx64
+
+        Returns: (ArtifactoryPath) URL to the latest build
+        """
+        if not hasattr(self.settings.password, server_name):
+            raise DownloaderError(f"Please provide password for {server_name}")
 
-        password = getattr(self.settings.password, self.settings.artifactory)
+        password = getattr(self.settings.password, server_name)
 
         if not self.settings.username or not password:
             raise DownloaderError("Please provide username and artifactory password")
 
-        server = ARTIFACTORY_DICT[self.settings.artifactory]
+        server = self.servers[server_name]
 
-        art_path = ArtifactoryPath(server, auth=(self.settings.username, password), timeout=TIMEOUT)
+        auth = (self.settings.username, password)
+        art_path = ArtifactoryPath(
+            server, auth=auth, timeout=self.settings.http_timeout, session=self.connection_pool.session(auth)
+        )
         try:
-            repos_list = art_path.get_repositories(lazy=True)
+            repos_list = json.loads(
+                self.metadata_cache.fetch(
+                    art_path.session,
+                    f"{server.rstrip('/')}/api/repositories",
+                    REPOSITORIES_TTL,
+                    timeout=self.settings.http_timeout,
+                )
+            )
         except ArtifactoryException as err:
             raise DownloaderError(f"Cannot retrieve repositories. Error: {err}")
 
-        # fill the dictionary with Electronics Desktop and Workbench keys since builds could be different
-        # still parse the list because of different names on servers
-        artifacts_dict = {}
-        for repo in repos_list:
-            repo_name = repo.name
-            if "EBU_Certified" in repo_name:
-                version = repo_name.split("_")[0] + "_ElectronicsDesktop"
-            elif "Certified" in repo_name and "Licensing" not in repo_name:
-                version = repo_name.split("_")[0] + "_Workbench"
-            elif "Certified" in repo_name and "Licensing" in repo_name:
-                version = repo_name.split("_")[0] + "_LicenseManager"
-            else:
-                continue
-
-            if version not in artifacts_dict:
-                # extract real repo name in case it is cached
-                if art_path.joinpath(repo_name).exists():
-                    # repo might be syncing (happens on new release addition)
-                    artifacts_dict[version] = art_path.joinpath(repo_name).stat().repo
-
-        try:
-            repo = artifacts_dict[self.settings.version]
-        except KeyError:
+        # names of repositories differ between servers, still parse the list. Metadata of all repositories of the
+        # version is requested concurrently, the first one in the list that exists is used
+        version_repos = [repo["key"] for repo in repos_list if get_repo_version(repo["key"]) == self.settings.version]
+        if version_repos:
+            try:
+                path = self.resolve_artifactory_build(art_path, version_repos, distribution)
+            except ArtifactoryException as err:
+                logging.info(f"AQL search is not available on {server_name}, list folders instead. Error: {err}")
+                path = None
+
+            if path:
+                return path
+
+        # repository might be syncing (happens on new release addition)
+        repo_infos = [
+            (name, info)
+            for name, info in zip(
+                version_repos,
+                run_concurrently([partial(self.get_storage_info, art_path, name, ttl=0) for name in version_repos]),
+            )
+            if info
+        ]
+        if not repo_infos:
             raise DownloaderError(
-                f"Version {self.settings.version} that you have specified "
-                + f"does not exist on {self.settings.artifactory}"
+                f"Version {self.settings.version} that you have specified does not exist on {server_name}"
             )
 
         path = ""
-        art_path = art_path.joinpath(str(repo))
+        repo_name, repo_info = repo_infos[0]
+        real_repo = repo_info["repo"]
         if "ElectronicsDesktop" in self.settings.version:
             archive = "winx64.zip" if distribution == "winx64" else "linx64.tgz"
-            builds_dates = []
-            for relative_p in art_path:
-                try:
-                    archive_exists = list(relative_p.glob(f"Electronics*{archive}"))
-                    if archive_exists:
-                        builds_dates.append(int(relative_p.name))
-                except ValueError:
-                    pass
-
-            if not builds_dates:
+            if real_repo != repo_name:
+                # remote repository lists content of the remote server, only cached builds could be downloaded
+                repo_info = self.get_storage_info(art_path, real_repo, ttl=0) or {}
+            build_folders = [
+                child["uri"].strip("/")
+                for child in repo_info.get("children", [])
+                if child["folder"] and child["uri"].strip("/").isdigit()
+            ]
+            # content of all build folders is listed concurrently instead of one request after another
+            folder_infos = run_concurrently(
+                [
+                    partial(self.get_storage_info, art_path, f"{real_repo}/{folder}", ttl=BUILD_FOLDER_TTL)
+                    for folder in build_folders
+                ]
+            )
+            builds = {
+                int(folder): children
+                for folder, children in zip(
+                    build_folders,
+                    [[child["uri"].strip("/") for child in (info or {}).get("children", [])] for info in folder_infos],
+                )
+                if any(fnmatch.fnmatchcase(child, f"Electronics*{archive}") for child in children)
+            }
+            if not builds:
                 raise DownloaderError("Artifact does not exist")
 
-            latest_build = sorted(builds_dates)[-1]
-
-            art_path = art_path.joinpath(str(latest_build))
-            for path in art_path:
-                if archive in path.name:
+            latest_build = max(builds)
+            for name in builds[latest_build]:
+                if archive in name:
+                    path = art_path.joinpath(real_repo, str(latest_build), name)
                     break
             else:
                 raise DownloaderError(f"Cannot find {distribution} archive file")
 
         elif "Workbench" in self.settings.version or "LicenseManager" in self.settings.version:
-            path = art_path.joinpath(distribution)
+            path = art_path.joinpath(real_repo, distribution)
 
         if not path:
             raise DownloaderError("Cannot receive URL")
 
-        self.build_artifactory_path = path
+        return path
 
-    def get_sharepoint_build_info(self):
+    def resolve_artifactory_build(self, art_path, repos, distribution="winx64"):
         """
-        Gets link to the latest build from SharePoint and builddate itself
+        Find the latest build with a single AQL query instead of listing repositories and build folders one by one.
+        Size and checksums of the archive come in the same response and are kept in self.build_stats
+        Args:
+            art_path: (ArtifactoryPath) URL to the server
+            repos: (list) names of repositories that hold the version, the first one has priority
+            distribution: (str) winx64 or linx64
+
+        Returns: (ArtifactoryPath) URL to the latest build or None if build is not found
+        """
+        if "ElectronicsDesktop" in self.settings.version:
+            archive = "winx64.zip" if distribution == "winx64" else "linx64.tgz"
+            criteria = {"type": "file", "name": {"$match": f"Electronics*{archive}"}}
+        else:
+            criteria = {"type": "folder", "path": ".", "name": distribution}
+
+        # content of remote repositories is stored in their cache
+        repo_priority = {}
+        for index, repo in enumerate(repos):
+            repo_priority.setdefault(repo, index)
+            repo_priority.setdefault(f"{repo}-cache", index)
+        criteria["$or"] = [{"repo": name} for name in repo_priority]
+
+        query = ["items.find", criteria, ".include", ["repo", "path", "name", "size", "actual_md5", "sha256"]]
+        cache_key = f"{art_path.drive.rstrip('/')}/api/search/aql {art_path.create_aql_text(*query)}"
+        items = self.metadata_cache.get(cache_key, BUILD_SEARCH_TTL)
+        if items is None:
+            items = art_path.aql(*query)
+            self.metadata_cache.store(cache_key, items)
+
+        if "ElectronicsDesktop" in self.settings.version:
+            # archive must lie directly in the folder named by build date
+            items = [item for item in items if item["path"].isdigit()]
+
+        if not items:
+            return None
+
+        # the first repository that holds the build is used, then the latest build in it
+        item = min(items, key=lambda elem: (repo_priority[elem["repo"]], -int(elem["path"].strip(".") or 0)))
+        if item["path"] == ".":
+            return art_path.joinpath(item["repo"], item["name"])
+
+        path = art_path.joinpath(item["repo"], item["path"], item["name"])
+        self.build_stats[str(path)] = ArtifactoryFileStat(
+            ctime=None,
+            mtime=None,
+            created_by=None,
+            modified_by=None,
+            mime_type=None,
+            size=item["size"],
+            sha1=None,
+            sha256=item.get("sha256"),
+            md5=item.get("actual_md5"),
+            is_dir=False,
+            children=[],
+            repo=item["repo"],
+        )
+        return path
+
+    def get_storage_info(self, art_path, relative_path, ttl):
+        """
+        Get info about folder from Artifactory storage API through metadata cache: real name of the repository
+        (remote repositories are cached under a different name) and children of the folder
+        Args:
+            art_path: (ArtifactoryPath) URL to the server
+            relative_path: (str) path to the folder on the server, starting with repository
+            ttl: (int) seconds during which cached info is used without revalidation
+
+        Returns: (dict) info about folder or None if folder does not exist
+        """
+        content = self.metadata_cache.fetch(
+            art_path.session,
+            f"{art_path.drive.rstrip('/')}/api/storage/{relative_path}",
+            ttl,
+            missing_ok=True,
+            timeout=self.settings.http_timeout,
+        )
+        return json.loads(content) if content is not None else None
+
+    def get_build_stats(self, path):
+        """
+        Get size and checksums of the build archive. Stats received from AQL search are used if available, otherwise
+        they are requested from the server
+        Args:
+            path: (ArtifactoryPath) URL to the archive
+
+        Returns: (ArtifactoryFileStat) stats of the archive
+        """
+        stats = self.build_stats.get(str(path))
+        return stats if stats is not None else path.stat()
+
+    def select_mirror(self, distribution="winx64"):
+        """
+        Select the fastest healthy Artifactory mirror that holds the latest build. All mirrors with provided password
+        are pinged concurrently, then the best of them according to persisted ranking and latency are searched for
+        the build and measured with a short download sample. Rest of healthy mirrors are kept for failover
+        Args:
+            distribution: (str) winx64 or linx64
+
         Returns: None
+        """
+        candidates = [name for name in self.servers if getattr(self.settings.password, name, "")]
+        if not self.settings.username or not candidates:
+            raise DownloaderError("Please provide username and password for at least one artifactory")
+
+        ranking = MirrorRanking(os.path.join(self.settings_folder, MIRRORS_FILE))
+        with ThreadPoolExecutor(max_workers=len(candidates)) as pool:
+            latencies = dict(
+                zip(
+                    candidates,
+                    pool.map(
+                        partial(ping_mirror, session=self.connection_pool.session()),
+                        [self.servers[name] for name in candidates],
+                    ),
+                )
+            )
+
+        for name, latency in latencies.items():
+            if latency is None:
+                ranking.update(name, failed=True)
+
+        self.mirror_queue = ranking.rank({name: latency for name, latency in latencies.items() if latency is not None})
+        logging.info(f"Artifactory mirrors ordered by ranking: {self.mirror_queue}")
+
+        best_builds = {}
+        while self.mirror_queue and not best_builds:
+            probed = self.mirror_queue[:MIRROR_PROBE_COUNT]
+            self.mirror_queue = self.mirror_queue[MIRROR_PROBE_COUNT:]
+            with ThreadPoolExecutor(max_workers=len(probed)) as pool:
+                probes = dict(zip(probed, pool.map(lambda name: self.probe_mirror(name, distribution), probed)))
+
+            for name, probe in probes.items():
+                if probe is None:
+                    ranking.update(name, failed=True)
+                    continue
+
+                path, throughput = probe
+                self.mirror_paths[name] = path
+                if throughput:
+                    ranking.update(name, throughput=throughput, latency=latencies[name])
+                best_builds[name] = probe
+
+        ranking.save()
+        if not best_builds:
+            raise DownloaderError(f"Version {self.settings.version} is not available on any reachable artifactory")
+
+        # the newest build has priority over speed of the mirror, mirrors could be not yet synchronized
+        ordered = sorted(
+            best_builds, key=lambda name: (get_build_date_from_path(best_builds[name][0]), best_builds[name][1] or 0)
+        )
+        self.mirror = ordered.pop()
+        self.build_artifactory_path = best_builds[self.mirror][0]
+        self.mirror_queue = list(reversed(ordered)) + self.mirror_queue
+        logging.info(f"Selected artifactory mirror {self.mirror}: {self.build_artifactory_path}")
+
+    def probe_mirror(self, server_name, distribution="winx64"):
+        """
+        Find the latest build on the mirror and measure throughput downloading first bytes of the archive
+        Args:
+            server_name: (str) name of the server from self.servers
+            distribution: (str) winx64 or linx64
 
+        Returns: (tuple) URL to the build and throughput in bytes per second (None for folders) or None if mirror
+            cannot be used
+        """
+        try:
+            path = self.find_artifactory_build(server_name, distribution)
+            if path.replication_status["status"] not in ["ok", "never_run"]:
+                logging.info(f"Artifactory {server_name} is replicating, skip it")
+                return None
+
+            if "ElectronicsDesktop" not in self.settings.version:
+                # Workbench is downloaded as an archive generated on the fly, there is no file to sample
+                return path, None
+
+            start_time = time.time()
+            response = path.session.get(
+                str(path),
+                headers={"Range": f"bytes=0-{MIRROR_PROBE_SIZE - 1}"},
+                stream=True,
+                timeout=self.settings.http_timeout,
+            )
+            response.raise_for_status()
+            sample_size = 0
+            for data in response.iter_content(chunk_size=RANGE_READ_SIZE):
+                sample_size += len(data)
+                if sample_size >= MIRROR_PROBE_SIZE:
+                    break
+            response.close()
+            throughput = sample_size / max(time.time() - start_time, 0.001)
+            logging.info(f"Artifactory {server_name} throughput {throughput / 1024 / 1024:.1f}MB/s")
+            return path, throughput
+        except (DownloaderError, ArtifactoryException, HTTPError, RequestException, OSError) as err:
+            logging.warning(f"Artifactory {server_name} cannot be used: {err}")
+            return None
+
+    def switch_mirror(self, error):
         """
-        product_list = self.ctx.web.lists.get_by_title("product_list")
-        items = product_list.items
-        self.ctx.load(items).execute_query()
+        In auto mode switch to the next Artifactory mirror that holds the same build when current one fails
+        Args:
+            error: (Exception) error raised by current mirror
 
-        build_list = []
-        for item in items:
-            title = item.properties["Title"]
-            if title != self.settings.version:
+        Returns: (bool) True if download could be repeated from another mirror
+        """
+        if self.settings.artifactory != "auto" or not self.mirror:
+            return False
+
+        ranking = MirrorRanking(os.path.join(self.settings_folder, MIRRORS_FILE))
+        ranking.update(self.mirror, failed=True)
+        ranking.save()
+
+        build_date = get_build_date_from_path(self.build_artifactory_path)
+        while self.mirror_queue:
+            name = self.mirror_queue.pop(0)
+            probe = self.probe_mirror(name)
+            if probe is None or get_build_date_from_path(probe[0]) != build_date:
                 continue
 
-            build_dict = {
-                "Title": title,
-                "build_date": item.properties["build_date"],
-                "relative_url": item.properties["relative_url"],
-            }
-            build_list.append(build_dict)
+            self.mirror_paths[name] = probe[0]
+            logging.warning(f"Artifactory {self.mirror} failed with: {error}. Switch to {name}")
+            self.update_installation_history(status="In-Progress", details=f"Switch to artifactory {name}")
+            self.mirror = name
+            self.build_artifactory_path = probe[0]
+            return True
+
+        return False
+
+    def get_sharepoint_build_info(self):
+        """
+        Gets link to the latest build from SharePoint and builddate itself
+        Returns: None
 
-        build_list.sort(key=lambda elem: elem["build_date"], reverse=True)
+        """
+        # only the latest item of the version is requested, list grows with every upload
+        query = {
+            "filter_query": f"Title eq {odata_string(self.settings.version)}",
+            "order_by": "build_date desc",
+            "top": 1,
+        }
+        fields = ["Title", "build_date", "relative_url"]
+        try:
+            items = self.get_sharepoint_list_items("product_list", fields=fields + ["md5", "sha256"], **query)
+        except ClientRequestException as err:
+            # SharePoint rejects whole query if the list does not have hash columns yet
+            if err.response is None or err.response.status_code != 400:
+                raise
+            logging.info("SharePoint list has no md5 and sha256 columns, only file size is validated")
+            items = self.get_sharepoint_list_items("product_list", fields=fields, **query)
 
-        build_dict = build_list[0] if build_list else {}
-        if not build_dict:
+        if not len(items):
             raise DownloaderError(f"No version of {self.settings.version} is available on SharePoint")
 
-        self.build_artifactory_path = build_dict["relative_url"]
-        self.remote_build_date = build_dict["build_date"]
+        item = items[0]
+        self.build_artifactory_path = item.properties["relative_url"]
+        self.remote_build_date = item.properties["build_date"]
+        self.remote_hashes = {"md5": item.properties.get("md5"), "sha256": item.properties.get("sha256")}
+
+    def get_sharepoint_list_items(self, list_title, filter_query="", order_by="", top=0, fields=None):
+        """
+        Get items of SharePoint list. Items are filtered, ordered and projected on the server, so only required rows
+        and columns are transferred
+        Args:
+            list_title: (str) title of the list
+            filter_query: (str) OData $filter expression, eg "Title eq 'v221_Workbench'"
+            order_by: (str) OData $orderby expression, eg "build_date desc"
+            top: (int) maximum number of items, all items if 0
+            fields: (list) names of fields to return, all fields if None
+
+        Returns: (ListItemCollection) items of the list
+        """
+        items = self.ctx.web.lists.get_by_title(list_title).items
+        if filter_query:
+            items.filter(filter_query)
+        if order_by:
+            items.order_by(order_by)
+        if top:
+            items.top(top)
+        if fields:
+            items.select(fields)
+
+        try:
+            self.ctx.load(items).execute_query()
+        except ClientRequestException as err:
+            if not self.renew_sharepoint_token(err):
+                raise
+            return self.get_sharepoint_list_items(list_title, filter_query, order_by, top, fields)
+        return items
 
-    def download_file(self):
+    def download_file(self, stream_unpack=False):
         """
         Downloads file in chunks and saves to the temp.zip file
         Uses url to the zip archive or special JFrog API to download Workbench folder
+        If the same build is available in local build cache, it is linked from the cache instead of download
+        :param stream_unpack: unpack archive while it is downloaded, if server supports range requests
         :modify: (str) zip_file: link to the zip file
         """
         if self.settings.artifactory == "SharePoint" or "win" in self.build_artifactory_path.name:
@@ -585,21 +1345,95 @@ class Downloader:
             archive_type = "tgz"
 
         self.zip_file = os.path.join(self.settings.download_path, f"{self.settings.version}.{archive_type}")
+
+        if (
+            self.settings.tree_download
+            and self.settings.artifactory != "SharePoint"
+            and ("Workbench" in self.settings.version or "LicenseManager" in self.settings.version)
+        ):
+            self.download_tree()
+            return
+
+        cache_key = ""
+        if self.settings.build_cache_size:
+            try:
+                self.build_cache = BuildCache(
+                    os.path.join(os.environ.get("PROGRAMDATA", self.settings_folder), "build_downloader", "cache"),
+                    self.settings.build_cache_size * 1024**3,
+                )
+                cache_key = self.get_build_cache_key()
+            except OSError as err:
+                logging.warning(f"Build cache is not available: {err}")
+
+        if cache_key:
+            try:
+                cache_entry = self.build_cache.fetch(cache_key, self.zip_file)
+            except OSError as err:
+                logging.warning(f"Archive cannot be taken from build cache: {err}")
+                cache_entry = None
+
+            if cache_entry:
+                self.file_hashes = cache_entry["hashes"]
+                logging.info(f"File is taken from build cache to {self.zip_file}")
+                return
+
+        if os.path.isfile(self.zip_file) and not os.path.isfile(self.zip_file + PARTIAL_MANIFEST_SUFFIX):
+            # file could be a hard link to the archive in build cache, writing into it would corrupt the cache
+            if self.settings.delta_download and archive_type == "zip":
+                # previous build is kept as a seed for delta download
+                os.replace(self.zip_file, self.zip_file + DELTA_SEED_SUFFIX)
+            else:
+                os.remove(self.zip_file)
+
         chunk_size = 50 * 1024 * 1024
         if self.settings.artifactory == "SharePoint":
-            self.download_from_sharepoint(chunk_size=chunk_size)
+            self.download_from_sharepoint(chunk_size=chunk_size, stream_unpack=stream_unpack)
         else:
-            self.download_from_artifactory(archive_type, chunk_size=chunk_size)
+            self.download_from_artifactory(archive_type, chunk_size=chunk_size, stream_unpack=stream_unpack)
 
         logging.info(f"File is downloaded to {self.zip_file}")
 
-    @retry((HTTPError, RequestException, ConnectionError, ConnectionResetError), 4, logger=logging)
-    def download_from_artifactory(self, archive_type, chunk_size):
+        if cache_key:
+            try:
+                self.build_cache.store(cache_key, self.zip_file, version=self.settings.version, hashes=self.file_hashes)
+            except OSError as err:
+                logging.warning(f"Archive cannot be added to build cache: {err}")
+
+    def get_build_cache_key(self):
+        """
+        Get key of the build archive in build cache. Checksum of the archive and build date are used if server
+        provides them. Workbench archives are generated by Artifactory on the fly, for them version and build date
+        are used
+        Returns: (str) key of the build or empty string if build cannot be identified
+        """
+        if self.settings.artifactory == "SharePoint":
+            checksum = self.remote_hashes.get("sha256") or self.remote_hashes.get("md5")
+        elif "ElectronicsDesktop" in self.settings.version:
+            file_stats = self.get_build_stats(self.build_artifactory_path)
+            checksum = file_stats.sha256 or file_stats.md5
+        else:
+            checksum = ""
+
+        build_date = self.get_new_build_date()
+        if checksum:
+            return f"{build_date}_{checksum.lower()}"
+        elif build_date:
+            return f"{self.settings.version}_{build_date}"
+        return ""
+
+    @retry(
+        (HTTPError, RequestException, ConnectionError, ConnectionResetError),
+        4,
+        logger=logging,
+        failover="switch_mirror",
+    )
+    def download_from_artifactory(self, archive_type, chunk_size, stream_unpack=False):
         """
         Download file from Artifactory
         Args:
             archive_type: type of the archive, zip or tgz
             chunk_size: (int) chunk size in bytes when download
+            stream_unpack: (bool) unpack archive while it is downloaded
 
         Returns: None
         """
@@ -608,24 +1442,34 @@ class Downloader:
 
         logging.info(f"Start download file from {self.build_artifactory_path} to {self.zip_file}")
         self.update_installation_history(
-            status="In-Progress", details=f"Downloading file from {self.settings.artifactory}"
+            status="In-Progress", details=f"Downloading file from {self.mirror or self.settings.artifactory}"
         )
         if "ElectronicsDesktop" in self.settings.version:
-            file_stats = self.build_artifactory_path.stat()
+            file_stats = self.get_build_stats(self.build_artifactory_path)
             arti_file_md5 = file_stats.md5
             logging.info(f"Artifactory hash: {arti_file_md5}")
-
-            try:
-                self.build_artifactory_path.writeto(
-                    out=self.zip_file, chunk_size=chunk_size, progress_func=self.print_download_progress
+            expected_hashes = {"md5": file_stats.md5, "sha256": file_stats.sha256}
+
+            if file_stats.size and self.artifactory_accepts_ranges():
+                range_downloader = RangeDownloader(
+                    self.zip_file,
+                    file_stats.size,
+                    fetch_range=self.fetch_artifactory_range,
+                    chunk_size=chunk_size,
+                    max_connections=self.settings.max_connections,
+                    progress_func=self.print_download_progress,
+                    # URL is not part of identity, partial file could be resumed from another mirror
+                    identity={"name": self.build_artifactory_path.name, "size": file_stats.size, "md5": arti_file_md5},
+                    priority_tail=chunk_size if stream_unpack and archive_type == "zip" else 0,
+                    extra_sources=self.get_striping_sources(file_stats),
+                    range_retries=RANGE_RETRIES,
+                    rate_limiter=self.rate_limiter,
                 )
-            except RuntimeError as err:
-                raise DownloaderError(f"Cannot download file. Server returned status code: {err}")
-
-            local_md5_hash = md5sum(self.zip_file)
-            logging.info(f"Local file hash: {local_md5_hash}")
-            if local_md5_hash != arti_file_md5:
-                raise DownloaderError("Downloaded file MD5 hash is different")
+                if not self.run_delta_download(range_downloader, archive_type, stream_unpack, expected_hashes):
+                    self.verify_or_repair_file(expected_hashes, self.fetch_artifactory_range)
+            else:
+                self.stream_download(self.build_artifactory_path, file_stats.size, progress_step=chunk_size)
+                self.verify_file_hashes(expected_hashes)
 
         elif "Workbench" in self.settings.version or "LicenseManager" in self.settings.version:
             try:
@@ -635,42 +1479,478 @@ class Downloader:
                 file_size = 14e9
 
             archive_url = self.build_artifactory_path.archive(archive_type=archive_type)
-            archive_url.writeto(
-                out=self.zip_file,
-                chunk_size=chunk_size,
-                progress_func=lambda x, y: self.print_download_progress(x, file_size),
-            )
+            self.stream_download(archive_url, file_size, progress_step=chunk_size)
+            logging.info(f"Archive is generated by Artifactory on the fly, no checksum to compare: {self.file_hashes}")
 
-    def get_artifactory_folder_size(self):
-        aql_query_dict, max_depth_print = artifactory_du.prepare_aql(
-            file=f"/{self.build_artifactory_path.name}",
-            max_depth=0,
-            repository=self.build_artifactory_path.repo,
-            without_downloads="",
-            older_than="",
-        )
-        artifacts = artifactory_du.artifactory_aql(
-            artifactory_url=str(self.build_artifactory_path.drive),
-            aql_query_dict=aql_query_dict,
-            username=self.build_artifactory_path.auth[0],
-            password=self.build_artifactory_path.auth[1],
-            kerberos=False,
-            verify=False,
-        )
-        file_size = artifactory_du.out_as_du(artifacts, max_depth_print, human_readable=False)
-        file_size = int(file_size.strip("/"))
-        return file_size
+    def stream_download(self, url, file_size, progress_step):
+        """
+        Download file from Artifactory in a single stream through reusable buffers of the global buffer pool, memory
+        usage does not depend on the size of the file. Data is read from the socket directly into the buffers
+        Args:
+            url: (ArtifactoryPath) URL of the file
+            file_size: (int) expected size of the file in bytes, used for progress
+            progress_step: (int) number of bytes between progress updates
 
-    @retry(
-        (HTTPError, RequestException, ConnectionError, ConnectionResetError, ClientRequestException),
+        Returns: None
+        """
+        # content is read from raw stream, server must not compress it
+        response = url.session.get(
+            str(url), headers={"Accept-Encoding": "identity"}, stream=True, timeout=self.settings.http_timeout
+        )
+        if not response.ok:
+            raise DownloaderError(f"Cannot download file. Server returned status code: {response.status_code}")
+
+        content_length = int(response.headers.get("Content-Length", 0))
+        total_size = file_size or content_length or 1
+        hasher = StreamHasher()
+        # readinto of urllib3 response reads a new bytes object and copies it to the buffer, underlying http.client
+        # response reads straight into the buffer
+        raw_stream = getattr(response.raw, "_fp", None) or response.raw
+
+        def read_into(buffer):
+            # http.client errors are not wrapped by urllib3 on this path, raise them as retryable connection errors
+            try:
+                return raw_stream.readinto(buffer)
+            except (socket.timeout, HTTPException) as err:
+                raise requests.ConnectionError(f"Download of {url} is interrupted: {err}")
+
+        with response, open(self.zip_file, "wb") as zip_file:
+            copied = copy_stream(
+                read_into,
+                zip_file,
+                hasher=hasher,
+                progress_func=lambda size: self.print_download_progress(size, total_size),
+                progress_step=progress_step,
+                rate_limiter=self.rate_limiter,
+            )
+
+        # http.client returns end of stream if server closes connection early
+        if content_length and copied != content_length:
+            raise requests.ConnectionError(f"Download of {url} is incomplete: {copied} of {content_length} bytes")
+        self.file_hashes = hasher.hexdigests()
+
+    @retry(
+        (HTTPError, RequestException, ConnectionError, ConnectionResetError),
+        4,
+        logger=logging,
+        failover="switch_mirror",
+    )
+    def download_tree(self):
+        """
+        Download Workbench/License Manager folder file by file instead of the archive that Artifactory generates on
+        the fly. Folder is listed with AQL, packages of Workbench products that are not selected in wb_flags are
+        skipped. Files are downloaded in parallel directly to the unpack folder and MD5 of each file is verified.
+        Files that are already downloaded are kept on retry
+        Returns: None
+        """
+        if not self.build_artifactory_path.replication_status["status"] in ["ok", "never_run"]:
+            raise DownloaderError("Currently Artifactory repository is replicating, please try later")
+
+        self.update_installation_history(
+            status="In-Progress", details=f"Listing files on {self.mirror or self.settings.artifactory}"
+        )
+        folder = self.build_artifactory_path.path_in_repo.strip("/")
+        items = self.build_artifactory_path.aql(
+            "items.find",
+            {
+                "repo": self.build_artifactory_path.repo,
+                "type": "file",
+                "$or": [{"path": folder}, {"path": {"$match": f"{folder}/*"}}],
+            },
+            ".include",
+            ["path", "name", "size", "actual_md5"],
+        )
+        files = {
+            posixpath.relpath(posixpath.join(item["path"], item["name"]), folder): item
+            for item in items
+            if item["name"] != "."
+        }
+        if "LicenseManager" not in self.settings.version:
+            files = select_tree_files(files, self.settings.wb_flags.split())
+
+        if not files:
+            raise DownloaderError(f"No files found in {self.build_artifactory_path}")
+
+        total_size = sum(item["size"] for item in files.values())
+        logging.info(
+            f"Download {len(files)} files, {int(total_size / 1024 / 1024)}MB from {self.build_artifactory_path}"
+        )
+        self.check_free_space(self.settings.download_path, total_size / 1024 / 1024 / 1024)
+
+        self.target_unpack_dir = os.path.splitext(self.zip_file)[0]
+        downloaded = [0]
+        lock = Lock()
+        abort = Event()
+
+        def download(relative_path):
+            if abort.is_set():
+                return
+
+            try:
+                self.download_tree_file(relative_path, files[relative_path], abort=abort)
+            except BaseException:
+                # do not wait for the rest of the tree, stop running downloads and skip queued ones
+                abort.set()
+                raise
+
+            with lock:
+                downloaded[0] += files[relative_path]["size"]
+                self.print_download_progress(downloaded[0], total_size)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, self.settings.max_connections)) as pool:
+                # large files first, so the last connections are not busy with a single huge package
+                order = sorted(files, key=lambda name: files[name]["size"], reverse=True)
+                futures = [pool.submit(download, relative_path) for relative_path in order]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    abort.set()
+                    for future in futures:
+                        future.cancel()
+                    raise
+        except OSError as err:
+            if err.errno == errno.ENOSPC:
+                raise DownloaderError("No disk space available in download folder!")
+            raise
+
+        self.archive_unpacked = True
+        logging.info(f"Files are downloaded to {self.target_unpack_dir}")
+
+    def download_tree_file(self, relative_path, item, abort=None):
+        """
+        Download single file of the build folder and verify its MD5. File is skipped if it is already downloaded
+        Args:
+            relative_path: (str) path of the file relative to the build folder
+            item: (dict) AQL item of the file with size and actual_md5
+            abort: (Event) event that stops the download when set, the file is left incomplete
+
+        Returns: None
+        """
+        target = os.path.join(self.target_unpack_dir, *relative_path.split("/"))
+        if os.path.isfile(target) and os.path.getsize(target) == item["size"]:
+            hasher = StreamHasher()
+            hasher.update_from_file(target, item["size"])
+            if hasher.hexdigests()["md5"] == item.get("actual_md5", "").lower():
+                return
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        url = self.build_artifactory_path.joinpath(relative_path)
+        response = url.session.get(str(url), stream=True, timeout=self.settings.http_timeout)
+        response.raise_for_status()
+
+        hasher = StreamHasher()
+        with response, open(target, "wb") as file:
+            for data in response.iter_content(chunk_size=RANGE_READ_SIZE):
+                if abort is not None and abort.is_set():
+                    # incomplete file is downloaded again on retry
+                    return
+                self.rate_limiter.consume(len(data))
+                file.write(data)
+                hasher.update(data)
+
+        if hasher.position != item["size"]:
+            raise ConnectionError(f"{relative_path} was interrupted at {hasher.position}/{item['size']} bytes")
+
+        if item.get("actual_md5") and hasher.hexdigests()["md5"] != item["actual_md5"].lower():
+            os.remove(target)
+            raise DownloaderError(f"Downloaded file {relative_path} MD5 hash is different")
+
+    def run_range_download(self, range_downloader, archive_type, stream_unpack):
+        """
+        Download file in ranges and, if requested, unpack archive at the same time.
+        If unpacking fails, archive is unpacked after download as usual
+        Args:
+            range_downloader: (RangeDownloader) downloader of the archive
+            archive_type: (str) zip or tgz
+            stream_unpack: (bool) unpack archive while it is downloaded
+
+        Returns: None
+        """
+        if not stream_unpack:
+            range_downloader.download()
+            return
+
+        self.target_unpack_dir = os.path.splitext(self.zip_file)[0]
+        self.stream_extractor = StreamingExtractor(range_downloader, archive_type, self.target_unpack_dir)
+        self.stream_extractor.start()
+        try:
+            try:
+                range_downloader.download()
+            except BaseException:
+                range_downloader.abort()
+                raise
+
+            while self.stream_extractor.is_alive():
+                self.stream_extractor.join(timeout=10)
+                msg = f"Unpacked {self.stream_extractor.extracted}/{self.stream_extractor.total} files"
+                self.update_installation_history(status="In-Progress", details=msg)
+        finally:
+            self.stream_extractor.join()
+            extractor, self.stream_extractor = self.stream_extractor, None
+
+        if extractor.error:
+            logging.warning(f"Unpacking during download failed: {extractor.error}. Unpack after download")
+        else:
+            self.archive_unpacked = True
+            logging.info(f"File is unpacked during download to {self.target_unpack_dir}")
+
+    def run_delta_download(self, range_downloader, archive_type, stream_unpack, expected_hashes):
+        """
+        Download archive reusing members of the previous build that did not change (delta download).
+        Delta is used only if checksums of the remote archive are known: if assembled archive does not match them,
+        full archive is downloaded
+        Args:
+            range_downloader: (RangeDownloader) downloader of the archive
+            archive_type: (str) zip or tgz
+            stream_unpack: (bool) unpack archive while it is downloaded
+            expected_hashes: (dict) MD5 and/or SHA256 of the remote archive
+
+        Returns: (bool) True if archive is already verified against expected hashes, caller verifies it otherwise
+        """
+        reused = 0
+        seed_file = self.find_delta_seed()
+        if (
+            seed_file
+            and archive_type == "zip"
+            and any(expected_hashes.values())
+            and not os.path.isfile(range_downloader.manifest_file)
+        ):
+            try:
+                reused = ZipDelta(range_downloader, seed_file).build()
+            except (OSError, zipfile.BadZipFile, DownloaderError) as err:
+                logging.warning(f"Delta download is not possible: {err}")
+                range_downloader.reset()
+
+        self.run_range_download(range_downloader, archive_type, stream_unpack)
+        self.file_hashes = range_downloader.hasher.hexdigests()
+        if not reused:
+            return False
+
+        try:
+            return self.verify_or_repair_file(expected_hashes, range_downloader.fetch_range)
+        except DownloaderError as err:
+            logging.warning(f"{err} after delta download. Download full archive")
+            range_downloader.reset()
+            self.archive_unpacked = False
+            self.run_range_download(range_downloader, archive_type, stream_unpack)
+            self.file_hashes = range_downloader.hasher.hexdigests()
+            return False
+
+    def find_delta_seed(self):
+        """
+        Find archive of the previous build of the same version that is used as a seed for delta download.
+        Archive left in download folder is preferred over the one from build cache
+        Returns: (str) path to the seed archive or empty string if there is no seed
+        """
+        if not self.settings.delta_download:
+            return ""
+
+        seed_file = self.zip_file + DELTA_SEED_SUFFIX
+        if os.path.isfile(seed_file):
+            return seed_file
+
+        if self.build_cache is not None:
+            return self.build_cache.find_latest(self.settings.version)
+        return ""
+
+    def verify_file_hashes(self, expected_hashes):
+        """
+        Compare hashes calculated during download with the ones provided by the server
+        Args:
+            expected_hashes: (dict) MD5 and/or SHA256 of the remote file, empty values are skipped
+
+        Returns: (bool) True if at least one hash was compared
+        """
+        verified = False
+        for algorithm, local_hash in self.file_hashes.items():
+            remote_hash = expected_hashes.get(algorithm)
+            if not remote_hash:
+                continue
+
+            logging.info(f"Local file {algorithm} hash: {local_hash}, remote: {remote_hash}")
+            if local_hash != remote_hash.lower():
+                raise DownloaderError(f"Downloaded file {algorithm.upper()} hash is different")
+            verified = True
+
+        return verified
+
+    def verify_or_repair_file(self, expected_hashes, fetch_range):
+        """
+        Verify hashes of the downloaded archive. If they do not match, try to repair the archive by downloading again
+        only corrupted chunks
+        Args:
+            expected_hashes: (dict) MD5 and/or SHA256 of the remote file, empty values are skipped
+            fetch_range: function that accepts start and exclusive end of the range and yields chunks of content
+
+        Returns: (bool) True if at least one hash was compared
+        """
+        try:
+            return self.verify_file_hashes(expected_hashes)
+        except DownloaderError as err:
+            if not self.repair_file(fetch_range):
+                raise
+
+            logging.warning(f"{err}. Corrupted chunks were downloaded again")
+            return self.verify_file_hashes(expected_hashes)
+
+    def repair_file(self, fetch_range):
+        """
+        Compare SHA256 of each chunk of the downloaded archive with the chunk manifest published next to the archive
+        and download again only chunks that differ. Archive hashes are recalculated afterwards
+        Args:
+            fetch_range: function that accepts start and exclusive end of the range and yields chunks of content
+
+        Returns: (bool) True if archive was repaired, False if there is no chunk manifest for the archive
+        """
+        file_size = os.path.getsize(self.zip_file)
+        manifest = self.get_chunk_manifest()
+        if not manifest or manifest.get("size") != file_size:
+            return False
+
+        chunk_size = manifest["chunk_size"]
+        corrupted = [
+            index
+            for index, digest in enumerate(get_chunk_digests(self.zip_file, chunk_size))
+            if index >= len(manifest["sha256"]) or digest != manifest["sha256"][index]
+        ]
+        logging.warning(f"{len(corrupted)} of {len(manifest['sha256'])} chunks of the archive are corrupted")
+        self.update_installation_history(status="In-Progress", details=f"Repair {len(corrupted)} corrupted chunks")
+        with open(self.zip_file, "r+b") as file:
+            for index in corrupted:
+                start = index * chunk_size
+                end = min(start + chunk_size, file_size)
+                file.seek(start)
+                for data in fetch_range(start, end):
+                    self.rate_limiter.consume(len(data))
+                    file.write(data)
+
+                if file.tell() != end:
+                    raise ConnectionError(f"Range {start}-{end} was interrupted at {file.tell()}")
+
+        if corrupted:
+            # files unpacked during download could contain corrupted data
+            self.archive_unpacked = False
+
+        hasher = StreamHasher()
+        hasher.update_from_file(self.zip_file, file_size)
+        self.file_hashes = hasher.hexdigests()
+        return True
+
+    def get_chunk_manifest(self):
+        """
+        Read chunk manifest of the build archive: size of the archive, chunk size and SHA256 of each chunk.
+        Manifest is published by the uploader next to the archive
+        Returns: (dict) chunk manifest or None if it is not available
+        """
+        try:
+            if self.settings.artifactory == "SharePoint":
+                response = self.request_sharepoint_file(f"{self.build_artifactory_path}{CHUNK_MANIFEST_SUFFIX}")
+            else:
+                response = self.build_artifactory_path.session.get(
+                    f"{self.build_artifactory_path}{CHUNK_MANIFEST_SUFFIX}", timeout=self.settings.http_timeout
+                )
+            response.raise_for_status()
+            return response.json()
+        except (RequestException, ValueError) as err:
+            logging.info(f"Chunk manifest of the archive is not available: {err}")
+            return None
+
+    def artifactory_accepts_ranges(self):
+        """
+        Check that Artifactory server supports byte range requests for the build archive
+        Returns: (bool) True if file could be downloaded in ranges
+        """
+        response = self.build_artifactory_path.session.head(
+            str(self.build_artifactory_path), timeout=self.settings.http_timeout
+        )
+        return response.ok and response.headers.get("Accept-Ranges", "") == "bytes"
+
+    def get_striping_sources(self, file_stats):
+        """
+        In auto mode find other probed mirrors that hold the same archive, so disjoint ranges of the archive are
+        downloaded from several mirrors at once. Archive on each mirror must have the same MD5
+        Args:
+            file_stats: stats of the archive on selected mirror
+
+        Returns: (dict) name of the mirror and function to fetch range from it
+        """
+        sources = {}
+        if self.settings.artifactory != "auto":
+            return sources
+
+        for name in self.mirror_queue:
+            if len(sources) + 1 >= self.settings.max_sources:
+                break
+
+            path = self.mirror_paths.get(name)
+            if path is None:
+                continue
+
+            try:
+                mirror_stats = self.get_build_stats(path)
+            except (ArtifactoryException, HTTPError, RequestException, OSError) as err:
+                logging.warning(f"Artifactory {name} cannot be used as additional source: {err}")
+                continue
+
+            if mirror_stats.md5 == file_stats.md5 and mirror_stats.size == file_stats.size:
+                sources[name] = partial(self.fetch_artifactory_range, path=path)
+
+        if sources:
+            logging.info(f"Download from {self.mirror} and additional mirrors: {', '.join(sources)}")
+        return sources
+
+    def fetch_artifactory_range(self, start, end, path=None):
+        """
+        Request byte range of the build archive from Artifactory
+        Args:
+            start: (int) first byte of the range
+            end: (int) end of the range, exclusive
+            path: (ArtifactoryPath) URL to the archive on another mirror, by default selected build URL is used
+
+        Returns: generator with chunks of the range content
+        """
+        path = path or self.build_artifactory_path
+        response = path.session.get(
+            str(path),
+            headers={"Range": f"bytes={start}-{end - 1}"},
+            stream=True,
+            timeout=self.settings.http_timeout,
+        )
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise DownloaderError("Artifactory server ignored range request")
+
+        yield from response.iter_content(chunk_size=RANGE_READ_SIZE)
+
+    def get_artifactory_folder_size(self):
+        aql_query_dict, max_depth_print = artifactory_du.prepare_aql(
+            file=f"/{self.build_artifactory_path.name}",
+            max_depth=0,
+            repository=self.build_artifactory_path.repo,
+            without_downloads="",
+            older_than="",
+        )
+        # query is sent through the session of the build instead of artifactory_du.artifactory_aql() that opens
+        # new connection
+        artifacts = self.build_artifactory_path.aql("items.find", aql_query_dict)
+        file_size = artifactory_du.out_as_du(artifacts, max_depth_print, human_readable=False)
+        file_size = int(file_size.strip("/"))
+        return file_size
+
+    @retry(
+        (HTTPError, RequestException, ConnectionError, ConnectionResetError, ClientRequestException),
         tries=4,
         logger=logging,
+        failover="renew_sharepoint_token",
     )
-    def download_from_sharepoint(self, chunk_size):
+    def download_from_sharepoint(self, chunk_size, stream_unpack=False):
         """
         Downloads file from Sharepoint
         Args:
             chunk_size: (int) chunk size in bytes when download
+            stream_unpack: (bool) unpack archive while it is downloaded
         Returns: None
         """
         self.update_installation_history(status="In-Progress", details="Downloading file from SharePoint")
@@ -681,6 +1961,8 @@ class Downloader:
         try:
             self.ctx.execute_query()
         except ClientRequestException as err:
+            if err.response.status_code in (401, 403):
+                raise
             logging.error(str(err))
             raise DownloaderError(
                 "URL on SharePoint is broken. Report an issue to betadownloader@ansys.com. "
@@ -690,19 +1972,29 @@ class Downloader:
         file_size = remote_file.length
         self.check_free_space(self.settings.download_path, file_size / 1024 / 1024 / 1024)
 
+        range_downloader = RangeDownloader(
+            self.zip_file,
+            file_size,
+            fetch_range=self.fetch_sharepoint_range,
+            chunk_size=chunk_size,
+            max_connections=self.settings.max_connections,
+            progress_func=self.print_download_progress,
+            identity={
+                "url": str(self.build_artifactory_path),
+                "size": file_size,
+                "etag": remote_file.properties.get("ETag", ""),
+            },
+            priority_tail=chunk_size if stream_unpack else 0,
+            range_retries=RANGE_RETRIES,
+            rate_limiter=self.rate_limiter,
+        )
         try:
-            with open(self.zip_file, "wb") as zip_file:
-                try:
-                    remote_file.download_session(
-                        zip_file,
-                        lambda offset: self.print_download_progress(offset, total_size=file_size),
-                        chunk_size=chunk_size,
-                    )
-                    self.ctx.execute_query()
-                except OSError as err:
-                    if err.errno == errno.ENOSPC:
-                        raise DownloaderError("No disk space available in download folder!")
-                    raise
+            try:
+                verified = self.run_delta_download(range_downloader, "zip", stream_unpack, self.remote_hashes)
+            except OSError as err:
+                if err.errno == errno.ENOSPC:
+                    raise DownloaderError("No disk space available in download folder!")
+                raise
         except PermissionError as err:
             msg = str(err).replace("[Errno 13]", "").strip()
             raise DownloaderError(msg)
@@ -710,13 +2002,62 @@ class Downloader:
         if not self.zip_file:
             raise DownloaderError("ZIP download failed")
 
+        if verified or self.verify_or_repair_file(self.remote_hashes, self.fetch_sharepoint_range):
+            return
+
         if abs(os.path.getsize(self.zip_file) - file_size) > 0.05 * file_size:
             raise DownloaderError("File size difference is more than 5%")
 
+    def fetch_sharepoint_range(self, start, end):
+        """
+        Request byte range of the build archive from SharePoint
+        Args:
+            start: (int) first byte of the range
+            end: (int) end of the range, exclusive
+
+        Returns: generator with chunks of the range content
+        """
+        response = self.request_sharepoint_file(
+            str(self.build_artifactory_path), headers={"Range": f"bytes={start}-{end - 1}"}, stream=True
+        )
+        retry_after = response.headers.get("Retry-After", "")
+        if response.status_code in (429, 503) and retry_after.isdigit():
+            # SharePoint throttles concurrent requests, next attempt is useless before the requested delay
+            time.sleep(min(int(retry_after), RETRY_AFTER_LIMIT))
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise DownloaderError("SharePoint server ignored range request")
+
+        yield from response.iter_content(chunk_size=RANGE_READ_SIZE)
+
+    def request_sharepoint_file(self, relative_url, headers=None, stream=False):
+        """
+        Send authenticated request for the content of the file on SharePoint
+        Args:
+            relative_url: (str) URL of the file relative to the site
+            headers: (dict) additional headers of the request, eg Range
+            stream: (bool) do not read content of the response immediately
+
+        Returns: (requests.Response) response of SharePoint
+        """
+        server_relative_url = quote(f"/sites/BetaDownloader/{relative_url}".replace("'", "''"))
+        request = RequestOptions(
+            f"{SHAREPOINT_SITE_URL}/_api/web/GetFileByServerRelativeUrl('{server_relative_url}')/$value"
+        )
+        self.ctx.authentication_context.authenticate_request(request)
+        for name, value in (headers or {}).items():
+            request.set_header(name, value)
+
+        return self.connection_pool.session().get(
+            request.url, headers=request.headers, stream=stream, timeout=self.settings.http_timeout
+        )
+
     def print_download_progress(self, offset, total_size):
         msg = "Downloaded {}/{}MB...[{}%]".format(
             int(offset / 1024 / 1024), int(total_size / 1024 / 1024), min(round(offset / total_size * 100, 2), 100)
         )
+        if self.stream_extractor is not None and self.stream_extractor.total:
+            msg += f" Unpacked {self.stream_extractor.extracted}/{self.stream_extractor.total} files"
         logging.info(msg)
         self.update_installation_history(status="In-Progress", details=msg)
 
@@ -726,7 +2067,8 @@ class Downloader:
         :param local_lang: if not specified then use English as default installation language
         :return: None
         """
-        self.unpack_archive()
+        if not self.archive_unpacked:
+            self.unpack_archive()
 
         if "ElectronicsDesktop" in self.settings.version:
             self.install_edt()
@@ -739,11 +2081,38 @@ class Downloader:
         self.clean_temp()
 
     def unpack_archive(self):
+        """
+        Unpack zip archive in parallel. Members are split between threads in shards of similar size, each thread
+        reads archive with its own file handle. Directories are created in advance to avoid races between threads
+        :return: None
+        """
         self.update_installation_history(status="In-Progress", details="Start unpacking")
         self.target_unpack_dir = self.zip_file.replace(".zip", "")
+        start_time = time.time()
         try:
             with zipfile.ZipFile(self.zip_file, "r") as zip_ref:
-                zip_ref.extractall(self.target_unpack_dir)
+                members = zip_ref.infolist()
+
+            for directory in {
+                os.path.dirname(get_zip_member_path(member, self.target_unpack_dir)) for member in members
+            }:
+                os.makedirs(directory, exist_ok=True)
+
+            shards = [[] for _ in range(UNPACK_WORKERS)]
+            shard_sizes = [0] * UNPACK_WORKERS
+            for member in sorted(members, key=lambda zip_info: zip_info.file_size, reverse=True):
+                index = shard_sizes.index(min(shard_sizes))
+                shards[index].append(member)
+                shard_sizes[index] += member.file_size
+
+            with ThreadPoolExecutor(max_workers=UNPACK_WORKERS) as pool:
+                futures = [
+                    pool.submit(extract_zip_members, self.zip_file, shard, self.target_unpack_dir)
+                    for shard in shards
+                    if shard
+                ]
+                for future in futures:
+                    future.result()
         except OSError as err:
             if err.errno == errno.ENOSPC:
                 raise DownloaderError("No disk space available in download folder!")
@@ -751,7 +2120,14 @@ class Downloader:
                 raise DownloaderError(f"Cannot unpack due to {err}")
         except (zipfile.BadZipFile, zlib.error):
             raise DownloaderError("Zip file is broken. Please try again later or use another repository.")
+
+        elapsed = max(time.time() - start_time, 0.001)
+        unpacked_size = sum(shard_sizes) / 1024 / 1024
         logging.info(f"File is unpacked to {self.target_unpack_dir}")
+        logging.info(
+            f"Unpacked {len(members)} archive members, {int(unpacked_size)}MB in {elapsed:.1f}s "
+            f"({unpacked_size / elapsed:.1f}MB/s) using {UNPACK_WORKERS} threads"
+        )
 
     def install_edt(self):
         """
@@ -760,7 +2136,13 @@ class Downloader:
         Get Workbench installation path from environment variable and enables integration if exists.
         :return: None
         """
-        setup_exe, product_id, installshield_version = self.parse_iss_template(self.target_unpack_dir)
+        if os.path.isfile(self.zip_file):
+            with ArchiveIndex(self.zip_file) as archive_index:
+                setup_exe, product_id, installshield_version = self.parse_iss_template(
+                    self.target_unpack_dir, archive_index
+                )
+        else:
+            setup_exe, product_id, installshield_version = self.parse_iss_template(self.target_unpack_dir)
         self.uninstall_edt(setup_exe, product_id, installshield_version)
 
         install_iss_file, install_log_file = self.create_install_iss_file(installshield_version, product_id)
@@ -897,41 +2279,62 @@ class Downloader:
             return 0
 
     @staticmethod
-    def parse_iss_template(unpacked_dir):
+    def parse_iss_template(unpacked_dir, archive_index=None):
         """
         Open directory with unpacked build of Electronics Desktop and search for SilentInstallationTemplate.iss to
-        extract product ID which is GUID hash
+        extract product ID which is GUID hash. If index of downloaded archive is provided, template is read straight
+        from the archive instead of walking through unpacked directory
         Args:
-            unpacked_dir: directory where AEDT package was unpacked
+            unpacked_dir: directory where AEDT package was (or will be) unpacked
+            archive_index: (ArchiveIndex) index of downloaded archive
         Returns:
             product_id: product GUID extracted from iss template
             setup_exe: set path to setup.exe if exists
             installshield_version: set version from file
         """
-        default_iss_file = ""
+        iss_content = []
         setup_exe = ""
         product_id_match = []
 
-        for dir_path, dir_names, file_names in os.walk(unpacked_dir):
-            for filename in file_names:
-                if "AnsysEM" in dir_path and filename.endswith(".iss"):
-                    default_iss_file = os.path.join(dir_path, filename)
-                    setup_exe = os.path.join(dir_path, "setup.exe")
+        if archive_index is not None:
+            for member in archive_index.find(".iss"):
+                member_dir = posixpath.dirname(member)
+                if "AnsysEM" in os.path.join(unpacked_dir, member_dir):
+                    iss_content = archive_index.read_text(member).splitlines(keepends=True)
+                    setup_member = posixpath.join(member_dir, "setup.exe")
+                    setup_exe = os.path.join(unpacked_dir, *setup_member.split("/"))
                     break
 
-        if not default_iss_file:
-            raise DownloaderError("SilentInstallationTemplate.iss does not exist")
-
-        if not os.path.isfile(setup_exe):
-            raise DownloaderError("setup.exe does not exist")
+            if not iss_content:
+                raise DownloaderError("SilentInstallationTemplate.iss does not exist")
 
-        with open(default_iss_file, "r") as iss_file:
-            for line in iss_file:
-                if "DlgOrder" in line:
-                    guid_regex = "[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
-                    product_id_match = re.findall(guid_regex, line)
-                if "InstallShield Silent" in line:
-                    installshield_version = next(iss_file).split("=")[1]
+            if setup_member not in archive_index.names:
+                raise DownloaderError("setup.exe does not exist")
+        else:
+            default_iss_file = ""
+            for dir_path, dir_names, file_names in os.walk(unpacked_dir):
+                for filename in file_names:
+                    if "AnsysEM" in dir_path and filename.endswith(".iss"):
+                        default_iss_file = os.path.join(dir_path, filename)
+                        setup_exe = os.path.join(dir_path, "setup.exe")
+                        break
+
+            if not default_iss_file:
+                raise DownloaderError("SilentInstallationTemplate.iss does not exist")
+
+            if not os.path.isfile(setup_exe):
+                raise DownloaderError("setup.exe does not exist")
+
+            with open(default_iss_file, "r") as iss_file:
+                iss_content = iss_file.readlines()
+
+        iss_lines = iter(iss_content)
+        for line in iss_lines:
+            if "DlgOrder" in line:
+                guid_regex = "[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+                product_id_match = re.findall(guid_regex, line)
+            if "InstallShield Silent" in line:
+                installshield_version = next(iss_lines).split("=")[1]
 
         if product_id_match:
             product_id = product_id_match[0]
@@ -978,40 +2381,56 @@ class Downloader:
 
     def parse_lm_installer_builddate(self):
         """
-        Check build date of installation package of License Manager
+        Check build date of installation package of License Manager. Build date file is read straight from
+        lmcenter/WINX64.7z without unpacking it. If package is not unpacked yet, downloaded zip is queried instead
         """
-
         build_file = os.path.join(self.target_unpack_dir, "builddate.txt")
         lm_center_archive = os.path.join(self.target_unpack_dir, "lmcenter", "WINX64.7z")
 
-        if not os.path.isfile(build_file) and os.path.isfile(lm_center_archive):
-            with py7zr.SevenZipFile(lm_center_archive, "r") as archive:
-                archive.extractall(path=os.path.join(self.target_unpack_dir, "lmcenter"))
-            build_file = os.path.join(
-                self.target_unpack_dir,
-                "lmcenter",
-                "Shared Files",
-                "licensing",
-                "tools",
-                "lmcenter",
-                "lmcenter_blddate.txt",
-            )
+        if os.path.isfile(build_file):
+            with open(build_file) as file:
+                build_file_content = file.read()
+        elif os.path.isfile(lm_center_archive):
+            with ArchiveIndex(lm_center_archive) as archive_index:
+                build_file_content = self.read_lm_build_date_file(archive_index)
+        elif os.path.isfile(self.zip_file):
+            with ArchiveIndex(self.zip_file) as archive_index:
+                if "builddate.txt" in archive_index.names:
+                    build_file_content = archive_index.read_text("builddate.txt")
+                elif "lmcenter/WINX64.7z" in archive_index.names:
+                    lm_center_index = archive_index.open_nested("lmcenter/WINX64.7z")
+                    build_file_content = self.read_lm_build_date_file(lm_center_index)
+                else:
+                    build_file_content = ""
+        else:
+            build_file_content = ""
 
-        if not os.path.isfile(build_file):
-            # check again if file was unpacked
+        if not build_file_content:
             logging.warning("builddate.txt was not found in installation package")
             return
 
-        with open(build_file) as file:
-            for line in file:
-                if "license management center" in line.lower():
-                    lm_build_date = line.split()[-1]
-                    try:
-                        logging.info(f"Build date of License Manager in installation package {lm_build_date}")
-                        lm_build_date = int(lm_build_date)
-                        return lm_build_date
-                    except TypeError:
-                        raise DownloaderError("Cannot extract build date of installation package")
+        for line in build_file_content.splitlines():
+            if "license management center" in line.lower():
+                lm_build_date = line.split()[-1]
+                try:
+                    logging.info(f"Build date of License Manager in installation package {lm_build_date}")
+                    lm_build_date = int(lm_build_date)
+                    return lm_build_date
+                except TypeError:
+                    raise DownloaderError("Cannot extract build date of installation package")
+
+    @staticmethod
+    def read_lm_build_date_file(archive_index):
+        """
+        Read lmcenter_blddate.txt from the index of lmcenter/WINX64.7z archive
+        Args:
+            archive_index: (ArchiveIndex) index of lmcenter archive
+
+        Returns: (str) content of the build date file or empty string if file does not exist
+        """
+        for member in archive_index.find("licensing/tools/lmcenter/lmcenter_blddate.txt"):
+            return archive_index.read_text(member)
+        return ""
 
     def get_license_manager_build_date(self):
         """
@@ -1147,7 +2566,11 @@ class Downloader:
         :return: (int): package_id if extracted
         """
         product_info = 0
-        package_info = build_info.read_text()
+        # Electronics Desktop info file is stored in the folder of the build and never changes
+        ttl = BUILD_INFO_TTL if "ElectronicsDesktop" in self.settings.version else 0
+        package_info = self.metadata_cache.fetch(
+            build_info.session, str(build_info), ttl, timeout=self.settings.http_timeout
+        )
         try:
             if "Workbench" in self.settings.version:
                 first_line = package_info.split("\n")[0]
@@ -1169,9 +2592,16 @@ class Downloader:
         :return: None
         """
         try:
-            if os.path.isfile(self.zip_file) and self.settings.delete_zip:
-                self.remove_path(self.zip_file)
-                logging.info("ZIP deleted")
+            if os.path.isfile(self.zip_file + PARTIAL_MANIFEST_SUFFIX):
+                logging.info("ZIP is partially downloaded, keep it to resume on the next run")
+            else:
+                if os.path.isfile(self.zip_file + DELTA_SEED_SUFFIX) and os.path.isfile(self.zip_file):
+                    self.remove_path(self.zip_file + DELTA_SEED_SUFFIX)
+                    logging.info("Seed of delta download deleted")
+
+                if os.path.isfile(self.zip_file) and self.settings.delete_zip:
+                    self.remove_path(self.zip_file)
+                    logging.info("ZIP deleted")
 
             if os.path.isdir(self.target_unpack_dir):
                 self.remove_path(self.target_unpack_dir)
@@ -1243,6 +2673,9 @@ class Downloader:
         :param details: Message for details field
         :return:
         """
+        if not self.record_history:
+            return
+
         if status == "Failed" or status == "Success":
             try:
                 self.toaster_notification(status, details)
@@ -1251,7 +2684,6 @@ class Downloader:
                 logging.error(msg)
                 self.warnings_list.append(msg)
 
-        self.get_installation_history()  # in case if file was deleted during run of installation
         time_now = datetime.datetime.now().strftime("%d-%m-%Y %H:%M")
         shorten_path = self.settings_path.replace(os.getenv("APPDATA", "@@@"), "%APPDATA%")
 
@@ -1259,9 +2691,12 @@ class Downloader:
             if self.warnings_list:
                 details += "\nSome warnings occurred during process:\n" + "\n".join(self.warnings_list)
 
-        self.history[self.hash] = [status, self.settings.version, time_now, shorten_path, details, self.pid]
-        with open(self.history_file, "w") as file:
-            json.dump(self.history, file, indent=4)
+        # phases of the run may report progress at the same time
+        with self.history_lock:
+            self.get_installation_history()  # in case if file was deleted during run of installation
+            self.history[self.hash] = [status, self.settings.version, time_now, shorten_path, details, self.pid]
+            with open(self.history_file, "w") as file:
+                json.dump(self.history, file, indent=4)
 
     @staticmethod
     def toaster_notification(status, details):
@@ -1327,7 +2762,10 @@ class Downloader:
         Returns:
             None
         """
-        client = InfluxDBClient(host=STATISTICS_SERVER, port=STATISTICS_PORT)
+        session = self.connection_pool.session()
+        client = InfluxDBClient(host=STATISTICS_SERVER, port=STATISTICS_PORT, session=session)
+        # client mounts own adapter to the session, send requests through the pool instead
+        session.mount("http://", self.connection_pool.adapter)
         db_name = "downloads" if not error else "crashes"
         client.switch_database(db_name)
         json_body = [
@@ -1337,7 +2775,7 @@ class Downloader:
                     "username": self.settings.username,
                     "version": version,
                     "tool": tool,
-                    "artifactory": self.settings.artifactory,
+                    "artifactory": self.mirror or self.settings.artifactory,
                     "downloader_ver": downloader_ver,
                 },
                 "time": time_now,
@@ -1418,19 +2856,29 @@ class Downloader:
         except OSError:
             raise DownloaderError("Please run as administrator and disable Windows UAC")
 
-    @staticmethod
-    def parse_args(version):
+    def parse_args(self, version):
         """
         Function to parse arguments provided to the script. Search for -p key to get settings path
+        and --scheduled flag that is set by the scheduled task. With --check only updates of products are checked
         :return: settings_path: path to the configuration file
         """
         parser = argparse.ArgumentParser()
         # Add long and short argument
         parser.add_argument("--path", "-p", help="set path to the settings file generated by UI")
         parser.add_argument("--version", "-V", action="version", version=f"%(prog)s version: {version}")
+        parser.add_argument("--scheduled", action="store_true", help="run is started by the scheduled task")
+        parser.add_argument(
+            "--check", nargs="+", metavar="SETTINGS", help="only check for updates of products from settings files"
+        )
+        parser.add_argument("--report", help="write JSON report of update check to the file")
         args = parser.parse_args()
+        self.scheduled_run = args.scheduled
+        self.check_paths = args.check or []
+        self.report_file = args.report or ""
 
-        if args.path:
+        if self.check_paths:
+            return self.check_paths[0]
+        elif args.path:
             settings_path = args.path
             if not os.path.isfile(settings_path):
                 raise DownloaderError("Settings file does not exist")
@@ -1440,6 +2888,2178 @@ class Downloader:
             raise DownloaderError("Please provide --path argument")
 
 
+class RangeDownloader:
+    """
+    Downloads file in byte ranges over several concurrent connections into a preallocated file.
+    Starts with one connection and opens new ones while measured throughput grows, up to max_connections.
+
+    Ranges could be striped between several sources (mirrors) of the same file. Each next range goes to the fastest
+    source with a free connection, sources much slower than the best one get no new ranges. Failed range is retried
+    with a growing delay, if retries are exhausted its source is dropped and the range is downloaded from another one.
+    Once throughput of a source is measured, ranges are shrunk so that a single range takes about
+    RANGE_TARGET_SECONDS, slow connection then loses less data on interruption
+
+    If identity of the remote file is provided, completed ranges are tracked in a sidecar manifest next to the file,
+    so next download of the same file (after retry, abort or reboot) fetches only missing ranges
+    """
+
+    def __init__(
+        self,
+        file_path,
+        file_size,
+        fetch_range,
+        chunk_size,
+        max_connections=4,
+        progress_func=None,
+        identity=None,
+        priority_tail=0,
+        extra_sources=None,
+        range_retries=0,
+        rate_limiter=None,
+    ):
+        """
+        Args:
+            file_path: (str) path to the output file
+            file_size: (int) size of the remote file in bytes
+            fetch_range: function that accepts start and exclusive end of the range and yields chunks of content
+            chunk_size: (int) size of a single range in bytes
+            max_connections: (int) upper limit of concurrent connections
+            progress_func: function that accepts downloaded and total size, called once per completed range
+            identity: (dict) URL, size and ETag/MD5 of the remote file. Partial file is resumed only if it matches
+            priority_tail: (int) number of bytes at the end of the file to download first, eg zip central directory
+            extra_sources: (dict) name and fetch_range function of additional servers that provide the same file.
+                max_connections is applied to each source
+            range_retries: (int) number of attempts to download failed range again before the error is raised
+            rate_limiter: (BandwidthLimiter) limiter of the transfer rate shared by all connections
+        """
+        self.file_path = file_path
+        self.file_size = file_size
+        self.fetch_range = fetch_range
+        self.chunk_size = chunk_size
+        self.max_connections = max(1, max_connections)
+        self.progress_func = progress_func
+        self.identity = identity
+        self.priority_tail = priority_tail
+        self.range_retries = range_retries
+        self.rate_limiter = rate_limiter
+        self.manifest_file = file_path + PARTIAL_MANIFEST_SUFFIX
+        self.sources = [RangeSource("main", fetch_range)] + [
+            RangeSource(name, source_fetch_range) for name, source_fetch_range in (extra_sources or {}).items()
+        ]
+
+        self.connections = 1
+        self.downloaded = 0
+        self.completed = []
+        self.hasher = StreamHasher()
+
+        self._lock = Lock()
+        self._progress = Condition(self._lock)
+        self._hashing = False
+        self._abort = Event()
+        self._best_throughput = 0
+        self._round_bytes = 0
+        self._round_ranges = 0
+        self._round_start = 0
+
+    def download(self):
+        """
+        Download all ranges of the file. Exception raised in any connection aborts the others and is reraised
+        Returns: None
+        """
+        self.completed = self.load_manifest()
+        if self.completed:
+            self.downloaded = sum(end - start for start, end in self.completed)
+            logging.info(f"Resume download of {self.file_path}, {int(self.downloaded / 1024 / 1024)}MB available")
+        else:
+            with open(self.file_path, "wb") as file:
+                file.truncate(self.file_size)
+            self.save_manifest()
+
+        with self._lock:
+            self.advance_hasher()
+
+        ranges = self.pending_ranges()
+        if self.priority_tail:
+            tail_start = self.file_size - self.priority_tail
+            ranges.sort(key=lambda pending_range: pending_range[1] <= tail_start)
+        ranges.reverse()
+
+        self._round_start = time.time()
+        running = {}
+        attempts = {}
+        with ThreadPoolExecutor(max_workers=self.max_connections * len(self.sources)) as pool:
+            try:
+                while ranges or running:
+                    source = self.select_source()
+                    while ranges and source is not None:
+                        start, end = ranges.pop()
+                        range_size = self.get_range_size(source)
+                        if end - start > range_size:
+                            # remainder is downloaded next, ranges are still requested in ascending order
+                            ranges.append((start + range_size, end))
+                            end = start + range_size
+
+                        source.active += 1
+                        attempt = attempts.get(start, 0)
+                        future = pool.submit(self.download_range, start, end, source, attempt)
+                        running[future] = (start, end, source)
+                        source = self.select_source()
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        start, end, source = running.pop(future)
+                        source.active -= 1
+                        try:
+                            future.result()
+                        except (OSError, HTTPError, DownloaderError) as err:
+                            attempts[start] = attempts.get(start, 0) + 1
+                            if not isinstance(err, DownloaderError) and attempts[start] <= self.range_retries:
+                                logging.warning(
+                                    f"Range {start}-{end} failed: {err}. "
+                                    f"Retry attempt {attempts[start]}/{self.range_retries}"
+                                )
+                            elif len([usable for usable in self.sources if not usable.failed]) > 1:
+                                logging.warning(
+                                    f"Source {source.name} failed: {err}. Download range from other sources"
+                                )
+                                source.failed = True
+                                attempts.pop(start)
+                            else:
+                                raise
+
+                            ranges.append((start, end))
+                            continue
+
+                        attempts.pop(start, None)
+
+                        self._round_bytes += end - start
+                        self._round_ranges += 1
+
+                    self.tune_connections()
+            except BaseException:
+                self.abort()
+                raise
+
+        with self._lock:
+            self.advance_hasher()
+        if self.hasher.position != self.file_size:
+            raise DownloaderError(f"Only {self.hasher.position}/{self.file_size} bytes of the file were verified")
+
+        if os.path.isfile(self.manifest_file):
+            os.remove(self.manifest_file)
+
+    def abort(self):
+        """
+        Stop all connections and wake up consumers waiting for data
+        Returns: None
+        """
+        self._abort.set()
+        with self._progress:
+            self._progress.notify_all()
+
+    def reset(self):
+        """
+        Forget completed ranges, next download starts from scratch
+        Returns: None
+        """
+        if os.path.isfile(self.manifest_file):
+            os.remove(self.manifest_file)
+
+        self.completed = []
+        self.downloaded = 0
+        self.hasher = StreamHasher()
+        self._abort.clear()
+
+    def select_source(self):
+        """
+        Choose source for the next range. Sources without measurements are tried first, then the fastest source
+        with a free connection is used
+        Returns: (RangeSource) source or None if all sources are busy
+        """
+        with self._lock:
+            usable = [source for source in self.sources if not source.failed]
+            best_throughput = max(source.throughput for source in usable) if usable else 0
+            free = [
+                source
+                for source in usable
+                if source.active < self.connections
+                and (not source.seconds or source.throughput >= SLOW_SOURCE_RATIO * best_throughput)
+            ]
+            return max(free, key=lambda source: (not source.seconds, source.throughput), default=None)
+
+    def get_range_size(self, source):
+        """
+        Size of the next range for the source. Until throughput is measured chunk size is used, then range is shrunk
+        to be downloaded in about RANGE_TARGET_SECONDS
+        Args:
+            source: (RangeSource) source of the range
+
+        Returns: (int) size of the range in bytes
+        """
+        if not source.seconds:
+            return self.chunk_size
+
+        return int(min(self.chunk_size, max(MIN_RANGE_SIZE, source.throughput * RANGE_TARGET_SECONDS)))
+
+    def pending_ranges(self):
+        """
+        Split parts of the file that are not yet downloaded into ranges of chunk size
+        Returns: (list) list of tuples with start and exclusive end of each range
+        """
+        ranges = []
+        position = 0
+        for start, end in self.completed + [(self.file_size, self.file_size)]:
+            for range_start in range(position, start, self.chunk_size):
+                ranges.append((range_start, min(range_start + self.chunk_size, start)))
+            position = end
+
+        return ranges
+
+    def load_manifest(self):
+        """
+        Read completed ranges of the partially downloaded file
+        Returns: (list) sorted list of completed ranges, empty if file cannot be resumed
+        """
+        if not self.identity or not os.path.isfile(self.manifest_file) or not os.path.isfile(self.file_path):
+            return []
+
+        try:
+            with open(self.manifest_file) as file:
+                manifest = json.load(file)
+        except (OSError, json.decoder.JSONDecodeError):
+            return []
+
+        if manifest.get("identity") != self.identity or os.path.getsize(self.file_path) != self.file_size:
+            logging.info("Partially downloaded file belongs to another build, start from scratch")
+            return []
+
+        return sorted(tuple(completed_range) for completed_range in manifest["completed"])
+
+    def save_manifest(self):
+        """
+        Write identity of the remote file and completed ranges to the sidecar manifest
+        Returns: None
+        """
+        if not self.identity:
+            return
+
+        temp_manifest = self.manifest_file + ".tmp"
+        with open(temp_manifest, "w") as file:
+            json.dump({"identity": self.identity, "completed": self.completed}, file)
+        os.replace(temp_manifest, self.manifest_file)
+
+    def add_completed(self, start, end):
+        """
+        Add range to the list of completed ranges and merge it with adjacent ones
+        Args:
+            start: (int) first byte of the range
+            end: (int) end of the range, exclusive
+
+        Returns: None
+        """
+        merged = []
+        for completed_start, completed_end in sorted(self.completed + [(start, end)]):
+            if merged and completed_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], completed_end))
+            else:
+                merged.append((completed_start, completed_end))
+
+        self.completed = merged
+
+    def download_range(self, start, end, source=None, attempt=0):
+        """
+        Download single range and write it to the corresponding position in the file
+        Args:
+            start: (int) first byte of the range
+            end: (int) end of the range, exclusive
+            source: (RangeSource) source of the range, first source by default
+            attempt: (int) number of previous failed attempts, each next retry waits longer
+
+        Returns: None
+        """
+        source = source or self.sources[0]
+        if attempt and self._abort.wait(RANGE_RETRY_DELAY * attempt):
+            return
+
+        start_time = time.time()
+        position = start
+        with open(self.file_path, "r+b") as file:
+            file.seek(start)
+            for data in source.fetch_range(start, end):
+                if self._abort.is_set():
+                    return
+
+                if self.rate_limiter is not None:
+                    self.rate_limiter.consume(len(data))
+                file.write(data)
+                file.flush()
+                with self._lock:
+                    if position == self.hasher.position and not self._hashing:
+                        self.hasher.update(data)
+                        self._progress.notify_all()
+                position += len(data)
+
+            if position == end and self.identity:
+                # range is marked as completed only when data is on disk, even if PC is rebooted
+                file.flush()
+                os.fsync(file.fileno())
+
+        if position != end:
+            raise ConnectionError(f"Range {start}-{end} was interrupted at {position}")
+
+        with self._lock:
+            source.bytes += end - start
+            source.seconds += time.time() - start_time
+            self.add_completed(start, end)
+            self.save_manifest()
+            self.advance_hasher()
+            self.downloaded += end - start
+            if callable(self.progress_func):
+                self.progress_func(self.downloaded, self.file_size)
+
+    def advance_hasher(self):
+        """
+        Hash completed ranges that follow current position of the hasher. Ranges that arrive in order are hashed on
+        the fly, only ranges completed out of order are read back from the file while they are still in OS cache.
+        Should be called with acquired lock. Lock is released while the file is read, so other connections are not
+        blocked. Ranges completed meanwhile are hashed by the same thread
+        Returns: None
+        """
+        if self._hashing:
+            return
+
+        self._hashing = True
+        try:
+            while True:
+                end = next((end for start, end in self.completed if start <= self.hasher.position < end), 0)
+                position = self.hasher.position
+                if not end:
+                    break
+
+                self._lock.release()
+                try:
+                    self.hasher.update_from_file(self.file_path, end)
+                finally:
+                    self._lock.acquire()
+
+                self._progress.notify_all()
+                if self.hasher.position == position:
+                    break
+        finally:
+            self._hashing = False
+
+        self._progress.notify_all()
+
+    def wait_for(self, start, end):
+        """
+        Block until range of the file is downloaded. Allows to consume the file while it is still being downloaded
+        Args:
+            start: (int) first byte of the range
+            end: (int) end of the range, exclusive
+
+        Returns: None
+        """
+        with self._progress:
+            while not self.is_completed(start, end):
+                if self._abort.is_set():
+                    raise DownloaderError("Download was interrupted")
+                self._progress.wait(timeout=1)
+
+    def is_completed(self, start, end):
+        """
+        Check if range of the file is already on disk. Should be called with acquired lock
+        Args:
+            start: (int) first byte of the range
+            end: (int) end of the range, exclusive
+
+        Returns: (bool) True if all bytes of the range are downloaded
+        """
+        if end <= self.hasher.position:
+            return True
+
+        # completed ranges are sorted and merged, only the last range that starts before requested one could contain it
+        index = bisect.bisect_right(self.completed, (start, self.file_size)) - 1
+        return index >= 0 and self.completed[index][1] >= end
+
+    def tune_connections(self):
+        """
+        Once all connections completed a range compare throughput with the best one measured so far.
+        Add connection while throughput grows and drop one if it degrades
+        Returns: None
+        """
+        elapsed = time.time() - self._round_start
+        if self._round_ranges < self.connections or elapsed <= 0:
+            return
+
+        throughput = self._round_bytes / elapsed
+        connections = self.connections
+        if throughput > 1.1 * self._best_throughput and self.connections < self.max_connections:
+            self.connections += 1
+        elif throughput < 0.8 * self._best_throughput and self.connections > 1:
+            self.connections -= 1
+
+        if connections != self.connections:
+            logging.info(
+                f"Throughput {throughput / 1024 / 1024:.1f}MB/s with {connections} connections. "
+                f"Switch to {self.connections} connections"
+            )
+
+        self._best_throughput = max(self._best_throughput, throughput)
+        self._round_bytes = 0
+        self._round_ranges = 0
+        self._round_start = time.time()
+
+
+class RangeSource:
+    """
+    Source of byte ranges of the file used by RangeDownloader, tracks throughput of the server
+    """
+
+    def __init__(self, name, fetch_range):
+        """
+        Args:
+            name: (str) name of the source used in logs
+            fetch_range: function that accepts start and exclusive end of the range and yields chunks of content
+        """
+        self.name = name
+        self.fetch_range = fetch_range
+        self.active = 0
+        self.bytes = 0
+        self.seconds = 0
+        self.failed = False
+
+    @property
+    def throughput(self):
+        """
+        Average throughput of a single connection to the source in bytes per second
+        """
+        return self.bytes / self.seconds if self.seconds else 0
+
+
+class StreamingExtractor(Thread):
+    """
+    Unpacks archive while it is still being downloaded by RangeDownloader.
+    Zip: central directory is read from the end of the archive, that is downloaded first, then each member is extracted
+    as soon as its bytes are on disk.
+    Tgz: archive is naturally sequential and is extracted from the stream of downloaded bytes
+    """
+
+    def __init__(self, range_downloader, archive_type, target_dir):
+        """
+        Args:
+            range_downloader: (RangeDownloader) downloader of the archive
+            archive_type: (str) zip or tgz
+            target_dir: (str) path where to unpack archive
+        """
+        super().__init__(daemon=True)
+        self.range_downloader = range_downloader
+        self.archive_type = archive_type
+        self.target_dir = target_dir
+
+        self.extracted = 0
+        self.total = 0
+        self.error = None
+
+    def run(self):
+        try:
+            if self.archive_type == "zip":
+                self.extract_zip()
+            else:
+                self.extract_tgz()
+        except Exception as err:
+            # archive will be unpacked after download, error is reported by caller
+            self.error = err
+
+    def extract_zip(self):
+        file_size = self.range_downloader.file_size
+        tail_start = max(0, file_size - self.range_downloader.priority_tail)
+        self.range_downloader.wait_for(tail_start, file_size)
+
+        # unbuffered file, otherwise read ahead would cache bytes that are not downloaded yet
+        with open(self.range_downloader.file_path, "rb", buffering=0) as file, zipfile.ZipFile(file, "r") as zip_ref:
+            if zip_ref.start_dir < tail_start:
+                raise DownloaderError("Central directory of the archive is larger than downloaded tail")
+
+            members = sorted(zip_ref.infolist(), key=lambda member: member.header_offset)
+            self.total = len(members)
+            members_end = [member.header_offset for member in members[1:]] + [zip_ref.start_dir]
+            for member, member_end in zip(members, members_end):
+                self.range_downloader.wait_for(member.header_offset, member_end)
+                extract_zip_member(zip_ref, member, self.target_dir)
+                self.extracted += 1
+
+    def extract_tgz(self):
+        target_dir = os.path.realpath(self.target_dir)
+        with DownloadingFileReader(self.range_downloader) as reader:
+            with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+                for member in tar:
+                    self.total += 1
+                    member_path = os.path.realpath(os.path.join(target_dir, member.name))
+                    if os.path.commonpath([target_dir, member_path]) != target_dir:
+                        raise DownloaderError(f"Archive member {member.name} is outside of the target directory")
+
+                    tar.extract(member, target_dir)
+                    self.extracted += 1
+
+
+class ZipDelta:
+    """
+    Assembles zip archive from members of the previous build (seed) that did not change.
+    Central directory of the remote archive serves as a signature of its blocks: it is downloaded first and each
+    member with the same name, CRC, sizes and compression as in the seed is copied from the seed if its local header
+    reconstructed from central directory matches the seed one except of modification time.
+    Copied ranges are saved to the manifest of RangeDownloader, so only changed members are downloaded afterwards
+    """
+
+    def __init__(self, range_downloader, seed_file):
+        """
+        Args:
+            range_downloader: (RangeDownloader) downloader of the archive, identity of the remote file is required
+            seed_file: (str) path to the archive of the previous build
+        """
+        self.range_downloader = range_downloader
+        self.seed_file = seed_file
+
+    def build(self):
+        """
+        Copy unchanged members from the seed to the preallocated archive
+        Returns: (int) number of bytes reused from the seed
+        """
+        range_downloader = self.range_downloader
+        with open(range_downloader.file_path, "wb") as file:
+            file.truncate(range_downloader.file_size)
+
+        tail_start = self.fetch_central_directory()
+        remote_members, remote_start_dir = self.read_members(range_downloader.file_path)
+        seed_members, seed_start_dir = self.read_members(self.seed_file)
+        seed_spans = {
+            member.filename: (member, member_end)
+            for member, member_end in self.member_spans(seed_members, seed_start_dir)
+        }
+
+        completed = []
+        with open(self.seed_file, "rb") as seed, open(range_downloader.file_path, "r+b") as target:
+            for member, member_end in self.member_spans(remote_members, remote_start_dir):
+                seed_member, seed_member_end = seed_spans.get(member.filename, (None, 0))
+                if seed_member is None or not self.is_same_member(member, member_end, seed_member, seed_member_end):
+                    continue
+
+                seed.seek(seed_member.header_offset)
+                local_header = bytearray(seed.read(30))
+                if local_header[:4] != b"PK\x03\x04":
+                    continue
+
+                name_length, extra_length = struct.unpack("<2H", local_header[26:30])
+                local_header += seed.read(name_length + extra_length)
+                extra_start = len(local_header) - extra_length
+                expected_header = self.get_local_header(member, seed_member, bytes(local_header[extra_start:]))
+
+                # modification time is patched, rest of the header must be the same as in the remote archive,
+                # otherwise assembled archive would differ from the remote one
+                local_header[10:14] = get_dos_date_time(member.date_time)
+                if local_header != expected_header:
+                    continue
+
+                target.seek(member.header_offset)
+                target.write(local_header)
+                copy_file_bytes(seed, target, member_end - member.header_offset - len(local_header))
+
+                if completed and completed[-1][1] == member.header_offset:
+                    completed[-1] = (completed[-1][0], member_end)
+                else:
+                    completed.append((member.header_offset, member_end))
+
+        reused = sum(end - start for start, end in completed)
+        range_downloader.completed = completed
+        range_downloader.add_completed(tail_start, range_downloader.file_size)
+        range_downloader.save_manifest()
+
+        logging.info(
+            f"Delta download: {int(reused / 1024 / 1024)}MB of {int(range_downloader.file_size / 1024 / 1024)}MB "
+            f"are reused from {self.seed_file}"
+        )
+        return reused
+
+    def fetch_central_directory(self):
+        """
+        Download the end of the archive, growing downloaded tail until it contains whole central directory
+        Returns: (int) offset where downloaded tail starts
+        """
+        range_downloader = self.range_downloader
+        file_size = range_downloader.file_size
+        tail_size = min(DELTA_TAIL_SIZE, file_size)
+        fetched_start = file_size
+        with open(range_downloader.file_path, "r+b") as file:
+            while True:
+                tail_start = file_size - tail_size
+                file.seek(tail_start)
+                for data in range_downloader.fetch_range(tail_start, fetched_start):
+                    file.write(data)
+                file.flush()
+                fetched_start = tail_start
+
+                try:
+                    _, start_dir = self.read_members(range_downloader.file_path)
+                    if start_dir >= tail_start:
+                        return tail_start
+                except zipfile.BadZipFile:
+                    if tail_size == file_size:
+                        raise
+
+                tail_size = min(tail_size * 8, file_size)
+
+    @staticmethod
+    def read_members(zip_file):
+        """
+        Read central directory of the archive
+        Args:
+            zip_file: (str) path to the archive
+
+        Returns: (tuple) list of zipfile.ZipInfo and offset of central directory
+        """
+        with zipfile.ZipFile(zip_file, "r") as zip_ref:
+            return zip_ref.infolist(), zip_ref.start_dir
+
+    @staticmethod
+    def member_spans(members, start_dir):
+        """
+        Get members of the archive with the end of their data (local header, content and data descriptor)
+        Args:
+            members: (list) list of zipfile.ZipInfo
+            start_dir: (int) offset of central directory
+
+        Returns: (list) list of tuples with member and exclusive end of its data
+        """
+        members = sorted(members, key=lambda member: member.header_offset)
+        members_end = [member.header_offset for member in members[1:]] + [start_dir]
+        return list(zip(members, members_end))
+
+    @staticmethod
+    def get_local_header(member, seed_member, seed_local_extra):
+        """
+        Reconstruct local header of the remote member from its central directory entry. Local extra field is not
+        part of central directory: if seed stores the same extra field in local header and in central directory
+        (eg NTFS times), the same is expected from the remote archive. If they differ (eg extended timestamp with
+        access time), local extra of the seed is expected only if central extra field did not change
+        Args:
+            member: (zipfile.ZipInfo) member of the remote archive
+            seed_member: (zipfile.ZipInfo) member of the seed archive with the same name
+            seed_local_extra: (bytes) extra field of the local header in the seed
+
+        Returns: (bytes) expected local header with file name and extra field, empty if it cannot be reconstructed
+        """
+        if seed_local_extra == seed_member.extra:
+            extra = member.extra
+        elif member.extra == seed_member.extra:
+            extra = seed_local_extra
+        else:
+            return b""
+
+        if member.flag_bits & 0x08:
+            # CRC and sizes are stored in data descriptor after the data
+            crc, compress_size, file_size = 0, 0, 0
+        else:
+            crc, compress_size, file_size = member.CRC, member.compress_size, member.file_size
+
+        filename = member.orig_filename.encode("utf-8" if member.flag_bits & 0x800 else "cp437")
+        return (
+            struct.pack(
+                "<4s2B2H",
+                b"PK\x03\x04",
+                member.extract_version,
+                member.reserved,
+                member.flag_bits,
+                member.compress_type,
+            )
+            + get_dos_date_time(member.date_time)
+            + struct.pack(
+                "<3L2H", crc, min(compress_size, 0xFFFFFFFF), min(file_size, 0xFFFFFFFF), len(filename), len(extra)
+            )
+            + filename
+            + extra
+        )
+
+    @staticmethod
+    def is_same_member(member, member_end, seed_member, seed_member_end):
+        """
+        Check that member could be copied from the seed
+        Args:
+            member: (zipfile.ZipInfo) member of the remote archive
+            member_end: (int) end of the member data in the remote archive
+            seed_member: (zipfile.ZipInfo) member of the seed archive with the same name
+            seed_member_end: (int) end of the member data in the seed archive
+
+        Returns: (bool) True if member did not change
+        """
+        return (
+            member.CRC == seed_member.CRC
+            and member.compress_size == seed_member.compress_size
+            and member.file_size == seed_member.file_size
+            and member.compress_type == seed_member.compress_type
+            and member.flag_bits == seed_member.flag_bits
+            and member_end - member.header_offset == seed_member_end - seed_member.header_offset
+        )
+
+
+class DownloadingFileReader:
+    """
+    Sequential file-like reader of the file that blocks until requested bytes are downloaded by RangeDownloader
+    """
+
+    def __init__(self, range_downloader):
+        self.range_downloader = range_downloader
+        self.position = 0
+        self.file = None
+
+    def read(self, size=-1):
+        end = self.range_downloader.file_size
+        if size >= 0:
+            end = min(self.position + size, end)
+
+        self.range_downloader.wait_for(self.position, end)
+        if self.file is None:
+            # file is opened only when first bytes are downloaded, before that download could not yet create it.
+            # Unbuffered file, otherwise read ahead would cache bytes that are not downloaded yet
+            self.file = open(self.range_downloader.file_path, "rb", buffering=0)
+
+        data = b""
+        while self.position < end:
+            chunk = self.file.read(end - self.position)
+            if not chunk:
+                break
+            data += chunk
+            self.position += len(chunk)
+        return data
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class StreamHasher:
+    """
+    Calculates MD5 and SHA256 of the file incrementally while it is downloaded. Data must be fed in order of file offset
+    """
+
+    def __init__(self):
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.position = 0
+
+    def update(self, data):
+        self.md5.update(data)
+        self.sha256.update(data)
+        self.position += len(data)
+
+    def update_from_file(self, file_path, end):
+        """
+        Read file from the current position of the hasher till the end and update hashes
+        Args:
+            file_path: (str) path to the file
+            end: (int) offset in file where to stop, exclusive
+
+        Returns: None
+        """
+        with open(file_path, "rb") as file:
+            file.seek(self.position)
+            while self.position < end:
+                data = file.read(min(RANGE_READ_SIZE, end - self.position))
+                if not data:
+                    break
+                self.update(data)
+
+    def hexdigests(self):
+        return {"md5": self.md5.hexdigest(), "sha256": self.sha256.hexdigest()}
+
+
+class AdmissionSlot:
+    """
+    Slot of the admission server that allows heavy download to start, see docker/admission. Client waits until the
+    server grants a slot, lease of the slot is renewed in a background thread while download is running.
+    If admission server is not configured or not available, download starts without a slot
+    """
+
+    def __init__(self, url, client, server, status_func=None):
+        """
+        Args:
+            url: (str) URL of the admission server, empty if admission is not used
+            client: (str) identifier of the client, the same client gets the same slot on repeated request
+            server: (str) name of the server to download from, slots are counted per server
+            status_func: function that accepts status message shown while client waits
+        """
+        self.url = url.rstrip("/")
+        self.client = client
+        self.server = server
+        self.status_func = status_func
+        self.token = ""
+        self.lease = 0
+
+        self._stop = Event()
+        self._renew_thread = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def acquire(self):
+        """
+        Wait for a free slot. Waiting is limited by ADMISSION_MAX_WAIT, then download starts without a slot
+        Returns: None
+        """
+        if not self.url:
+            return
+
+        deadline = time.time() + ADMISSION_MAX_WAIT
+        while True:
+            try:
+                response = requests.post(
+                    f"{self.url}/acquire",
+                    json={"client": self.client, "server": self.server},
+                    timeout=ADMISSION_TIMEOUT,
+                )
+            except RequestException as err:
+                logging.warning(f"Admission server is not available: {err}. Start download without a slot")
+                return
+
+            if response.status_code == 200:
+                content = response.json()
+                self.token = content["token"]
+                self.lease = content["lease"]
+                logging.info(f"Download slot of {self.server} is granted")
+                self._renew_thread = Thread(target=self.renew, daemon=True)
+                self._renew_thread.start()
+                return
+
+            if response.status_code != 429:
+                logging.warning(f"Admission server returned {response.status_code}. Start download without a slot")
+                return
+
+            retry_after = response.headers.get("Retry-After", "")
+            retry_after = int(retry_after) if retry_after.isdigit() else ADMISSION_RETRY_AFTER
+            if time.time() + retry_after > deadline:
+                logging.warning("No download slot is granted in time. Start download without a slot")
+                return
+
+            msg = f"All download slots of {self.server} are busy. Retry in {retry_after}s"
+            logging.info(msg)
+            if callable(self.status_func):
+                self.status_func(msg)
+            time.sleep(retry_after)
+
+    def renew(self):
+        """
+        Renew lease of the slot until it is released
+        Returns: None
+        """
+        while not self._stop.wait(self.lease / 3):
+            try:
+                response = requests.post(f"{self.url}/renew", json={"token": self.token}, timeout=ADMISSION_TIMEOUT)
+                if response.status_code != 200:
+                    logging.warning(f"Lease of download slot cannot be renewed: {response.status_code}")
+            except RequestException as err:
+                logging.warning(f"Lease of download slot cannot be renewed: {err}")
+
+    def release(self):
+        """
+        Free the slot, so next client could start download
+        Returns: None
+        """
+        if not self.token:
+            return
+
+        self._stop.set()
+        self._renew_thread.join()
+        try:
+            requests.post(f"{self.url}/release", json={"token": self.token}, timeout=ADMISSION_TIMEOUT)
+        except RequestException as err:
+            logging.warning(f"Download slot cannot be released, it will expire: {err}")
+        self.token = ""
+
+
+class BandwidthLimiter:
+    """
+    Token bucket that limits transfer rate of all connections of the process. Limit depends on time of the day:
+    each profile defines a time window and the rate, eg capped during working hours and unlimited at night.
+    Profiles are reloaded periodically, so limit could be changed while transfer is running.
+    Achieved and allowed rate are written to the log
+    """
+
+    def __init__(self, profiles_func):
+        """
+        Args:
+            profiles_func: function that returns list of profiles: dict with start, end (HH:MM) and rate in Mbit/s.
+                Outside of all profiles transfer is not limited
+        """
+        self.profiles_func = profiles_func
+        self.profiles = []  # parsed profiles: start time, end time and rate
+        self.rate = 0
+        self.tokens = 0
+        self.transferred = 0
+
+        self._lock = Lock()
+        self._last_refill = time.time()
+        self._last_reload = 0
+        self._last_log = time.time()
+
+    def consume(self, size):
+        """
+        Take tokens for transferred data, sleep if transfer is faster than allowed
+        Args:
+            size: (int) number of transferred bytes
+
+        Returns: None
+        """
+        with self._lock:
+            now = time.time()
+            self.update_rate(now)
+            self.transferred += size
+            self.log_rate(now)
+
+            elapsed = now - self._last_refill
+            self._last_refill = now
+            if not self.rate:
+                return
+
+            # burst is limited to one second of transfer
+            self.tokens = min(self.rate, self.tokens + elapsed * self.rate) - size
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if delay:
+            time.sleep(delay)
+
+    def update_rate(self, now):
+        """
+        Reload profiles if reload period has passed and select rate limit for the current time of the day.
+        Should be called with acquired lock
+        Args:
+            now: (float) current timestamp
+
+        Returns: None
+        """
+        if now - self._last_reload >= BANDWIDTH_RELOAD_PERIOD:
+            self._last_reload = now
+            try:
+                self.profiles = [
+                    (
+                        parse_time_of_day(profile.get("start", "00:00")),
+                        parse_time_of_day(profile.get("end", "24:00")),
+                        profile.get("rate", 0),
+                    )
+                    for profile in self.profiles_func() or []
+                ]
+            except (OSError, ValueError, TypeError) as err:
+                logging.warning(f"Bandwidth profiles cannot be loaded: {err}")
+
+        rate = 0
+        current_time = datetime.datetime.fromtimestamp(now).time()
+        for start, end, profile_rate in self.profiles:
+            # window could wrap around midnight, eg 22:00-06:00
+            in_window = start <= current_time < end if start <= end else not end <= current_time < start
+            if in_window:
+                rate = profile_rate * 1000 * 1000 / 8
+                break
+
+        if rate != self.rate:
+            logging.info(f"Bandwidth limit is set to {format_rate(rate)}")
+            self.rate = rate
+            self.tokens = min(self.tokens, rate)
+
+    def log_rate(self, now):
+        """
+        Write achieved and allowed rate to the log once per log period. Should be called with acquired lock
+        Args:
+            now: (float) current timestamp
+
+        Returns: None
+        """
+        elapsed = now - self._last_log
+        if elapsed < BANDWIDTH_LOG_PERIOD:
+            return
+
+        achieved = self.transferred * 8 / elapsed / 1000 / 1000
+        logging.info(f"Transfer rate {achieved:.1f}Mbit/s, allowed {format_rate(self.rate)}")
+        self.transferred = 0
+        self._last_log = now
+
+
+class BufferPool:
+    """
+    Pool of preallocated buffers shared by all streams of the process. Total size of the buffers is limited by the
+    memory budget: if budget is exhausted, stream waits until another stream returns its buffer
+    """
+
+    def __init__(self, buffer_size, budget):
+        """
+        Args:
+            buffer_size: (int) size of a single buffer in bytes
+            budget: (int) upper limit of memory allocated by the pool in bytes
+        """
+        self.buffer_size = buffer_size
+        self.budget = budget
+        self.available = budget
+        self._free = []
+        self._condition = Condition()
+
+    def acquire(self):
+        """
+        Take free buffer or allocate a new one if budget allows
+        Returns: (bytearray) buffer of buffer_size
+        """
+        with self._condition:
+            while not self._free and self.available < self.buffer_size:
+                self._condition.wait()
+
+            if self._free:
+                return self._free.pop()
+
+            self.available -= self.buffer_size
+            return bytearray(self.buffer_size)
+
+    def release(self, buffer):
+        """
+        Return buffer to the pool
+        Args:
+            buffer: (bytearray) buffer taken by acquire()
+
+        Returns: None
+        """
+        with self._condition:
+            self._free.append(buffer)
+            self._condition.notify()
+
+    @contextmanager
+    def reserve(self, size):
+        """
+        Reserve part of the budget for memory that is allocated outside of the pool, eg by third party library.
+        Free buffers are dropped if budget is not enough
+        Args:
+            size: (int) number of bytes to reserve, limited by the budget
+
+        Returns: None
+        """
+        size = min(size, self.budget)
+        with self._condition:
+            while self.available < size:
+                if self._free:
+                    self._free.pop()
+                    self.available += self.buffer_size
+                else:
+                    self._condition.wait()
+            self.available -= size
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.available += size
+                self._condition.notify_all()
+
+
+BUFFER_POOL = BufferPool(STREAM_BUFFER_SIZE, STREAM_MEMORY_BUDGET)
+
+
+class ArchiveIndex:
+    """
+    Index of zip, 7z or tar archive members. Allows to list members and read single files straight from the archive
+    without unpacking it. Archive inside of the archive can be opened as a nested index
+    """
+
+    def __init__(self, archive, name=""):
+        """
+        Args:
+            archive: (str) path to the archive or seekable binary file object
+            name: (str) name of the archive used to detect its type when file object is provided
+        """
+        self.name = name or (archive if isinstance(archive, str) else "")
+        self.archive_type = self.detect_type(archive, self.name)
+        self.nested = []
+
+        if self.archive_type == "zip":
+            self.archive = zipfile.ZipFile(archive, "r")
+            self.names = [member.filename for member in self.archive.infolist() if not member.is_dir()]
+        elif self.archive_type == "7z":
+            self.archive = py7zr.SevenZipFile(archive, "r")
+            self.names = [member.filename for member in self.archive.list() if not member.is_directory]
+        elif self.archive_type == "tar":
+            if isinstance(archive, str):
+                self.archive = tarfile.open(archive, "r:*")
+            else:
+                self.archive = tarfile.open(fileobj=archive, mode="r:*")
+            self.names = [member.name for member in self.archive.getmembers() if member.isfile()]
+        else:
+            raise DownloaderError(f"Unsupported archive type of {self.name}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def detect_type(archive, name):
+        """
+        Detect type of the archive by its extension, fall back to the file signature
+        Args:
+            archive: (str) path to the archive or seekable binary file object
+            name: (str) name of the archive
+
+        Returns: (str) zip, 7z, tar or empty string if type is unknown
+        """
+        name = name.lower()
+        if name.endswith(".zip"):
+            return "zip"
+        if name.endswith(".7z"):
+            return "7z"
+        if name.endswith((".tgz", ".tar", ".tar.gz")):
+            return "tar"
+
+        position = None if isinstance(archive, str) else archive.tell()
+        try:
+            if zipfile.is_zipfile(archive):
+                return "zip"
+            if not isinstance(archive, str):
+                archive.seek(position)
+            if py7zr.is_7zfile(archive):
+                return "7z"
+        finally:
+            if position is not None:
+                archive.seek(position)
+
+        if isinstance(archive, str) and tarfile.is_tarfile(archive):
+            return "tar"
+        return ""
+
+    def find(self, suffix):
+        """
+        Find members which path ends with suffix, comparison is case-insensitive
+        Args:
+            suffix: (str) end of the member path, eg file name
+
+        Returns: (list) names of found members
+        """
+        suffix = suffix.replace("\\", "/").lower()
+        return [name for name in self.names if name.lower().endswith(suffix)]
+
+    def open(self, member):
+        """
+        Open archive member as binary file object
+        Args:
+            member: (str) name of the member
+
+        Returns: binary file object
+        """
+        if member not in self.names:
+            raise DownloaderError(f"{member} does not exist in {self.name}")
+
+        if self.archive_type == "zip":
+            return self.archive.open(member)
+        if self.archive_type == "tar":
+            return self.archive.extractfile(member)
+
+        # py7zr decompresses to memory and requires reset of the archive before next read
+        content = self.archive.read(targets=[member])[member]
+        self.archive.reset()
+        return content
+
+    def read(self, member):
+        """
+        Read archive member
+        Args:
+            member: (str) name of the member
+
+        Returns: (bytes) content of the member
+        """
+        with self.open(member) as file:
+            return file.read()
+
+    def read_text(self, member):
+        """
+        Read archive member as text with universal newlines, the same as open() in text mode does
+        Args:
+            member: (str) name of the member
+
+        Returns: (str) content of the member
+        """
+        with io.TextIOWrapper(self.open(member)) as file:
+            return file.read()
+
+    def open_nested(self, member):
+        """
+        Open index of the archive that is packed inside of current archive. Nested index is closed with the parent
+        Args:
+            member: (str) name of the nested archive
+
+        Returns: (ArchiveIndex) index of the nested archive
+        """
+        nested = ArchiveIndex(self.open(member), name=member)
+        self.nested.append(nested)
+        return nested
+
+    def close(self):
+        for nested in self.nested:
+            nested.close()
+        self.archive.close()
+
+
+class BuildCache:
+    """
+    Local cache of downloaded build archives shared between products and users of the machine.
+    Archives are stored under the key made of checksum and build date and are hard linked to the download folder.
+    Least recently used archives are evicted when size of the cache exceeds the limit. Index is modified only under
+    the process lock, so concurrent runs do not lose entries or evict archive that is being linked
+    """
+
+    def __init__(self, cache_dir, max_size):
+        """
+        Args:
+            cache_dir: (str) folder where archives and index of the cache are stored
+            max_size: (int) maximum size of the cache in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.index_file = os.path.join(cache_dir, "cache_index.json")
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def load_index(self):
+        """
+        Read index of the cache
+        Returns: (dict) entries of the cache and hit statistics
+        """
+        try:
+            with open(self.index_file) as file:
+                return json.load(file)
+        except (OSError, json.decoder.JSONDecodeError):
+            return {"entries": {}, "hits": 0, "misses": 0}
+
+    def save_index(self, index):
+        temp_index = f"{self.index_file}.{os.getpid()}.tmp"
+        with open(temp_index, "w") as file:
+            json.dump(index, file, indent=4)
+        os.replace(temp_index, self.index_file)
+
+    def fetch(self, key, target_path):
+        """
+        Link cached archive to the target path
+        Args:
+            key: (str) key of the build
+            target_path: (str) path where archive is expected
+
+        Returns: (dict) entry of the cache or None if build is not cached
+        """
+        with process_lock("cache_index", self.cache_dir):
+            index = self.load_index()
+            entry = index["entries"].get(key)
+            cached_file = os.path.join(self.cache_dir, entry["file"]) if entry else ""
+            if not entry or not os.path.isfile(cached_file) or os.path.getsize(cached_file) != entry["size"]:
+                index["entries"].pop(key, None)
+                index["misses"] += 1
+                self.save_index(index)
+                logging.info(f"Build cache miss for {key}. {self.statistics(index)}")
+                return None
+
+            if os.path.isfile(target_path):
+                os.remove(target_path)
+            link_file(cached_file, target_path)
+
+            entry["last_used"] = time.time()
+            index["hits"] += 1
+            self.save_index(index)
+        logging.info(f"Build cache hit for {key}. {self.statistics(index)}")
+        return entry
+
+    def find_latest(self, version):
+        """
+        Find the most recently used archive of the version
+        Args:
+            version: (str) version of the product, eg v221_ElectronicsDesktop
+
+        Returns: (str) path to the cached archive or empty string if version is not cached
+        """
+        entries = [entry for entry in self.load_index()["entries"].values() if entry.get("version") == version]
+        for entry in sorted(entries, key=lambda cache_entry: cache_entry["last_used"], reverse=True):
+            cached_file = os.path.join(self.cache_dir, entry["file"])
+            if os.path.isfile(cached_file):
+                return cached_file
+        return ""
+
+    def store(self, key, file_path, **metadata):
+        """
+        Add downloaded archive to the cache and evict least recently used archives if cache is full
+        Args:
+            key: (str) key of the build
+            file_path: (str) path to the downloaded archive
+            **metadata: additional info saved with the entry, eg version and hashes
+
+        Returns: None
+        """
+        file_size = os.path.getsize(file_path)
+        if file_size > self.max_size:
+            logging.info(f"Archive is larger than build cache size limit, {key} is not cached")
+            return
+
+        cached_file = os.path.join(self.cache_dir, key + os.path.splitext(file_path)[1])
+        if not os.path.isfile(cached_file):
+            temp_file = f"{cached_file}.{os.getpid()}.tmp"
+            link_file(file_path, temp_file)
+            os.replace(temp_file, cached_file)
+
+        with process_lock("cache_index", self.cache_dir):
+            index = self.load_index()
+            index["entries"][key] = dict(
+                metadata, file=os.path.basename(cached_file), size=file_size, last_used=time.time()
+            )
+            self.evict(index)
+            self.save_index(index)
+        logging.info(f"Archive is added to build cache as {key}. {self.statistics(index)}")
+
+    def evict(self, index):
+        """
+        Remove least recently used archives until size of the cache fits into the limit. Should be called with
+        acquired process lock
+        Args:
+            index: (dict) index of the cache, modified in place
+
+        Returns: None
+        """
+        cache_size = sum(entry["size"] for entry in index["entries"].values())
+        for key, entry in sorted(index["entries"].items(), key=lambda item: item[1]["last_used"]):
+            if cache_size <= self.max_size:
+                break
+
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except FileNotFoundError:
+                pass
+            except OSError as err:
+                # archive could be in use by another process, retry on next eviction
+                logging.warning(f"Cannot evict {key} from build cache: {err}")
+                continue
+
+            cache_size -= entry["size"]
+            del index["entries"][key]
+            logging.info(f"{key} is evicted from build cache")
+
+    def statistics(self, index):
+        cache_size = sum(entry["size"] for entry in index["entries"].values())
+        requests_count = index["hits"] + index["misses"]
+        hit_rate = index["hits"] / requests_count * 100 if requests_count else 0
+        return (
+            f"Cache hits: {index['hits']}, misses: {index['misses']} ({hit_rate:.0f}% hit rate), "
+            f"size: {cache_size / 1024**3:.1f}/{self.max_size / 1024**3:.1f}GB in {len(index['entries'])} archives"
+        )
+
+
+class MirrorRanking:
+    """
+    Ranking of Artifactory mirrors persisted between runs. Throughput and latency of each mirror are exponentially
+    decayed averages of the measurements, so the ranking follows changes of the network. Every failure halves
+    throughput of the mirror
+    """
+
+    def __init__(self, ranking_file):
+        """
+        Args:
+            ranking_file: (str) JSON file where ranking is saved
+        """
+        self.ranking_file = ranking_file
+        try:
+            with open(ranking_file) as file:
+                self.mirrors = json.load(file)
+        except (OSError, json.decoder.JSONDecodeError):
+            self.mirrors = {}
+
+    def update(self, name, throughput=0, latency=0, failed=False):
+        """
+        Add measurement of the mirror to the ranking
+        Args:
+            name: (str) name of the mirror
+            throughput: (float) measured throughput in bytes per second
+            latency: (float) measured latency in seconds
+            failed: (bool) True if mirror was not reachable or failed during download
+
+        Returns: None
+        """
+        mirror = self.mirrors.setdefault(name, {"throughput": 0, "latency": 0, "failures": 0})
+        if failed:
+            mirror["throughput"] *= MIRROR_RANKING_DECAY
+            mirror["failures"] += 1
+        else:
+            for key, value in (("throughput", throughput), ("latency", latency)):
+                previous = mirror[key]
+                mirror[key] = (
+                    value if not previous else MIRROR_RANKING_DECAY * previous + (1 - MIRROR_RANKING_DECAY) * value
+                )
+            mirror["failures"] = 0
+        mirror["updated"] = time.time()
+
+    def rank(self, latencies):
+        """
+        Order mirrors from the best to the worst. Mirrors are ordered by throughput, mirrors without measurements
+        by latency. Mirror with the lowest latency always gets into the first probe batch to explore new mirrors
+        Args:
+            latencies: (dict) latency of each reachable mirror
+
+        Returns: (list) names of mirrors
+        """
+
+        def throughput(name):
+            return self.mirrors.get(name, {}).get("throughput", 0)
+
+        ordered = sorted(latencies, key=lambda name: (-throughput(name), latencies[name]))
+        fastest_ping = min(latencies, key=latencies.get, default="")
+        if fastest_ping and ordered.index(fastest_ping) >= MIRROR_PROBE_COUNT:
+            ordered.remove(fastest_ping)
+            ordered.insert(MIRROR_PROBE_COUNT - 1, fastest_ping)
+        return ordered
+
+    def save(self):
+        temp_file = f"{self.ranking_file}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as file:
+            json.dump(self.mirrors, file, indent=4)
+        os.replace(temp_file, self.ranking_file)
+
+
+class MetadataCache:
+    """
+    Artifactory metadata (repositories, build folders, build info files) persisted between runs. Entry is used without
+    request while it is younger than its time to live, after that it is revalidated with conditional request using
+    ETag and Last-Modified of the stored response, so unchanged metadata costs only 304 response.
+    Updated entries are kept in memory and written once per run by save()
+    """
+
+    def __init__(self, cache_file):
+        """
+        Args:
+            cache_file: (str) JSON file where metadata is saved
+        """
+        self.cache_file = cache_file
+        self.entries = self.load()
+        self.updated_keys = set()
+
+        self._lock = Lock()
+
+    def load(self):
+        """
+        Read entries from the cache file
+        Returns: (dict) entries of the cache, empty if file is missing or broken
+        """
+        try:
+            with open(self.cache_file) as file:
+                return json.load(file)
+        except (OSError, json.decoder.JSONDecodeError):
+            return {}
+
+    def get(self, key, ttl):
+        """
+        Get cached content if it is fresh
+        Args:
+            key: (str) key of the entry, eg URL
+            ttl: (int) time to live of the entry in seconds
+
+        Returns: cached content or None if entry is missing or expired
+        """
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry["updated"] >= ttl:
+            return None
+        return entry["content"]
+
+    def store(self, key, content, etag="", last_modified=""):
+        """
+        Add entry to the cache, entry is written to the file by save()
+        Args:
+            key: (str) key of the entry, eg URL
+            content: content that could be serialized to JSON
+            etag: (str) ETag header of the response
+            last_modified: (str) Last-Modified header of the response
+
+        Returns: None
+        """
+        with self._lock:
+            self.entries[key] = {
+                "content": content,
+                "etag": etag,
+                "last_modified": last_modified,
+                "updated": time.time(),
+            }
+            self.updated_keys.add(key)
+
+    def fetch(self, session, url, ttl, missing_ok=False, timeout=TIMEOUT):
+        """
+        Get text of the URL from the cache or from the server
+        Args:
+            session: (requests.Session) session with authorization to the server
+            url: (str) URL to request
+            ttl: (int) seconds during which cached text is used without request
+            missing_ok: (bool) return None if server responds with 404 instead of raising the error
+            timeout: (int) timeout of the request in seconds
+
+        Returns: (str) text of the response
+        """
+        content = self.get(url, ttl)
+        if content is not None:
+            return content
+
+        entry = self.entries.get(url)
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = session.get(url, headers=headers, timeout=timeout)
+        if entry is not None and response.status_code == 304:
+            self.store(url, entry["content"], entry["etag"], entry["last_modified"])
+            return entry["content"]
+
+        if missing_ok and response.status_code == 404:
+            return None
+
+        raise_for_status(response)
+        self.store(url, response.text, response.headers.get("ETag", ""), response.headers.get("Last-Modified", ""))
+        return response.text
+
+    def save(self):
+        """
+        Save entries updated during the run to the file. File is shared by runs of all products, so entries are merged
+        with the current content of the file under the process lock. Entries that were not used for long time are
+        removed
+        Returns: None
+        """
+        with self._lock:
+            if not self.updated_keys:
+                return
+
+            try:
+                with process_lock("metadata_cache", os.path.dirname(self.cache_file)):
+                    entries = self.load()
+                    for key in self.updated_keys:
+                        if key not in entries or entries[key]["updated"] <= self.entries[key]["updated"]:
+                            entries[key] = self.entries[key]
+
+                    now = time.time()
+                    for key in [
+                        key for key, entry in entries.items() if now - entry["updated"] > METADATA_CACHE_MAX_AGE
+                    ]:
+                        del entries[key]
+
+                    temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+                    with open(temp_file, "w") as file:
+                        json.dump(entries, file)
+                    os.replace(temp_file, self.cache_file)
+            except OSError as err:
+                logging.warning(f"Metadata cache cannot be saved: {err}")
+                return
+
+            self.entries = entries
+            self.updated_keys.clear()
+
+
+class CredentialCache:
+    """
+    Secrets stored in a file of the user profile. On Windows content is encrypted with DPAPI for the current user,
+    so other users of the machine cannot read it
+    """
+
+    def __init__(self, cache_file):
+        """
+        Args:
+            cache_file: (str) file where secrets are saved
+        """
+        self.cache_file = cache_file
+
+    def load(self):
+        """
+        Read secrets from the cache
+        Returns: (dict) secrets or empty dict if cache is missing or cannot be decrypted
+        """
+        try:
+            with open(self.cache_file, "rb") as file:
+                return json.loads(unprotect_data(file.read()))
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, content):
+        """
+        Write secrets to the cache
+        Args:
+            content: (dict) secrets
+
+        Returns: None
+        """
+        temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as file:
+                file.write(protect_data(json.dumps(content).encode()))
+            os.replace(temp_file, self.cache_file)
+        except OSError as err:
+            logging.warning(f"Credentials cannot be cached: {err}")
+
+
+class DataBlob(ctypes.Structure):
+    _fields_ = [("cbData", ctypes.c_ulong), ("pbData", ctypes.POINTER(ctypes.c_char))]
+
+
+def call_dpapi(function, data):
+    """
+    Call CryptProtectData or CryptUnprotectData of Windows Data Protection API
+    Args:
+        function: DPAPI function
+        data: (bytes) input data
+
+    Returns: (bytes) output data
+    """
+    buffer = ctypes.create_string_buffer(data, len(data))
+    data_in = DataBlob(len(data), ctypes.cast(buffer, ctypes.POINTER(ctypes.c_char)))
+    data_out = DataBlob()
+    if not function(ctypes.byref(data_in), None, None, None, None, CRYPTPROTECT_UI_FORBIDDEN, ctypes.byref(data_out)):
+        raise ctypes.WinError()
+
+    try:
+        return ctypes.string_at(data_out.pbData, data_out.cbData)
+    finally:
+        ctypes.windll.kernel32.LocalFree(data_out.pbData)
+
+
+def protect_data(data):
+    """
+    Encrypt data for the current Windows user. On other systems data is protected only by file permissions
+    Args:
+        data: (bytes) data to encrypt
+
+    Returns: (bytes) encrypted data
+    """
+    if sys.platform != "win32":
+        return data
+    return call_dpapi(ctypes.windll.crypt32.CryptProtectData, data)
+
+
+def unprotect_data(data):
+    """
+    Decrypt data encrypted by protect_data()
+    Args:
+        data: (bytes) encrypted data
+
+    Returns: (bytes) decrypted data
+    """
+    if sys.platform != "win32":
+        return data
+    return call_dpapi(ctypes.windll.crypt32.CryptUnprotectData, data)
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP connections shared by all sessions of one run. Sessions to Artifactory, SharePoint and InfluxDB
+    send requests through the same adapter, so connection to the server is reused instead of new TCP and TLS handshake
+    for every request
+    """
+
+    def __init__(self, pool_size):
+        """
+        Args:
+            pool_size: (int) number of servers and number of connections to a single server kept open
+        """
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def session(self, auth=None):
+        """
+        Create session that sends requests through the pool. Sessions are cheap, separate sessions keep different
+        authorization and parameters (eg Artifactory archive parameters) apart
+        Args:
+            auth: (tuple) username and password for basic authorization
+
+        Returns: (requests.Session) session
+        """
+        session = requests.Session()
+        session.auth = auth
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        return session
+
+    def statistics(self):
+        """
+        Count requests and opened connections to all servers
+        Returns: (tuple) number of requests and number of opened connections
+        """
+        requests_count = 0
+        connections = 0
+        for manager in [self.adapter.poolmanager] + list(self.adapter.proxy_manager.values()):
+            for key in manager.pools.keys():
+                pool = manager.pools.get(key)
+                if pool is not None:
+                    requests_count += pool.num_requests
+                    connections += pool.num_connections
+        return requests_count, connections
+
+
+def ping_mirror(server, session):
+    """
+    Measure latency of Artifactory server using ping API that does not require authentication
+    Args:
+        server: (str) URL of the server
+        session: (requests.Session) session of the connection pool, connection is reused by following requests
+
+    Returns: (float) latency in seconds or None if server is not reachable
+    """
+    start_time = time.time()
+    try:
+        response = session.get(f"{server}/api/system/ping", timeout=MIRROR_PING_TIMEOUT)
+        response.raise_for_status()
+    except RequestException:
+        return None
+    return time.time() - start_time
+
+
+def get_repo_version(repo_name):
+    """
+    Get version of the product stored in the repository
+    Args:
+        repo_name: (str) name of the repository, eg v221_EBU_Certified
+
+    Returns: (str) version, eg v221_ElectronicsDesktop, or empty string if repository does not hold certified builds
+    """
+    if "EBU_Certified" in repo_name:
+        return repo_name.split("_")[0] + "_ElectronicsDesktop"
+    elif "Certified" in repo_name and "Licensing" not in repo_name:
+        return repo_name.split("_")[0] + "_Workbench"
+    elif "Certified" in repo_name and "Licensing" in repo_name:
+        return repo_name.split("_")[0] + "_LicenseManager"
+    return ""
+
+
+def run_concurrently(calls, limit=DISCOVERY_CONCURRENCY):
+    """
+    Run blocking calls, eg metadata requests to Artifactory, concurrently in a thread pool. Number of calls in
+    flight is limited by the size of the pool, so server is not flooded
+    Args:
+        calls: (list) functions without arguments
+        limit: (int) maximum number of calls running at the same time
+
+    Returns: (list) results of the calls in the same order. First exception raised by the calls is reraised
+    """
+    if not calls:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(limit, len(calls))) as pool:
+        return list(pool.map(lambda call: call(), calls))
+
+
+def run_phases(phases):
+    """
+    Run phases of the process in threads, each phase is started as soon as all phases it depends on are completed.
+    After the first failure no new phases are started, phases that are already running are awaited
+    Args:
+        phases: (dict) name of the phase and tuple of function without arguments and names of the phases it depends on
+
+    Returns: (dict) results of the phases by name. First exception raised by the phases is reraised
+    """
+    results = {}
+    errors = []
+    pending = dict(phases)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(len(phases), 1)) as executor:
+        while pending or running:
+            if not errors:
+                for name, (call, dependencies) in list(pending.items()):
+                    if all(dependency in results for dependency in dependencies):
+                        running[executor.submit(call)] = name
+                        del pending[name]
+
+            if not running:
+                if not errors:
+                    errors.append(ValueError(f"Phases {', '.join(pending)} have unresolved dependencies"))
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as err:
+                    errors.append(err)
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+@contextmanager
+def process_lock(name, lock_dir, timeout=PROCESS_LOCK_TIMEOUT):
+    """
+    Lock files shared by several processes, eg scheduled tasks of different products. Waits until the lock is
+    released by another process
+    Args:
+        name: (str) name of the lock file
+        lock_dir: (str) directory of the lock file
+        timeout: (int) maximum time to wait in seconds
+
+    Returns: None. TimeoutError is raised if the lock is not released in time
+    """
+    pid_file = PidFile(name, piddir=lock_dir, register_term_signal_handler=False, register_atexit=False)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            pid_file.create()
+            break
+        except PidFileError:
+            if time.time() > deadline:
+                raise TimeoutError(f"Lock {name} is held by another process")
+            time.sleep(0.1)
+
+    try:
+        yield
+    finally:
+        pid_file.close()
+
+
+def build_is_newer(remote_build_date, installed_build_date):
+    """
+    Compare build dates of the build on the server and of the installed build
+    Args:
+        remote_build_date: (int) build date on the server
+        installed_build_date: (int) build date of the installed product
+
+    Returns: (bool) True if remote build is newer or some of the dates could not be parsed (need installation)
+    """
+    if not all([remote_build_date, installed_build_date]):
+        return True
+    return remote_build_date > installed_build_date
+
+
+def odata_string(value):
+    """
+    Quote string for OData query
+    Args:
+        value: (str) string value
+
+    Returns: (str) quoted string literal
+    """
+    return "'{}'".format(value.replace("'", "''"))
+
+
+def get_build_date_from_path(path):
+    """
+    Get build date from URL of Electronics Desktop build (folder of the archive is named by build date)
+    Args:
+        path: (ArtifactoryPath) URL to the build
+
+    Returns: (int) build date or 0 if URL does not contain it
+    """
+    try:
+        return int(path.parent.name)
+    except ValueError:
+        return 0
+
+
+def select_tree_files(files, wb_flags):
+    """
+    Skip packages of Workbench products that are not selected for installation. Product package is a top level
+    folder named after the product flag, all other files (setup, common files) are always kept.
+    If no product flags are selected, installer installs all products and all files are kept
+    Args:
+        files: (dict) path of the file relative to the build folder and its AQL item
+        wb_flags: (list) installation flags
+
+    Returns: (dict) files that are required for installation
+    """
+    selected = {flag.lstrip("-").lower() for flag in wb_flags if flag in WB_PRODUCT_FLAGS}
+    if not selected:
+        return files
+
+    skipped = {flag.lstrip("-") for flag in WB_PRODUCT_FLAGS} - selected
+    return {
+        relative_path: item
+        for relative_path, item in files.items()
+        if "/" not in relative_path or relative_path.split("/")[0].lower() not in skipped
+    }
+
+
+def get_dos_date_time(date_time):
+    """
+    Convert date and time of zip member to MS-DOS format used in zip headers
+    Args:
+        date_time: (tuple) year, month, day, hour, minute, second
+
+    Returns: (bytes) time and date, 2 bytes each, little endian
+    """
+    year, month, day, hour, minute, second = date_time
+    dos_time = hour << 11 | minute << 5 | second // 2
+    dos_date = (year - 1980) << 9 | month << 5 | day
+    return dos_time.to_bytes(2, "little") + dos_date.to_bytes(2, "little")
+
+
+def copy_stream(read_into, file, hasher=None, progress_func=None, progress_step=0, rate_limiter=None):
+    """
+    Copy stream to the file through buffers of the global buffer pool. Stream is read in the calling thread and
+    written to the file in a writer thread, they are connected by a bounded queue, so memory usage does not depend on
+    the size of the stream
+    Args:
+        read_into: function that reads data into given memoryview and returns number of bytes, 0 at the end of stream
+        file: binary file opened for writing
+        hasher: (StreamHasher) hasher updated with the copied data
+        progress_func: function that accepts number of copied bytes
+        progress_step: (int) minimal number of bytes between calls of progress function
+        rate_limiter: (BandwidthLimiter) limiter of the transfer rate
+
+    Returns: (int) number of copied bytes
+    """
+    queue = Queue(maxsize=STREAM_READ_AHEAD)
+    errors = []
+
+    def write():
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+
+            buffer, size = item
+            try:
+                if not errors:
+                    data = memoryview(buffer)[:size]
+                    file.write(data)
+                    if hasher is not None:
+                        hasher.update(data)
+            except OSError as err:
+                errors.append(err)
+            finally:
+                BUFFER_POOL.release(buffer)
+
+    writer = Thread(target=write, daemon=True)
+    writer.start()
+    copied = 0
+    reported = 0
+    try:
+        while not errors:
+            buffer = BUFFER_POOL.acquire()
+            try:
+                size = read_into(memoryview(buffer))
+            except BaseException:
+                BUFFER_POOL.release(buffer)
+                raise
+
+            if not size:
+                BUFFER_POOL.release(buffer)
+                break
+
+            queue.put((buffer, size))
+            copied += size
+            if rate_limiter is not None:
+                rate_limiter.consume(size)
+            if callable(progress_func) and copied - reported >= progress_step:
+                progress_func(copied)
+                reported = copied
+    finally:
+        queue.put(None)
+        writer.join()
+
+    if errors:
+        raise errors[0]
+    return copied
+
+
+def copy_file_bytes(source, target, size):
+    """
+    Copy bytes from current position of source file to current position of target file.
+    Copy is done by the kernel where possible (copy_file_range, sendfile), otherwise through a buffer of the pool
+    Args:
+        source: binary file opened for reading
+        target: binary file opened for writing
+        size: (int) number of bytes to copy
+
+    Returns: None
+    """
+    target.flush()
+    source_position = source.tell()
+    target_position = target.tell()
+    copied = 0
+    try:
+        while copied < size:
+            if hasattr(os, "copy_file_range"):
+                count = os.copy_file_range(
+                    source.fileno(), target.fileno(), size - copied, source_position + copied, target_position + copied
+                )
+            elif hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+                os.lseek(target.fileno(), target_position + copied, os.SEEK_SET)
+                count = os.sendfile(target.fileno(), source.fileno(), source_position + copied, size - copied)
+            else:
+                break
+
+            if not count:
+                break
+            copied += count
+    except OSError:
+        # file system does not support copy in kernel, continue through the buffer
+        pass
+
+    source.seek(source_position + copied)
+    target.seek(target_position + copied)
+    buffer = BUFFER_POOL.acquire()
+    try:
+        view = memoryview(buffer)
+        while copied < size:
+            count = source.readinto(view[: min(len(buffer), size - copied)])
+            if not count:
+                raise DownloaderError("Seed archive is truncated")
+            target.write(view[:count])
+            copied += count
+    finally:
+        BUFFER_POOL.release(buffer)
+
+
+def parse_time_of_day(value):
+    """
+    Parse start or end of the time window of bandwidth profile
+    Args:
+        value: (str) time in H:MM or HH:MM format, 24:00 is the end of the day
+
+    Returns: (datetime.time) parsed time
+    """
+    if value == "24:00":
+        return datetime.time.max
+    return datetime.datetime.strptime(value, "%H:%M").time()
+
+
+def format_rate(rate):
+    """
+    Format rate limit for the log
+    Args:
+        rate: (float) rate limit in bytes per second, 0 if not limited
+
+    Returns: (str) rate in Mbit/s
+    """
+    return f"{rate * 8 / 1000 / 1000:.1f}Mbit/s" if rate else "unlimited"
+
+
+def get_chunk_digests(file_path, chunk_size):
+    """
+    Calculate SHA256 of each chunk of the file
+    Args:
+        file_path: (str) path to the file
+        chunk_size: (int) size of a chunk in bytes
+
+    Returns: (list) hex digests of the chunks
+    """
+    digests = []
+    with open(file_path, "rb") as file:
+        while True:
+            chunk_hash = hashlib.sha256()
+            size = 0
+            while size < chunk_size:
+                data = file.read(min(RANGE_READ_SIZE, chunk_size - size))
+                if not data:
+                    break
+                chunk_hash.update(data)
+                size += len(data)
+
+            if not size:
+                return digests
+            digests.append(chunk_hash.hexdigest())
+
+
+def write_chunk_manifest(file_path, chunk_size=CHUNK_DIGEST_SIZE):
+    """
+    Write chunk manifest of the archive next to it. Manifest is published with the archive so downloaders could
+    repair corrupted chunks instead of downloading the whole archive again
+    Args:
+        file_path: (str) path to the archive
+        chunk_size: (int) size of a chunk in bytes
+
+    Returns: (str) path to the manifest
+    """
+    manifest_file = file_path + CHUNK_MANIFEST_SUFFIX
+    with open(manifest_file, "w") as file:
+        json.dump(
+            {
+                "size": os.path.getsize(file_path),
+                "chunk_size": chunk_size,
+                "sha256": get_chunk_digests(file_path, chunk_size),
+            },
+            file,
+        )
+    return manifest_file
+
+
+def link_file(source, target):
+    """
+    Create hard link to the file. If file system does not support hard links or files are on different volumes,
+    file is copied
+    Args:
+        source: (str) path to the existing file
+        target: (str) path of the new link
+
+    Returns: None
+    """
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def get_zip_member_path(member, target_dir):
+    """
+    Get path where zip member is unpacked. Sanitizes member name the same way as zipfile module does
+    Args:
+        member: (zipfile.ZipInfo) archive member
+        target_dir: (str) directory where archive is unpacked
+
+    Returns: (str) path of the unpacked member
+    """
+    arcname = member.filename.replace("/", os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+
+    arcname = os.path.splitdrive(arcname)[1]
+    parts = [part for part in arcname.split(os.path.sep) if part not in ("", os.path.curdir, os.path.pardir)]
+    if os.path.sep == "\\":
+        parts = [re.sub(r'[:<>|"?*]', "_", part).rstrip(".") for part in parts]
+
+    return os.path.join(target_dir, *[part for part in parts if part])
+
+
+def extract_zip_member(zip_ref, member, target_dir):
+    """
+    Extract single member of zip archive using large write buffer. Parent directory is created if missing
+    Args:
+        zip_ref: (zipfile.ZipFile) opened archive
+        member: (zipfile.ZipInfo) archive member
+        target_dir: (str) directory where archive is unpacked
+
+    Returns: None
+    """
+    target_path = get_zip_member_path(member, target_dir)
+    if member.is_dir():
+        os.makedirs(target_path, exist_ok=True)
+        return
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    with zip_ref.open(member) as source, open(target_path, "wb", buffering=UNPACK_BUFFER_SIZE) as target:
+        shutil.copyfileobj(source, target, UNPACK_BUFFER_SIZE)
+
+
+def extract_zip_members(zip_file, members, target_dir):
+    """
+    Extract list of members from zip archive. Opens own handle of the archive to be used in a separate thread
+    Args:
+        zip_file: (str) path to the archive
+        members: (list) list of zipfile.ZipInfo to extract
+        target_dir: (str) directory where archive is unpacked
+
+    Returns: None
+    """
+    with zipfile.ZipFile(zip_file, "r") as zip_ref:
+        for member in members:
+            extract_zip_member(zip_ref, member, target_dir)
+
+
 def generate_hash_str():
     """
     generate random hash. Letter A at the end is important to preserver Order in JS
@@ -1472,4 +5092,7 @@ def set_logger(logging_file):
 
 if __name__ == "__main__":
     app = Downloader(__version__)
-    app.run()
+    if app.check_paths:
+        app.check_updates()
+    else:
+        app.run()
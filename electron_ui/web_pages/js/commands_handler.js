@@ -118,7 +118,7 @@ function schedule_task(settings_file) {
       }
 
       let command = (`schtasks /CREATE /TN "AnsysDownloader\\${settings.version}" /RL HIGHEST ` +
-          `/TR "${backend_exe} -p ${settings_file}" /d ${days.join(",")} /sc WEEKLY /st ${settings["time"]} /f`)
+          `/TR "${backend_exe} -p ${settings_file} --scheduled" /d ${days.join(",")} /sc WEEKLY /st ${settings["time"]} /f`)
 
       execSync(command);
 }
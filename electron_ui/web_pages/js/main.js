@@ -25,6 +25,7 @@ artifactory_dict = {
 
 app_folder = path.join(app.getPath("appData"), "build_downloader")
 settings_path = path.join(app_folder, "default_settings.json");
+metadata_cache_path = path.join(app_folder, "metadata_cache.json");
 whatisnew_path = path.join(app_folder, "whatisnew.json");
 all_days = ["mo", "tu", "we", "th", "fr", "sa", "su"]
 products_dict = {};
@@ -226,6 +227,12 @@ function request_builds() {
         return;
     }
 
+    let repositories = read_metadata_cache(artifactory_dict[settings.artifactory] + "/api/repositories");
+    if (repositories) {
+        // show versions known from the last run of the downloader while server is requested
+        get_builds(repositories);
+    }
+
     artifactory_request('/api/repositories').then((response)=>{
         if (response && response.status == 200){
             get_builds(response.data);
@@ -234,6 +241,20 @@ function request_builds() {
 }
 
 
+function read_metadata_cache(url) {
+    /**
+     * Read response of Artifactory stored by backend in metadata cache
+     * Returns parsed JSON or null if URL is not cached
+    */
+    try {
+        let entry = JSON.parse(fs.readFileSync(metadata_cache_path))[url];
+        return entry ? JSON.parse(entry.content) : null;
+    } catch (err) {
+        return null;
+    }
+}
+
+
 async function artifactory_request(url, sso_pass="", req_type="get") {
     // // uncomment this snippet (and comment below) to test any status code
     // axios.get('https://httpstat.us/500', {
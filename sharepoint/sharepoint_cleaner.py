@@ -23,7 +23,11 @@ class SharepointCleaner(SharepointUpload):
         Returns: None
         """
         for dist in ["linx64", "winx64"]:
-            items = super().get_list_items(dist)
+            # only columns required for cleaning are transferred, ordered so the latest build of each product is
+            # met first
+            items = super().get_list_items(
+                dist, order_by="Title,build_date desc", fields=["Id", "Title", "build_date", "relative_url"]
+            )
             items_to_keep = {}
             for item in items:
                 title = item.properties["Title"]
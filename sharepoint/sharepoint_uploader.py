@@ -9,7 +9,9 @@ import logging
 import os
 import sys
 from pathlib import Path
+from urllib.parse import urlparse
 
+import requests
 from office365.runtime.auth.authentication_context import AuthenticationContext
 from office365.sharepoint.client_context import ClientContext
 from pid import PidFile
@@ -19,11 +21,18 @@ root_folder = Path(__file__).parent.parent.absolute()
 sys.path.append(str(root_folder))
 
 import downloader_backend as downloader_backend  # noqa: E402  # need for reimport!
+from downloader_backend import BUFFER_POOL  # noqa: E402
+from downloader_backend import CHUNK_MANIFEST_SUFFIX  # noqa: E402
 from downloader_backend import SHAREPOINT_SITE_URL  # noqa: E402
+from downloader_backend import TIMEOUT  # noqa: E402
 from downloader_backend import Downloader  # noqa: E402
+from downloader_backend import odata_string  # noqa: E402
 from downloader_backend import retry  # noqa: E402
+from downloader_backend import write_chunk_manifest  # noqa: E402
 
 app_principal = {"client_id": os.environ["client_id"], "client_secret": os.environ["client_secret"]}
+# site-local caching proxy that downloads new builds in advance, eg http://caching-proxy:8080
+cache_proxy_url = os.environ.get("cache_proxy_url", "")
 
 __version__ = "v2.0.0"
 
@@ -75,15 +84,23 @@ def upload_to_sharepoint(settings_file, distribution):
     else:
         build_date = sp.get_new_build_date(distribution=distribution)
 
-    all_items = sp.get_list_items(distribution=distribution)
-    for item in all_items:
-        if item.properties["Title"] == sp.settings.version and item.properties["build_date"] == build_date:
-            logging.info(f"Build is up to date {item.properties['build_date']} == {build_date}")
-            return
+    items = sp.get_list_items(
+        distribution=distribution,
+        filter_query=f"Title eq {odata_string(sp.settings.version)} and build_date eq {int(build_date)}",
+        top=1,
+        fields=["Title", "build_date"],
+    )
+    if len(items):
+        logging.info(f"Build is up to date {items[0].properties['build_date']} == {build_date}")
+        return
+
+    if cache_proxy_url:
+        sp.prefetch_to_proxy()
 
     sp.download_file()
 
     archive_file = Path(sp.zip_file)
+    manifest_file = Path(write_chunk_manifest(sp.zip_file))
 
     version, product = sp.settings.version.split("_")
     time_now = datetime.datetime.now().strftime("%Y%m%d_%H%M")
@@ -94,6 +111,7 @@ def upload_to_sharepoint(settings_file, distribution):
 
     sp.add_list_item(f"{folder_url}/{archive_file.name}", int(build_date), folder_url, distribution=distribution)
     archive_file.unlink()
+    manifest_file.unlink()
 
 
 class SharepointUpload(Downloader):
@@ -105,6 +123,29 @@ class SharepointUpload(Downloader):
         )
 
         self.ctx = ClientContext(SHAREPOINT_SITE_URL, context_auth)
+        self.uploaded = 0
+
+    def prefetch_to_proxy(self):
+        """
+        Ask caching proxy to download new build in advance, so workstations of the site get it from local store.
+        Workbench archives are generated by Artifactory on the fly and cannot be cached
+        Returns: None
+        """
+        if "ElectronicsDesktop" not in self.settings.version:
+            return
+
+        path = urlparse(str(self.build_artifactory_path)).path
+        try:
+            response = requests.post(
+                f"{cache_proxy_url}/_proxy/prefetch",
+                json={"path": path},
+                auth=self.build_artifactory_path.auth,
+                timeout=TIMEOUT,
+            )
+            response.raise_for_status()
+            logging.info(f"Caching proxy prefetches {path}")
+        except requests.RequestException as err:
+            logging.warning(f"Caching proxy cannot prefetch {path}: {err}")
 
     def prepare_upload(self, file_path, *remote_path):
         """
@@ -120,16 +161,37 @@ class SharepointUpload(Downloader):
         target_folder = self.ctx.web.ensure_folder_path(folder_url)
         self.ctx.execute_query()  # execute, otherwise upload stuck
 
-        size_chunk_mb = 100
+        # upload session keeps whole chunk in memory, chunk is small to fit into the memory budget of transfers.
+        size_chunk_mb = 10
         size_chunk = size_chunk_mb * 1024 * 1024
         logging.info(f"Start uploading {file_path} to {folder_url}")
         try:
             self.upload_file(file_path, size_chunk, target_folder)
         except UploaderError:
             target_folder.recycle()
+            return folder_url
 
+        self.upload_chunk_manifest(file_path, target_folder)
         return folder_url
 
+    @retry(Exception, 4, logger=logging)
+    def upload_chunk_manifest(self, file_path, target_folder):
+        """
+        Upload chunk manifest of the archive next to it, downloaders use it to repair corrupted chunks
+        Args:
+            file_path: local file path of the archive
+            target_folder: office365 folder object
+
+        Returns: None
+        """
+        manifest_file = Path(f"{file_path}{CHUNK_MANIFEST_SUFFIX}")
+        if not manifest_file.is_file():
+            return
+
+        target_folder.upload_file(manifest_file.name, manifest_file.read_bytes())
+        self.ctx.execute_query()
+        logging.info(f"Chunk manifest {manifest_file.name} has been uploaded")
+
     @retry(Exception, 10, delay=60, backoff=1, logger=logging)
     def upload_file(self, file_path, size_chunk, target_folder):
         """
@@ -143,15 +205,18 @@ class SharepointUpload(Downloader):
         """
 
         file_size = file_path.stat().st_size
+        self.uploaded = 0
         result_file = target_folder.files.create_upload_session(
             str(file_path), size_chunk, self.print_upload_progress, file_size
         )
 
-        self.ctx.execute_query_retry(
-            max_retry=100,
-            exceptions=(Exception,),
-            failure_callback=lambda attempt, err: self.log_fail(attempt, err, total=100),
-        )
+        # upload session reads whole chunk into memory, chunk is accounted in the memory budget of transfers
+        with BUFFER_POOL.reserve(size_chunk):
+            self.ctx.execute_query_retry(
+                max_retry=100,
+                exceptions=(Exception,),
+                failure_callback=lambda attempt, err: self.log_fail(attempt, err, total=100),
+            )
 
         remote_size = result_file.length
         if remote_size is None or abs(file_size - remote_size) > 0.03 * file_size:
@@ -183,29 +248,35 @@ class SharepointUpload(Downloader):
                 "build_date": build_date,
                 "relative_url": file_url,
                 "shareable_folder": f"{SHAREPOINT_SITE_URL}/{folder_url}",
+                "md5": self.file_hashes.get("md5"),
+                "sha256": self.file_hashes.get("sha256"),
             }
         )
         self.ctx.execute_query()
 
     @retry(Exception, 4, logger=logging)
-    def get_list_items(self, distribution):
+    def get_list_items(self, distribution, filter_query="", order_by="", top=0, fields=None):
         """
-        Get list of all items available on SP
+        Get items available on SP, filtered and ordered on the server
         Args:
             distribution: linx64 or winx64
+            filter_query: (str) OData $filter expression
+            order_by: (str) OData $orderby expression
+            top: (int) maximum number of items, all items if 0
+            fields: (list) names of fields to return, all fields if None
 
-        Returns: (list) list of all items
+        Returns: (list) list of items
 
         """
         title = "product_list" if distribution == "winx64" else "linux_product_list"
-        product_list = self.ctx.web.lists.get_by_title(title)
-        items = product_list.items
-        self.ctx.load(items)
-        self.ctx.execute_query()
-        return items
+        return self.get_sharepoint_list_items(
+            title, filter_query=filter_query, order_by=order_by, top=top, fields=fields
+        )
 
-    @staticmethod
-    def print_upload_progress(offset, total_size):
+    def print_upload_progress(self, offset, total_size):
+        # upload is limited between chunks, next chunk is sent once transfer rate is within the bandwidth limit
+        self.rate_limiter.consume(offset - self.uploaded)
+        self.uploaded = offset
         logging.info(
             "Uploaded '{}' MB from '{}'...[{}%]".format(
                 round(offset / 1024 / 1024, 2), round(total_size / 1024 / 1024, 0), round(offset / total_size * 100, 2)
@@ -0,0 +1,49 @@
+import unittest
+from unittest.mock import patch
+
+from docker.admission import admission_server
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def setUp(self):
+        self.controller = admission_server.AdmissionController(slots=2, lease=300, retry_after=60)
+
+    def test_acquire(self):
+        first = self.controller.acquire("pc1", "otterfing")
+        second = self.controller.acquire("pc2", "otterfing")
+        self.assertTrue(first and second)
+        self.assertNotEqual(first, second)
+
+        # slots are counted per server
+        self.assertEqual(self.controller.acquire("pc3", "otterfing"), "")
+        self.assertTrue(self.controller.acquire("pc3", "canonsburg"))
+
+        # repeated request of the same client gets its slot back
+        self.assertEqual(self.controller.acquire("pc1", "otterfing"), first)
+
+        self.controller.release(first)
+        self.assertTrue(self.controller.acquire("pc3", "otterfing"))
+        self.assertEqual(
+            self.controller.get_status(), {"slots": 2, "active": {"otterfing": 2, "canonsburg": 1}, "rejected": 1}
+        )
+
+    def test_lease_expiry(self):
+        with patch("docker.admission.admission_server.time.time", return_value=1000):
+            token = self.controller.acquire("pc1", "otterfing")
+            self.controller.acquire("pc2", "otterfing")
+
+        with patch("docker.admission.admission_server.time.time", return_value=1200):
+            self.assertTrue(self.controller.renew(token))
+
+        # lease of pc2 was not renewed and its slot is freed, renewed lease of pc1 is still active
+        with patch("docker.admission.admission_server.time.time", return_value=1400):
+            self.assertTrue(self.controller.acquire("pc3", "otterfing"))
+            self.assertTrue(self.controller.renew(token))
+
+        with patch("docker.admission.admission_server.time.time", return_value=2000):
+            self.assertFalse(self.controller.renew(token))
+            self.assertEqual(self.controller.get_status()["active"], {})
+
+    def test_get_retry_after(self):
+        for _ in range(100):
+            self.assertTrue(30 <= self.controller.get_retry_after() <= 90)
@@ -1,16 +1,33 @@
+import asyncio
+import datetime
+import hashlib
 import io
 import json
 import os
+import posixpath
 import shutil
+import struct
+import tarfile
+import time
 import unittest
+import zipfile
 from collections import namedtuple
+from functools import partial
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from threading import Event
+from threading import Thread
+from types import SimpleNamespace
 from unittest.mock import patch
+from urllib.parse import unquote
 from zipfile import BadZipFile
 from zlib import error as zlib_err
 
 import psutil
+import py7zr
+import requests
 import responses
 
 import downloader_backend
@@ -26,6 +43,14 @@ class BaseSetup(unittest.TestCase):
         self.downloader = downloader_backend.Downloader(
             0, settings_path=aedt_settings, settings_folder=INPUT_DIR.parent
         )
+        cache_dir = TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.downloader.metadata_cache = downloader_backend.MetadataCache(
+            os.path.join(cache_dir.name, downloader_backend.METADATA_CACHE_FILE)
+        )
+        self.downloader.credential_cache = downloader_backend.CredentialCache(
+            os.path.join(cache_dir.name, downloader_backend.SHAREPOINT_CREDENTIALS_FILE)
+        )
 
         with open(MOCK_DATA_DIR.joinpath("backend_mock.json")) as file:
             self.mocked_data = json.load(file)
@@ -87,6 +112,36 @@ class DownloaderTest(BaseSetup):
 
             self.assertEqual(str(err.exception), "0/1/2 could not be created due to insufficient permissions")
 
+    @patch("downloader_backend.set_logger")
+    @patch("downloader_backend.Downloader.newer_version_exists", False)
+    def test_run_phase_order(self, _):
+        calls = []
+
+        def phase(name, *args):
+            if name == "wait_start_jitter":
+                time.sleep(0.05)
+            calls.append(name)
+
+        # no newer build, run stops after the checks
+        self.downloader.settings.force_install = False
+        with patch.multiple(
+            self.downloader,
+            authorize=partial(phase, "authorize"),
+            check_process_lock=partial(phase, "check_installation"),
+            check_and_make_directories=partial(phase, "make_directories"),
+            check_free_space=partial(phase, "check_free_space"),
+            wait_start_jitter=partial(phase, "wait_start_jitter"),
+            get_build_link=partial(phase, "get_build_link"),
+            update_installation_history=lambda **kwargs: None,
+            clean_temp=lambda: None,
+        ):
+            self.downloader.run()
+
+        # server is contacted only after the start jitter
+        self.assertLess(calls.index("check_installation"), calls.index("wait_start_jitter"))
+        self.assertLess(calls.index("make_directories"), calls.index("wait_start_jitter"))
+        self.assertEqual(calls[-3:], ["wait_start_jitter", "authorize", "get_build_link"])
+
     def test_check_process_lock(self):
         proc = psutil.Process(pid=0)
         proc._exe = r"C:\Program Files\AnsysEM\v221\Win64\ansysedt.exe"
@@ -150,6 +205,95 @@ class DownloaderTest(BaseSetup):
             self.assertEqual("22139510-d048-4650-9db9-582ee8ede17b", product_id)
             self.assertEqual("v7.00\n", installshield_version)
 
+    def test_parse_iss_template_from_archive(self):
+        with TemporaryDirectory() as tmp:
+            zip_file = os.path.join(tmp, "test.zip")
+            with zipfile.ZipFile(zip_file, "w") as zip_ref:
+                zip_ref.write(MOCK_DATA_DIR.joinpath("SilentInstallationTemplate.iss"), "AnsysEM/Template.iss")
+
+            unpack_folder = os.path.join(tmp, "test")
+            with downloader_backend.ArchiveIndex(zip_file) as archive_index:
+                with self.assertRaises(downloader_backend.DownloaderError) as err:
+                    self.downloader.parse_iss_template(unpack_folder, archive_index)
+                self.assertEqual(str(err.exception), "setup.exe does not exist")
+
+            with zipfile.ZipFile(zip_file, "a") as zip_ref:
+                zip_ref.writestr("AnsysEM/setup.exe", "test")
+
+            with downloader_backend.ArchiveIndex(zip_file) as archive_index:
+                setup_exe, product_id, installshield_version = self.downloader.parse_iss_template(
+                    unpack_folder, archive_index
+                )
+
+        self.assertEqual(os.path.join(unpack_folder, "AnsysEM", "setup.exe"), setup_exe)
+        self.assertEqual("22139510-d048-4650-9db9-582ee8ede17b", product_id)
+        self.assertEqual("v7.00\n", installshield_version)
+
+    def test_verify_file_hashes(self):
+        self.downloader.file_hashes = {"md5": "abc", "sha256": "def"}
+        self.assertFalse(self.downloader.verify_file_hashes({"md5": None, "sha256": None}))
+        self.assertTrue(self.downloader.verify_file_hashes({"md5": "ABC"}))
+
+        with self.assertRaises(downloader_backend.DownloaderError) as err:
+            self.downloader.verify_file_hashes({"md5": "abc", "sha256": "xyz"})
+        self.assertEqual(str(err.exception), "Downloaded file SHA256 hash is different")
+
+    @patch("downloader_backend.Downloader.run_range_download")
+    @patch("downloader_backend.Downloader.find_delta_seed", return_value="seed.zip")
+    def test_run_delta_download(self, *_):
+        expected_hashes = {"md5": "abc", "sha256": "def"}
+        range_downloader = SimpleNamespace(
+            manifest_file="missing.manifest",
+            hasher=SimpleNamespace(hexdigests=lambda: {"md5": "abc", "sha256": "def"}),
+            fetch_range=None,
+            reset=lambda: None,
+        )
+        # archive assembled from the seed is verified once, caller does not verify it again
+        for reused, verified in [(100, True), (0, False)]:
+            with patch("downloader_backend.ZipDelta.build", return_value=reused):
+                self.assertEqual(
+                    self.downloader.run_delta_download(range_downloader, "zip", False, expected_hashes), verified
+                )
+
+        # full archive downloaded after failed delta is verified by the caller
+        range_downloader.hasher = SimpleNamespace(hexdigests=lambda: {"md5": "xyz", "sha256": "xyz"})
+        with patch("downloader_backend.ZipDelta.build", return_value=100):
+            with patch("downloader_backend.Downloader.repair_file", return_value=False):
+                self.assertFalse(self.downloader.run_delta_download(range_downloader, "zip", False, expected_hashes))
+
+    def test_repair_file(self):
+        content = os.urandom(1000)
+        requested = []
+
+        def fetch_range(start, end):
+            requested.append((start, end))
+            yield content[start:end]
+
+        with TemporaryDirectory() as tmp:
+            self.downloader.zip_file = os.path.join(tmp, "test.zip")
+            with open(self.downloader.zip_file, "wb") as file:
+                file.write(content)
+            with open(downloader_backend.write_chunk_manifest(self.downloader.zip_file, chunk_size=300)) as file:
+                manifest = json.load(file)
+
+            with open(self.downloader.zip_file, "r+b") as file:
+                file.seek(650)
+                file.write(b"corrupted")
+
+            self.downloader.file_hashes = {"md5": "corrupted"}
+            expected_hashes = {"md5": hashlib.md5(content).hexdigest()}
+            with patch.object(self.downloader, "get_chunk_manifest", return_value=None):
+                with self.assertRaises(downloader_backend.DownloaderError):
+                    self.downloader.verify_or_repair_file(expected_hashes, fetch_range)
+
+            with patch.object(self.downloader, "get_chunk_manifest", return_value=manifest):
+                self.assertTrue(self.downloader.verify_or_repair_file(expected_hashes, fetch_range))
+
+            with open(self.downloader.zip_file, "rb") as file:
+                self.assertEqual(file.read(), content)
+
+        self.assertEqual(requested, [(600, 900)])
+
     def test_unpack_archive(self):
         with TemporaryDirectory() as tmp:
             arch_name = os.path.join(tmp, "test")
@@ -169,13 +313,13 @@ class DownloaderTest(BaseSetup):
             self.downloader.zip_file = shutil.make_archive(arch_name, "zip", MOCK_DATA_DIR)
 
             self.assertFalse(os.path.isfile(os.path.join(tmp, "test", "SilentInstallationTemplate.iss")))
-            with patch("zipfile.ZipFile.extractall", side_effect=OSError(28, "")):
+            with patch("downloader_backend.extract_zip_members", side_effect=OSError(28, "")):
                 with self.assertRaises(downloader_backend.DownloaderError) as err:
                     self.downloader.unpack_archive()
 
                 self.assertEqual(str(err.exception), "No disk space available in download folder!")
 
-            with patch("zipfile.ZipFile.extractall", side_effect=zlib_err()):
+            with patch("downloader_backend.extract_zip_members", side_effect=zlib_err()):
                 with self.assertRaises(downloader_backend.DownloaderError) as err:
                     self.downloader.unpack_archive()
 
@@ -183,7 +327,7 @@ class DownloaderTest(BaseSetup):
                     str(err.exception), "Zip file is broken. Please try again later or use another repository."
                 )
 
-            with patch("zipfile.ZipFile.extractall", side_effect=BadZipFile()):
+            with patch("downloader_backend.extract_zip_members", side_effect=BadZipFile()):
                 with self.assertRaises(downloader_backend.DownloaderError) as err:
                     self.downloader.unpack_archive()
 
@@ -252,12 +396,72 @@ class SharepointWorkbenchTest(BaseSetup):
             self.downloader.ctx = self.downloader.authorize_sharepoint()
 
     @responses.activate
-    @patch("downloader_backend.AuthenticationContext")
-    def test_authorize_sharepoint(self, token):
+    @patch("downloader_backend.time.time", return_value=1631000000)
+    def test_authorize_sharepoint(self, _):
+        self.mock_sharepoint_auth()
+
+        credentials = self.downloader.credential_cache.load()
+        self.assertEqual(credentials["client_id"], "90906b56-2bc8-4")
+        self.assertEqual(credentials["client_secret"], "bzJwrRIQJmjvZ8N")
+        self.assertEqual(credentials["token"]["accessToken"], "my_crazy_shi_token")
+        self.assertIn("90906b56-2bc8-4", responses.calls[1].request.body)
+
+        # cached credentials and token are used without PowerShell and token request
+        with patch("downloader_backend.Downloader.subprocess_call") as subprocess_call:
+            self.downloader.authorize_sharepoint()
+            subprocess_call.assert_not_called()
+        self.assertEqual(len(responses.calls), 2)
+
+        # token expired and credentials are rejected, new credentials are requested
+        credentials["token"]["expiresOn"] = "1631000100"
+        self.downloader.credential_cache.save(credentials)
+        responses.replace(
+            responses.POST,
+            url="https://accounts.accesscontrol.windows.net/look_at_my_burning_bear/tokens/OAuth/2",
+            status=401,
+            json={"error": "invalid_client"},
+        )
+        with patch("downloader_backend.Downloader.subprocess_call", return_value="") as subprocess_call:
+            with self.assertRaises(downloader_backend.DownloaderError) as err:
+                self.downloader.authorize_sharepoint()
+            subprocess_call.assert_called_once()
+        self.assertEqual(str(err.exception), "Cannot retrieve authentication tokens for SharePoint")
+
+        # server and network failures are not treated as rejected credentials
+        token_url = "https://accounts.accesscontrol.windows.net/look_at_my_burning_bear/tokens/OAuth/2"
+        for response, message in [
+            ({"status": 503, "body": "Service Unavailable"}, "SharePoint authentication service is not available"),
+            ({"body": requests.ConnectionError("Connection refused")}, "Cannot connect to SharePoint"),
+        ]:
+            responses.replace(responses.POST, url=token_url, **response)
+            with patch("downloader_backend.Downloader.subprocess_call") as subprocess_call:
+                with self.assertRaises(downloader_backend.DownloaderError) as err:
+                    self.downloader.authorize_sharepoint()
+                subprocess_call.assert_not_called()
+            self.assertIn(message, str(err.exception))
+
+    @responses.activate
+    @patch("downloader_backend.time.time", return_value=1631000000)
+    def test_renew_sharepoint_token(self, _):
         self.mock_sharepoint_auth()
+        items_url = "https://ansys.sharepoint.com/sites/BetaDownloader/_api/Web/lists/GetByTitle('product_list')/items"
+        items = [
+            item for item in self.mocked_data["sharepoint_lists"]["d"]["results"] if item["Title"] == "v221_Workbench"
+        ]
+        # token is revoked before it expires, it is removed from the cache and requested again
+        responses.add(responses.GET, url=items_url, status=403, json={"error": {"message": "Access denied"}})
+        responses.add(responses.GET, url=items_url, status=200, json={"d": {"results": items[:1]}})
+
+        self.downloader.get_build_link()
+        token_requests = [call for call in responses.calls if "tokens/OAuth" in call.request.url]
+        self.assertEqual(len(token_requests), 2)
+        self.assertTrue(self.downloader.sharepoint_token_renewed)
+        self.assertEqual(self.downloader.build_artifactory_path, items[0]["relative_url"])
 
-        token.assert_called_with(url=downloader_backend.SHAREPOINT_SITE_URL)
-        token().acquire_token_for_app.assert_called_with(client_id="90906b56-2bc8-4", client_secret="bzJwrRIQJmjvZ8N")
+        # token is renewed only once per run
+        responses.replace(responses.GET, url=items_url, status=403, json={"error": {"message": "Access denied"}})
+        with self.assertRaises(downloader_backend.ClientRequestException):
+            self.downloader.get_sharepoint_list_items("product_list")
 
     def test_versions_identical(self):
         # test if product is not installed
@@ -274,18 +478,46 @@ class SharepointWorkbenchTest(BaseSetup):
         self.downloader.remote_build_date = "202108300040"
         self.assertFalse(self.downloader.newer_version_exists)
 
+    @responses.activate
+    def test_get_build_link_no_hash_columns(self):
+        self.mock_sharepoint_auth()
+        items_url = "https://ansys.sharepoint.com/sites/BetaDownloader/_api/Web/lists/GetByTitle('product_list')/items"
+        items = [
+            item for item in self.mocked_data["sharepoint_lists"]["d"]["results"] if item["Title"] == "v221_Workbench"
+        ]
+        # list without hash columns rejects the query, it is repeated without them
+        error = {"error": {"code": "-1, Microsoft.SharePoint.SPException", "message": "Column 'md5' does not exist"}}
+        responses.add(responses.GET, url=items_url, status=400, json=error)
+        responses.add(responses.GET, url=items_url, status=200, json={"d": {"results": items[:1]}})
+
+        self.downloader.get_build_link()
+        queries = [unquote(call.request.url) for call in responses.calls if call.request.url.startswith(items_url)]
+        self.assertEqual(len(queries), 2)
+        self.assertIn("md5", queries[0])
+        self.assertNotIn("md5", queries[1])
+        self.assertEqual(self.downloader.build_artifactory_path, items[0]["relative_url"])
+        self.assertEqual(self.downloader.remote_hashes, {"md5": None, "sha256": None})
+
     @responses.activate
     def test_get_build_link(self):
         self.mock_sharepoint_auth()
-        sharepoint_lists = self.mocked_data["sharepoint_lists"]
+        # server returns the latest item of the version only
+        items = [
+            item for item in self.mocked_data["sharepoint_lists"]["d"]["results"] if item["Title"] == "v221_Workbench"
+        ]
+        latest_item = max(items, key=lambda item: item["build_date"])
         responses.add(
             responses.GET,
             url="https://ansys.sharepoint.com/sites/BetaDownloader/_api/Web/lists/GetByTitle('product_list')/items",
             status=200,
-            json=sharepoint_lists,
+            json={"d": {"results": [latest_item]}},
         )
 
         self.downloader.get_build_link()
+        query = unquote(responses.calls[-1].request.url.split("?")[1])
+        self.assertIn("$filter=Title eq 'v221_Workbench'", query)
+        self.assertIn("$orderBy=build_date desc", query)
+        self.assertIn("$top=1", query)
         self.assertEqual(
             self.downloader.build_artifactory_path,
             "Shared Documents/winx64/Workbench/v221/20210902_1213/v221_Workbench.zip",
@@ -294,6 +526,12 @@ class SharepointWorkbenchTest(BaseSetup):
 
         # test exception raised
         self.downloader.settings.version = "unknown_product"
+        responses.replace(
+            responses.GET,
+            url="https://ansys.sharepoint.com/sites/BetaDownloader/_api/Web/lists/GetByTitle('product_list')/items",
+            status=200,
+            json={"d": {"results": []}},
+        )
         with self.assertRaises(downloader_backend.DownloaderError) as err:
             self.downloader.get_build_link()
         self.assertEqual(str(err.exception), "No version of unknown_product is available on SharePoint")
@@ -486,6 +724,30 @@ class ArtifactoryElectronicsTest(BaseSetup):
         add_responses_for_repos(self.mocked_data)
 
         artifactory_link = "http://ottvmartifact.win.ansys.com:8080/artifactory"
+        items = [
+            {"repo": "v221_EBU_Certified-cache", "path": date, "name": "Electronics_221_winx64.zip", "size": size}
+            for date, size in [("20210902", 10), ("20210903", 20), ("20210901", 30)]
+        ]
+        items[1]["actual_md5"] = "d41d8cd98f00b204e9800998ecf8427e"
+        responses.add(responses.POST, url=f"{artifactory_link}/api/search/aql", json={"results": items})
+        self.downloader.get_build_link()
+
+        self.assertEqual(len(responses.calls), 2)
+        self.assertEqual(
+            str(self.downloader.build_artifactory_path),
+            f"{artifactory_link}/v221_EBU_Certified-cache/20210903/Electronics_221_winx64.zip",
+        )
+        file_stats = self.downloader.get_build_stats(self.downloader.build_artifactory_path)
+        self.assertEqual(file_stats.size, 20)
+        self.assertEqual(file_stats.md5, "d41d8cd98f00b204e9800998ecf8427e")
+
+    @responses.activate
+    def test_get_build_link_listing(self):
+        add_responses_for_repos(self.mocked_data)
+
+        artifactory_link = "http://ottvmartifact.win.ansys.com:8080/artifactory"
+        # AQL is not allowed for the user, builds are found by listing of folders
+        responses.add(responses.POST, url=f"{artifactory_link}/api/search/aql", status=403)
         add_aedt_responses(artifactory_link)
         add_responses_for_aedt_folders()
         self.downloader.get_build_link()
@@ -571,11 +833,13 @@ class ArtifactoryElectronicsTest(BaseSetup):
         )
         self.assertTrue(self.downloader.newer_version_exists)
 
-        # test aedt is installed but remote version is older (the same)
-        responses.remove(responses.GET, url=f"{artifactory_link}/v221_EBU_Certified/20210903/product_windows.info")
+        # test aedt is installed but remote version is older (the same). Info file in the build folder never changes
+        # and is taken from metadata cache, older build is in another folder
+        bld_path = f"{artifactory_link}/v221_EBU_Certified/20210830/Electronics_221_winx64.zip"
+        self.downloader.build_artifactory_path = downloader_backend.ArtifactoryPath(bld_path, auth=("reader", "reader"))
         responses.add(
             responses.GET,
-            url=f"{artifactory_link}/v221_EBU_Certified/20210903/product_windows.info",
+            url=f"{artifactory_link}/v221_EBU_Certified/20210830/product_windows.info",
             status=200,
             body=(
                 'AnsProductName="ANSYS Electromagnetics"\r\nAnsProductVersion="22.1"\r\n'
@@ -584,6 +848,32 @@ class ArtifactoryElectronicsTest(BaseSetup):
         )
         self.assertFalse(self.downloader.newer_version_exists)
 
+    def test_select_mirror(self):
+        paths = {
+            "Otterfing": downloader_backend.ArtifactoryPath("http://ott/v221_EBU/20210903/Electronics_221_winx64.zip"),
+            "Canonsburg": downloader_backend.ArtifactoryPath("http://can/v221_EBU/20210902/Electronics_221_winx64.zip"),
+        }
+        self.downloader.settings.artifactory = "auto"
+        with TemporaryDirectory() as tmp, patch("downloader_backend.ping_mirror", return_value=0.1), patch(
+            "downloader_backend.Downloader.probe_mirror",
+            side_effect=lambda name, distribution="winx64": (paths[name], 100 if name == "Otterfing" else 500),
+        ):
+            self.downloader.settings_folder = tmp
+            self.downloader.get_build_link()
+
+            # the newest build has priority over throughput
+            self.assertEqual(self.downloader.mirror, "Otterfing")
+            self.assertEqual(self.downloader.build_artifactory_path, paths["Otterfing"])
+            self.assertEqual(self.downloader.mirror_queue, ["Canonsburg"])
+
+            # Canonsburg has another build and cannot be used for failover
+            self.assertFalse(self.downloader.switch_mirror(ConnectionError("timeout")))
+
+            ranking = downloader_backend.MirrorRanking(os.path.join(tmp, downloader_backend.MIRRORS_FILE))
+            self.assertEqual(ranking.mirrors["Otterfing"]["throughput"], 50)
+            self.assertEqual(ranking.mirrors["Canonsburg"]["throughput"], 500)
+            self.assertEqual(ranking.rank({"Otterfing": 0.1, "Canonsburg": 0.2}), ["Canonsburg", "Otterfing"])
+
 
 class ArtifactoryWorkbenchTest(BaseSetup):
     def setUp(self, settings_file=""):
@@ -593,7 +883,11 @@ class ArtifactoryWorkbenchTest(BaseSetup):
     def test_get_build_link(self):
         add_responses_for_repos(self.mocked_data)
         artifactory_link = "http://ottvmartifact.win.ansys.com:8080/artifactory"
-        add_aedt_responses(artifactory_link)
+        responses.add(
+            responses.POST,
+            url=f"{artifactory_link}/api/search/aql",
+            json={"results": [{"repo": "v221_Certified-cache", "path": ".", "name": "winx64", "size": 0}]},
+        )
         self.downloader.get_build_link()
 
         self.assertIsInstance(self.downloader.build_artifactory_path, downloader_backend.ArtifactoryPath)
@@ -627,6 +921,187 @@ class ArtifactoryWorkbenchTest(BaseSetup):
         )
         self.assertFalse(self.downloader.newer_version_exists)
 
+    @responses.activate
+    @patch("downloader_backend.set_logger")
+    def test_check_updates(self, _):
+        add_responses_for_repos(self.mocked_data)
+        artifactory_link = "http://ottvmartifact.win.ansys.com:8080/artifactory"
+        responses.add(
+            responses.POST,
+            url=f"{artifactory_link}/api/search/aql",
+            json={"results": [{"repo": "v221_Certified-cache", "path": ".", "name": "winx64", "size": 0}]},
+        )
+        responses.add(
+            responses.GET,
+            url=f"{artifactory_link}/v221_Certified-cache/winx64/package.id",
+            status=200,
+            body="Unified Package Created: 202109020040P00\nUnified Package Name: 2021-09-02 00:40 P00\n",
+        )
+
+        with TemporaryDirectory() as tmp:
+            missing_settings = os.path.join(tmp, "missing.json")
+            self.downloader.check_paths = [self.downloader.settings_path, missing_settings]
+            self.downloader.report_file = os.path.join(tmp, "report.json")
+            # update check is not shown in installation history
+            self.downloader.get_installation_history()
+            history = dict(self.downloader.history)
+            self.downloader.check_updates()
+            self.downloader.get_installation_history()
+            self.assertEqual(self.downloader.history, history)
+
+            with open(self.downloader.report_file) as file:
+                products = json.load(file)["products"]
+
+        self.assertEqual(products[0]["version"], "v221_Workbench")
+        self.assertEqual(products[0]["remote"], 202109020040)
+        self.assertEqual(products[0]["installed"], 0)
+        self.assertTrue(products[0]["update"])
+        self.assertEqual(products[0]["error"], "")
+        self.assertEqual(products[1]["settings"], missing_settings)
+        self.assertIn("No such file or directory", products[1]["error"])
+
+    @responses.activate
+    @patch("downloader_backend.ArtifactoryPath.replication_status", {"status": "ok"})
+    def test_download_tree(self):
+        artifactory_link = "http://ottvmartifact.win.ansys.com:8080/artifactory"
+        bld_path = f"{artifactory_link}/v221_Certified-cache/winx64"
+        self.downloader.build_artifactory_path = downloader_backend.ArtifactoryPath(bld_path, auth=("reader", "reader"))
+        contents = {
+            "setup.exe": b"setup",
+            "fluent/fluent.7z": b"fluent package",
+            "cfx/cfx.7z": b"cfx package",
+            "common/files.7z": b"common files",
+        }
+        items = []
+        for relative_path, content in contents.items():
+            path, name = posixpath.split(posixpath.join("winx64", relative_path))
+            items.append(
+                {"path": path, "name": name, "size": len(content), "actual_md5": hashlib.md5(content).hexdigest()}
+            )
+            responses.add(responses.GET, url=f"{bld_path}/{relative_path}", status=200, body=content)
+        responses.add(responses.POST, url=f"{artifactory_link}/api/search/aql", json={"results": items})
+
+        with TemporaryDirectory() as tmp:
+            self.downloader.settings.download_path = tmp
+            self.downloader.settings.tree_download = True
+            self.downloader.download_file()
+
+            self.assertTrue(self.downloader.archive_unpacked)
+            downloaded = {
+                posixpath.relpath(os.path.join(root, name), self.downloader.target_unpack_dir).replace(os.sep, "/")
+                for root, _, names in os.walk(self.downloader.target_unpack_dir)
+                for name in names
+            }
+            self.assertEqual(downloaded, {"setup.exe", "fluent/fluent.7z", "common/files.7z"})
+            with open(os.path.join(self.downloader.target_unpack_dir, "fluent", "fluent.7z"), "rb") as file:
+                self.assertEqual(file.read(), b"fluent package")
+
+    @responses.activate
+    @patch("downloader_backend.ArtifactoryPath.replication_status", {"status": "ok"})
+    def test_download_tree_error(self):
+        artifactory_link = "http://ottvmartifact.win.ansys.com:8080/artifactory"
+        bld_path = f"{artifactory_link}/v221_Certified-cache/winx64"
+        self.downloader.build_artifactory_path = downloader_backend.ArtifactoryPath(bld_path, auth=("reader", "reader"))
+        self.downloader.settings.max_connections = 1
+        contents = {"fluent/fluent.7z": b"fluent package", "setup.exe": b"setup"}
+        items = []
+        for relative_path, content in contents.items():
+            path, name = posixpath.split(posixpath.join("winx64", relative_path))
+            items.append({"path": path, "name": name, "size": len(content), "actual_md5": "0" * 32})
+            responses.add(responses.GET, url=f"{bld_path}/{relative_path}", status=200, body=content)
+        responses.add(responses.POST, url=f"{artifactory_link}/api/search/aql", json={"results": items})
+
+        with TemporaryDirectory() as tmp:
+            self.downloader.settings.download_path = tmp
+            self.downloader.zip_file = os.path.join(tmp, "v221_Workbench.zip")
+            with self.assertRaises(downloader_backend.DownloaderError):
+                self.downloader.download_tree()
+
+        # first failed file stops the download, queued files are not requested
+        self.assertEqual([call.request.url for call in responses.calls][-1], f"{bld_path}/fluent/fluent.7z")
+        self.assertEqual(len(responses.calls), 2)
+
+    def start_server(self, content, content_length=None, stall=None):
+        """Start local HTTP server that sends content, optionally with wrong Content-Length or stalling midway."""
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Length", str(content_length or len(content)))
+                self.end_headers()
+                if stall is not None:
+                    self.wfile.write(content[: len(content) // 2])
+                    self.wfile.flush()
+                    stall.wait(10)
+                    return
+                self.wfile.write(content)
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        session = requests.Session()
+        session.trust_env = False
+        return downloader_backend.ArtifactoryPath(
+            f"http://127.0.0.1:{server.server_port}/artifactory/repo/winx64.zip", session=session
+        )
+
+    def test_stream_download(self):
+        content = os.urandom(3 * 1024 * 1024 + 100)
+        url = self.start_server(content)
+        with TemporaryDirectory() as tmp:
+            self.downloader.zip_file = os.path.join(tmp, "v221_Workbench.zip")
+            # data is read into pooled buffers without intermediate bytes objects of urllib3
+            with patch("urllib3.response.HTTPResponse.read", side_effect=AssertionError("copy")):
+                self.downloader.stream_download(url, len(content), progress_step=1024 * 1024)
+
+            with open(self.downloader.zip_file, "rb") as file:
+                self.assertEqual(file.read(), content)
+        self.assertEqual(self.downloader.file_hashes["md5"], hashlib.md5(content).hexdigest())
+
+    def test_stream_download_interrupted(self):
+        content = os.urandom(1024 * 1024)
+        stall = Event()
+        self.addCleanup(stall.set)
+        self.downloader.settings.http_timeout = 0.5
+        with TemporaryDirectory() as tmp:
+            self.downloader.zip_file = os.path.join(tmp, "v221_Workbench.zip")
+            # connection closed before the end of file and stalled connection are retried as connection errors
+            for url in [
+                self.start_server(content, content_length=len(content) + 100),
+                self.start_server(content, stall=stall),
+            ]:
+                with self.assertRaises(requests.ConnectionError):
+                    self.downloader.stream_download(url, len(content), progress_step=1024 * 1024)
+
+    @patch("downloader_backend.Downloader.download_from_artifactory", wraps=lambda *args, **kwargs: "")
+    def test_download_previous_archive(self, mock_download):
+        self.downloader.build_artifactory_path = downloader_backend.ArtifactoryPath(
+            "http://ottvmartifact.win.ansys.com:8080/artifactory/v221_Certified-cache/winx64"
+        )
+        with TemporaryDirectory() as tmp:
+            self.downloader.settings.download_path = tmp
+            self.downloader.settings.tree_download = False
+            self.downloader.settings.build_cache_size = 0
+            zip_file = os.path.join(tmp, "v221_Workbench.zip")
+            seed_file = zip_file + downloader_backend.DELTA_SEED_SUFFIX
+            for delta_download, seed_exists in [(False, False), (True, True)]:
+                with open(zip_file, "wb") as file:
+                    file.write(b"previous build")
+
+                self.downloader.settings.delta_download = delta_download
+                self.downloader.download_file()
+                self.assertFalse(os.path.isfile(zip_file))
+                self.assertEqual(os.path.isfile(seed_file), seed_exists)
+            mock_download.assert_called()
+
 
 class InstallWorkbenchTest(BaseSetup):
     def setUp(self, settings_file=""):
@@ -647,6 +1122,39 @@ class InstallWorkbenchTest(BaseSetup):
 
             os.mkdir(tmp)  # recover tmp folder since it was removed during uninstall
 
+    @patch("downloader_backend.Downloader.subprocess_call", wraps=lambda *args: "")
+    def test_install_wb(self, mock_call):
+        with TemporaryDirectory() as tmp:
+            self.downloader.zip_file = os.path.join(tmp, "WB.zip")
+            self.downloader.product_root_path = os.path.join(tmp, "ANSYS Inc", "v221")
+            os.makedirs(self.downloader.product_root_path)
+            uninstall_exe = os.path.join(self.downloader.product_root_path, "Uninstall.exe")
+            with open(uninstall_exe, "w") as file:
+                file.write("test")
+
+            with open(self.downloader.zip_file, "wb") as file:
+                file.write(b"broken archive")
+
+            with self.assertRaises(downloader_backend.DownloaderError):
+                self.downloader.install()
+            # previous build is kept if the new one cannot be unpacked
+            self.assertTrue(os.path.isfile(uninstall_exe))
+            mock_call.assert_not_called()
+
+            with zipfile.ZipFile(self.downloader.zip_file, "w") as zip_ref:
+                zip_ref.writestr("setup.exe", "test")
+
+            def install(command):
+                if isinstance(command, str):
+                    os.makedirs(self.downloader.product_root_path)
+                    with open(uninstall_exe, "w") as file:
+                        file.write("test")
+
+            mock_call.side_effect = install
+            self.downloader.install()
+            mock_call.assert_any_call([uninstall_exe, "-silent"])
+            self.assertTrue(os.path.isfile(uninstall_exe))
+
 
 class InstallElectronicsTest(BaseSetup):
     def setUp(self, settings_file=""):
@@ -738,3 +1246,641 @@ class InstallLicenseManagerTest(BaseSetup):
         with self.assertRaises(downloader_backend.DownloaderError) as err:
             date = self.downloader.get_license_manager_build_date()
         self.assertEqual(str(err.exception), "Cannot extract build date of installed License Manager")
+
+    def test_parse_lm_installer_builddate(self):
+        with TemporaryDirectory() as tmp:
+            build_date_dir = os.path.join(tmp, "Shared Files", "licensing", "tools", "lmcenter")
+            os.makedirs(build_date_dir)
+            shutil.copy2(MOCK_DATA_DIR.joinpath("lmcenter_blddate.txt"), build_date_dir)
+            lm_center_archive = os.path.join(tmp, "WINX64.7z")
+            with py7zr.SevenZipFile(lm_center_archive, "w") as archive:
+                archive.writeall(os.path.join(tmp, "Shared Files"), "Shared Files")
+
+            self.downloader.zip_file = os.path.join(tmp, "LicenseManager.zip")
+            with zipfile.ZipFile(self.downloader.zip_file, "w") as zip_ref:
+                zip_ref.write(lm_center_archive, "lmcenter/WINX64.7z")
+
+            self.downloader.target_unpack_dir = os.path.join(tmp, "LicenseManager")
+            self.assertEqual(self.downloader.parse_lm_installer_builddate(), 20210617)
+
+            os.makedirs(os.path.join(self.downloader.target_unpack_dir, "lmcenter"))
+            shutil.move(lm_center_archive, os.path.join(self.downloader.target_unpack_dir, "lmcenter"))
+            os.remove(self.downloader.zip_file)
+            self.assertEqual(self.downloader.parse_lm_installer_builddate(), 20210617)
+            self.assertFalse(os.path.isdir(os.path.join(self.downloader.target_unpack_dir, "lmcenter", "Shared Files")))
+
+
+class RangeDownloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.content = os.urandom(1000)
+
+    def fetch_range(self, start, end):
+        for position in range(start, end, 10):
+            piece_end = min(position + 10, end)
+            yield self.content[position:piece_end]
+
+    def test_download(self):
+        progress = []
+        with TemporaryDirectory() as tmp:
+            file_path = os.path.join(tmp, "test.zip")
+            range_downloader = downloader_backend.RangeDownloader(
+                file_path,
+                len(self.content),
+                fetch_range=self.fetch_range,
+                chunk_size=64,
+                max_connections=4,
+                progress_func=lambda offset, total: progress.append((offset, total)),
+            )
+            range_downloader.download()
+
+            with open(file_path, "rb") as file:
+                self.assertEqual(file.read(), self.content)
+
+        self.assertEqual(len(progress), 16)
+        self.assertEqual(progress[-1], (1000, 1000))
+        self.assertLessEqual(range_downloader.connections, 4)
+        self.assertEqual(
+            range_downloader.hasher.hexdigests(),
+            {"md5": hashlib.md5(self.content).hexdigest(), "sha256": hashlib.sha256(self.content).hexdigest()},
+        )
+
+    def test_download_out_of_order(self):
+        lock_states = []
+        update_from_file = downloader_backend.StreamHasher.update_from_file
+
+        def locked_update(hasher, file_path, end):
+            lock_states.append(range_downloader._lock.locked())
+            update_from_file(hasher, file_path, end)
+
+        with TemporaryDirectory() as tmp:
+            range_downloader = downloader_backend.RangeDownloader(
+                os.path.join(tmp, "test.zip"), len(self.content), fetch_range=self.fetch_range, chunk_size=64
+            )
+            with open(range_downloader.file_path, "wb") as file:
+                file.truncate(len(self.content))
+
+            # the first range is completed last, the rest of the file is read back without holding the lock
+            with patch("downloader_backend.StreamHasher.update_from_file", locked_update):
+                range_downloader.download_range(64, 1000)
+                range_downloader.download_range(0, 64)
+
+        self.assertEqual(lock_states, [False])
+        self.assertEqual(range_downloader.hasher.position, 1000)
+        self.assertEqual(range_downloader.hasher.hexdigests()["md5"], hashlib.md5(self.content).hexdigest())
+
+    def test_download_interrupted(self):
+        def broken_fetch(start, end):
+            last_byte = end - 1
+            yield self.content[start:last_byte]
+
+        with TemporaryDirectory() as tmp:
+            range_downloader = downloader_backend.RangeDownloader(
+                os.path.join(tmp, "test.zip"), len(self.content), fetch_range=broken_fetch, chunk_size=64
+            )
+            with self.assertRaises(ConnectionError) as err:
+                range_downloader.download()
+
+        self.assertEqual(str(err.exception), "Range 0-64 was interrupted at 63")
+
+    def test_download_resume(self):
+        requested = []
+
+        def failing_fetch(start, end):
+            if start >= 512:
+                raise ConnectionError("Connection lost")
+            yield from self.fetch_range(start, end)
+
+        def counting_fetch(start, end):
+            requested.append(start)
+            yield from self.fetch_range(start, end)
+
+        identity = {"url": "http://server/test.zip", "size": len(self.content), "md5": "abc"}
+        with TemporaryDirectory() as tmp:
+            file_path = os.path.join(tmp, "test.zip")
+            with self.assertRaises(ConnectionError):
+                downloader_backend.RangeDownloader(
+                    file_path,
+                    len(self.content),
+                    fetch_range=failing_fetch,
+                    chunk_size=64,
+                    max_connections=1,
+                    identity=identity,
+                ).download()
+
+            self.assertTrue(os.path.isfile(file_path + downloader_backend.PARTIAL_MANIFEST_SUFFIX))
+
+            range_downloader = downloader_backend.RangeDownloader(
+                file_path, len(self.content), fetch_range=counting_fetch, chunk_size=64, identity=identity
+            )
+            range_downloader.download()
+
+            with open(file_path, "rb") as file:
+                self.assertEqual(file.read(), self.content)
+            self.assertFalse(os.path.isfile(file_path + downloader_backend.PARTIAL_MANIFEST_SUFFIX))
+
+        self.assertEqual(min(requested), 512)
+        self.assertEqual(range_downloader.hasher.hexdigests()["md5"], hashlib.md5(self.content).hexdigest())
+
+    def test_download_striped(self):
+        def broken_fetch(start, end):
+            raise ConnectionError("Connection refused")
+            yield b""
+
+        with TemporaryDirectory() as tmp:
+            file_path = os.path.join(tmp, "test.zip")
+            range_downloader = downloader_backend.RangeDownloader(
+                file_path,
+                len(self.content),
+                fetch_range=self.fetch_range,
+                chunk_size=64,
+                max_connections=2,
+                extra_sources={"Austin": self.fetch_range, "Boulder": broken_fetch},
+            )
+            range_downloader.download()
+
+            with open(file_path, "rb") as file:
+                self.assertEqual(file.read(), self.content)
+
+        sources = {source.name: source for source in range_downloader.sources}
+        self.assertTrue(sources["Boulder"].failed)
+        self.assertEqual(sources["main"].bytes + sources["Austin"].bytes, len(self.content))
+        self.assertGreater(sources["Austin"].bytes, 0)
+
+    @patch("downloader_backend.RANGE_RETRY_DELAY", 0)
+    @patch("downloader_backend.RANGE_TARGET_SECONDS", 0)
+    @patch("downloader_backend.MIN_RANGE_SIZE", 16)
+    def test_download_retry_adaptive(self):
+        requested = []
+
+        def flaky_fetch(start, end):
+            requested.append((start, end))
+            if requested.count((start, end)) == 1 and start == 0:
+                raise ConnectionError("Connection reset by peer")
+            yield from self.fetch_range(start, end)
+
+        with TemporaryDirectory() as tmp:
+            file_path = os.path.join(tmp, "test.zip")
+            range_downloader = downloader_backend.RangeDownloader(
+                file_path,
+                len(self.content),
+                fetch_range=flaky_fetch,
+                chunk_size=64,
+                max_connections=1,
+                range_retries=2,
+            )
+            range_downloader.download()
+
+            with open(file_path, "rb") as file:
+                self.assertEqual(file.read(), self.content)
+
+        self.assertEqual(requested[:3], [(0, 64), (0, 64), (64, 80)])
+        self.assertTrue(all(end - start <= 16 for start, end in requested[2:]))
+
+
+class StreamingExtractorTest(unittest.TestCase):
+    def download_and_extract(self, archive, archive_type, tmp):
+        with open(archive, "rb") as file:
+            content = file.read()
+
+        def fetch_range(start, end):
+            yield content[start:end]
+
+        range_downloader = downloader_backend.RangeDownloader(
+            os.path.join(tmp, f"downloaded.{archive_type}"),
+            len(content),
+            fetch_range=fetch_range,
+            chunk_size=128,
+            max_connections=2,
+            priority_tail=1024,
+        )
+        target_dir = os.path.join(tmp, "unpacked")
+        extractor = downloader_backend.StreamingExtractor(range_downloader, archive_type, target_dir)
+        extractor.start()
+        range_downloader.download()
+        extractor.join()
+
+        self.assertIsNone(extractor.error)
+        self.assertEqual(extractor.extracted, extractor.total)
+        return target_dir
+
+    def test_extract_zip(self):
+        with TemporaryDirectory() as tmp:
+            archive = shutil.make_archive(os.path.join(tmp, "test"), "zip", MOCK_DATA_DIR)
+            target_dir = self.download_and_extract(archive, "zip", tmp)
+            self.assertTrue(os.path.isfile(os.path.join(target_dir, "SilentInstallationTemplate.iss")))
+
+    def test_extract_tgz(self):
+        with TemporaryDirectory() as tmp:
+            archive = os.path.join(tmp, "test.tgz")
+            with tarfile.open(archive, "w:gz") as tar:
+                tar.add(MOCK_DATA_DIR, arcname="mocked_data")
+
+            target_dir = self.download_and_extract(archive, "tgz", tmp)
+            self.assertTrue(os.path.isfile(os.path.join(target_dir, "mocked_data", "product.info")))
+
+
+class BuildCacheTest(unittest.TestCase):
+    def test_fetch_and_store(self):
+        with TemporaryDirectory() as tmp:
+            build_cache = downloader_backend.BuildCache(os.path.join(tmp, "cache"), max_size=25)
+            target_path = os.path.join(tmp, "v221_ElectronicsDesktop.zip")
+            self.assertIsNone(build_cache.fetch("20220101_abc", target_path))
+
+            for key, content in [("20220101_abc", b"a" * 10), ("20220102_def", b"b" * 10)]:
+                with open(target_path, "wb") as file:
+                    file.write(content)
+                build_cache.store(key, target_path, hashes={"md5": key})
+                os.remove(target_path)
+
+            entry = build_cache.fetch("20220101_abc", target_path)
+            self.assertEqual(entry["hashes"], {"md5": "20220101_abc"})
+            with open(target_path, "rb") as file:
+                self.assertEqual(file.read(), b"a" * 10)
+
+            # least recently used build is evicted
+            os.remove(target_path)
+            with open(target_path, "wb") as file:
+                file.write(b"c" * 10)
+            build_cache.store("20220103_ghi", target_path)
+
+            index = build_cache.load_index()
+            self.assertEqual(sorted(index["entries"]), ["20220101_abc", "20220103_ghi"])
+            self.assertFalse(os.path.isfile(os.path.join(tmp, "cache", "20220102_def.zip")))
+            self.assertEqual((index["hits"], index["misses"]), (1, 1))
+
+    def test_concurrent_store(self):
+        with TemporaryDirectory() as tmp:
+            build_cache = downloader_backend.BuildCache(os.path.join(tmp, "cache"), max_size=1000)
+            keys = [f"2022010{index}_abc" for index in range(8)]
+            for key in keys:
+                with open(os.path.join(tmp, f"{key}.zip"), "wb") as file:
+                    file.write(key.encode())
+
+            # runs of other products update index at the same time, no entry is lost
+            threads = [Thread(target=build_cache.store, args=(key, os.path.join(tmp, f"{key}.zip"))) for key in keys]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(sorted(build_cache.load_index()["entries"]), keys)
+
+
+class AdmissionSlotTest(unittest.TestCase):
+    @responses.activate
+    @patch("downloader_backend.time.sleep")
+    def test_acquire(self, sleep):
+        url = "http://admission:8080"
+        responses.add(responses.POST, f"{url}/acquire", status=429, headers={"Retry-After": "30"}, json={})
+        responses.add(responses.POST, f"{url}/acquire", status=200, json={"token": "abc", "lease": 300})
+        responses.add(responses.POST, f"{url}/release", status=200, json={})
+        status = []
+        with downloader_backend.AdmissionSlot(url, "host_v221", "Otterfing", status_func=status.append) as slot:
+            self.assertEqual(slot.token, "abc")
+
+        sleep.assert_called_once_with(30)
+        self.assertEqual(status, ["All download slots of Otterfing are busy. Retry in 30s"])
+        self.assertEqual(json.loads(responses.calls[-1].request.body), {"token": "abc"})
+        self.assertEqual(slot.token, "")
+
+    @responses.activate
+    def test_server_not_available(self):
+        responses.add(
+            responses.POST, "http://admission:8080/acquire", body=downloader_backend.RequestException("refused")
+        )
+        with downloader_backend.AdmissionSlot("http://admission:8080", "host_v221", "Otterfing") as slot:
+            self.assertEqual(slot.token, "")
+
+
+class BandwidthLimiterTest(unittest.TestCase):
+    @patch("downloader_backend.time.sleep")
+    def test_consume(self, sleep):
+        profiles = [{"start": "00:00", "end": "24:00", "rate": 8}]
+        limiter = downloader_backend.BandwidthLimiter(lambda: profiles)
+        limiter.consume(500 * 1000)
+        self.assertEqual(limiter.rate, 1000 * 1000)
+        self.assertAlmostEqual(sleep.call_args[0][0], 0.5, places=2)
+
+        # profiles are reloaded while transfer is running
+        profiles.clear()
+        sleep.reset_mock()
+        limiter._last_reload = 0
+        limiter.consume(500 * 1000)
+        self.assertEqual(limiter.rate, 0)
+        sleep.assert_not_called()
+
+    def test_update_rate(self):
+        limiter = downloader_backend.BandwidthLimiter(
+            lambda: [{"start": "22:00", "end": "06:00", "rate": 0}, {"start": "06:00", "end": "22:00", "rate": 80}]
+        )
+        for hour, rate in [(23, 0), (3, 0), (6, 10 * 1000 * 1000), (21, 10 * 1000 * 1000)]:
+            limiter.update_rate(datetime.datetime(2021, 9, 1, hour, 30).timestamp())
+            self.assertEqual(limiter.rate, rate)
+
+        # hours without leading zero are compared as time, not as strings
+        profiles = [{"start": "9:00", "end": "17:00", "rate": 8}, {"start": "23:00", "end": "1:30", "rate": 16}]
+        limiter = downloader_backend.BandwidthLimiter(lambda: profiles)
+        for hour, minute, rate in [
+            (10, 0, 1000 * 1000),
+            (8, 59, 0),
+            (23, 30, 2 * 1000 * 1000),
+            (1, 0, 2 * 1000 * 1000),
+        ]:
+            limiter.update_rate(datetime.datetime(2021, 9, 1, hour, minute).timestamp())
+            self.assertEqual(limiter.rate, rate)
+
+        # invalid profiles are reported and previous profiles are kept
+        profiles[0]["start"] = "25:00"
+        limiter._last_reload = 0
+        limiter.update_rate(datetime.datetime(2021, 9, 1, 10, 0).timestamp())
+        self.assertEqual(limiter.rate, 1000 * 1000)
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def test_statistics(self):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        pool = downloader_backend.ConnectionPool(4)
+        for _ in range(3):
+            # every session uses connection opened by the first one
+            session = pool.session()
+            session.trust_env = False
+            self.assertEqual(session.get(f"http://127.0.0.1:{server.server_port}/").text, "ok")
+
+        self.assertEqual(pool.statistics(), (3, 1))
+
+
+class MetadataCacheTest(unittest.TestCase):
+    @responses.activate
+    def test_fetch(self):
+        url = "http://ottvmartifact.win.ansys.com:8080/artifactory/api/repositories"
+        responses.add(responses.GET, url=url, status=200, body="[]", headers={"ETag": "abc"})
+        with TemporaryDirectory() as tmp:
+            cache_file = os.path.join(tmp, downloader_backend.METADATA_CACHE_FILE)
+            cache = downloader_backend.MetadataCache(cache_file)
+            session = downloader_backend.requests.Session()
+            self.assertEqual(cache.fetch(session, url, ttl=60), "[]")
+
+            # fresh entry is used without request
+            self.assertEqual(cache.fetch(session, url, ttl=60), "[]")
+            self.assertEqual(len(responses.calls), 1)
+
+            # file is written once per run
+            self.assertFalse(os.path.isfile(cache_file))
+            cache.save()
+
+            # expired entry is revalidated with ETag, cache is shared between runs through the file
+            responses.replace(responses.GET, url=url, status=304)
+            cache = downloader_backend.MetadataCache(cache_file)
+            self.assertEqual(cache.fetch(session, url, ttl=0), "[]")
+            self.assertEqual(responses.calls[1].request.headers["If-None-Match"], "abc")
+
+            responses.add(responses.GET, url=url + "/missing", status=404)
+            self.assertIsNone(cache.fetch(session, url + "/missing", ttl=0, missing_ok=True))
+
+    def test_save_merge(self):
+        with TemporaryDirectory() as tmp:
+            cache_file = os.path.join(tmp, downloader_backend.METADATA_CACHE_FILE)
+            # runs of two products share the file, entries of both are kept
+            first_run = downloader_backend.MetadataCache(cache_file)
+            second_run = downloader_backend.MetadataCache(cache_file)
+            first_run.store("repositories", "[]")
+            second_run.store("build_info", "20210830")
+            second_run.store("repositories", "[{}]")
+            first_run.save()
+            second_run.save()
+
+            cache = downloader_backend.MetadataCache(cache_file)
+            self.assertEqual(cache.get("repositories", ttl=60), "[{}]")
+            self.assertEqual(cache.get("build_info", ttl=60), "20210830")
+
+            # only one process writes the file at a time
+            with downloader_backend.process_lock("metadata_cache", tmp):
+                with self.assertRaises(TimeoutError):
+                    with downloader_backend.process_lock("metadata_cache", tmp, timeout=0):
+                        pass
+
+
+class RunConcurrentlyTest(unittest.TestCase):
+    def test_run_concurrently(self):
+        in_flight = []
+        max_in_flight = []
+
+        def call(value):
+            in_flight.append(value)
+            max_in_flight.append(len(in_flight))
+            time.sleep(0.01)
+            in_flight.remove(value)
+            return value * 2
+
+        results = downloader_backend.run_concurrently([partial(call, i) for i in range(10)], limit=3)
+        self.assertEqual(results, [i * 2 for i in range(10)])
+        self.assertLessEqual(max(max_in_flight), 3)
+        self.assertEqual(downloader_backend.run_concurrently([]), [])
+
+    def test_run_concurrently_in_event_loop(self):
+        async def main():
+            return downloader_backend.run_concurrently([lambda: 1, lambda: 2])
+
+        # calls do not need own event loop, running loop of the caller is not affected
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        self.assertEqual(loop.run_until_complete(main()), [1, 2])
+
+    def test_run_concurrently_error(self):
+        def fail():
+            raise OSError("Not found")
+
+        with self.assertRaises(OSError):
+            downloader_backend.run_concurrently([lambda: 1, fail])
+
+
+class RunPhasesTest(unittest.TestCase):
+    def test_run_phases(self):
+        started = {}
+
+        def phase(name, duration):
+            started[name] = time.time()
+            time.sleep(duration)
+            return name
+
+        results = downloader_backend.run_phases(
+            {
+                "authorize": (partial(phase, "authorize", 0.2), []),
+                "check_installation": (partial(phase, "check_installation", 0.2), []),
+                "get_build_link": (partial(phase, "get_build_link", 0), ["authorize", "check_installation"]),
+            }
+        )
+        self.assertEqual(results["get_build_link"], "get_build_link")
+        # independent phases overlap, dependent phase waits for both of them
+        self.assertLess(abs(started["authorize"] - started["check_installation"]), 0.1)
+        self.assertGreaterEqual(started["get_build_link"] - started["authorize"], 0.19)
+        self.assertEqual(downloader_backend.run_phases({}), {})
+
+    def test_run_phases_error(self):
+        calls = []
+
+        def fail():
+            time.sleep(0.05)
+            raise downloader_backend.DownloaderError("Process is running")
+
+        with self.assertRaises(downloader_backend.DownloaderError):
+            downloader_backend.run_phases(
+                {
+                    "check_installation": (fail, []),
+                    "make_directories": (lambda: calls.append("make_directories"), []),
+                    "get_build_link": (lambda: calls.append("get_build_link"), ["check_installation"]),
+                }
+            )
+        self.assertEqual(calls, ["make_directories"])
+
+        with self.assertRaises(ValueError):
+            downloader_backend.run_phases({"get_build_link": (lambda: None, ["authorize"])})
+
+
+class StreamCopyTest(unittest.TestCase):
+    def setUp(self):
+        self.content = os.urandom(10000)
+
+    @patch("downloader_backend.BUFFER_POOL", downloader_backend.BufferPool(64, 256))
+    def test_copy_stream(self):
+        stream = io.BytesIO(self.content)
+        progress = []
+        hasher = downloader_backend.StreamHasher()
+        with TemporaryDirectory() as tmp:
+            file_path = os.path.join(tmp, "test.zip")
+            with open(file_path, "wb") as file:
+                copied = downloader_backend.copy_stream(
+                    stream.readinto, file, hasher=hasher, progress_func=progress.append, progress_step=1000
+                )
+
+            with open(file_path, "rb") as file:
+                self.assertEqual(file.read(), self.content)
+
+        self.assertEqual(copied, len(self.content))
+        self.assertEqual(hasher.hexdigests()["md5"], hashlib.md5(self.content).hexdigest())
+        self.assertEqual(len(progress), 9)
+        # memory of the pool is limited by the budget, buffers are reused
+        self.assertGreaterEqual(downloader_backend.BUFFER_POOL.available, 0)
+        self.assertLessEqual(len(downloader_backend.BUFFER_POOL._free), 4)
+
+    def test_copy_file_bytes(self):
+        with TemporaryDirectory() as tmp:
+            source_path = os.path.join(tmp, "source")
+            with open(source_path, "wb") as file:
+                file.write(self.content)
+
+            target_path = os.path.join(tmp, "target")
+            with open(source_path, "rb") as source, open(target_path, "wb") as target:
+                source.seek(100)
+                target.write(b"header")
+                downloader_backend.copy_file_bytes(source, target, 5000)
+                target.write(b"footer")
+
+                with self.assertRaises(downloader_backend.DownloaderError):
+                    downloader_backend.copy_file_bytes(source, target, 5000)
+
+            with open(target_path, "rb") as file:
+                self.assertEqual(file.read(5012), b"header" + self.content[100:5100] + b"footer")
+
+
+class ZipDeltaTest(unittest.TestCase):
+    @staticmethod
+    def create_zip(zip_file, members, date_time, extras=None):
+        with zipfile.ZipFile(zip_file, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+            for name, content in members:
+                zip_info = zipfile.ZipInfo(name, date_time=date_time)
+                zip_info.extra = (extras or {}).get(name, b"")
+                zip_ref.writestr(zip_info, content)
+
+        with open(zip_file, "rb") as file:
+            return file.read()
+
+    def test_build(self):
+        unchanged = os.urandom(200000)
+        fetched = []
+
+        def fetch_range(start, end):
+            fetched.append(end - start)
+            yield content[start:end]
+
+        with TemporaryDirectory() as tmp:
+            seed_file = os.path.join(tmp, "seed.zip")
+            self.create_zip(
+                seed_file, [("a.dll", unchanged), ("b.dll", b"old"), ("c.dll", unchanged)], (2022, 1, 1, 0, 0, 0)
+            )
+
+            zip_file = os.path.join(tmp, "test.zip")
+            content = self.create_zip(
+                zip_file,
+                [("a.dll", unchanged), ("b.dll", b"new build"), ("c.dll", unchanged), ("d.dll", b"new file")],
+                (2022, 1, 2, 3, 4, 6),
+            )
+            os.remove(zip_file)
+
+            range_downloader = downloader_backend.RangeDownloader(
+                zip_file, len(content), fetch_range=fetch_range, chunk_size=1000, identity={"size": len(content)}
+            )
+            with patch("downloader_backend.DELTA_TAIL_SIZE", 64):
+                reused = downloader_backend.ZipDelta(range_downloader, seed_file).build()
+            range_downloader.download()
+
+            with open(zip_file, "rb") as file:
+                self.assertEqual(file.read(), content)
+
+        self.assertGreater(reused, 400000)
+        self.assertLess(sum(fetched), 2000)
+        self.assertEqual(range_downloader.hasher.hexdigests()["md5"], hashlib.md5(content).hexdigest())
+
+    def test_build_extra_timestamps(self):
+        unchanged = os.urandom(100000)
+
+        def fetch_range(start, end):
+            yield content[start:end]
+
+        def extended_timestamp(mtime):
+            return b"UT" + struct.pack("<HBL", 5, 1, mtime)
+
+        def ntfs_times(mtime):
+            return b"\x0a\x00" + struct.pack("<H4x2H3Q", 32, 1, 24, mtime, mtime, mtime)
+
+        members = [("a.dll", unchanged), ("b.dll", unchanged), ("c.dll", unchanged)]
+        with TemporaryDirectory() as tmp:
+            seed_file = os.path.join(tmp, "seed.zip")
+            seed_extras = {"a.dll": extended_timestamp(1), "b.dll": extended_timestamp(1), "c.dll": ntfs_times(1)}
+            self.create_zip(seed_file, members, (2022, 1, 1, 0, 0, 0), seed_extras)
+
+            # timestamps in extra fields of b.dll and c.dll changed, their headers cannot be taken from the seed
+            zip_file = os.path.join(tmp, "test.zip")
+            extras = {"a.dll": extended_timestamp(1), "b.dll": extended_timestamp(2), "c.dll": ntfs_times(2)}
+            content = self.create_zip(zip_file, members, (2022, 1, 2, 3, 4, 6), extras)
+            os.remove(zip_file)
+
+            range_downloader = downloader_backend.RangeDownloader(
+                zip_file, len(content), fetch_range=fetch_range, chunk_size=1000, identity={"size": len(content)}
+            )
+            with patch("downloader_backend.DELTA_TAIL_SIZE", 64):
+                reused = downloader_backend.ZipDelta(range_downloader, seed_file).build()
+            range_downloader.download()
+
+            with open(zip_file, "rb") as file:
+                self.assertEqual(file.read(), content)
+
+        self.assertGreater(reused, 100000)
+        self.assertLess(reused, 200000)
+        self.assertEqual(range_downloader.hasher.hexdigests()["md5"], hashlib.md5(content).hexdigest())
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import responses
+
+from docker.proxy import caching_proxy
+
+FILE_URL = "http://ottvmartifact.win.ansys.com:8080/artifactory/v221_EBU_Certified/20210830/winx64.zip"
+
+
+class ParseRangeTest(unittest.TestCase):
+    def test_parse_range(self):
+        self.assertEqual(caching_proxy.parse_range("", 1000), (0, 1000))
+        self.assertEqual(caching_proxy.parse_range("bytes=0-99", 1000), (0, 100))
+        self.assertEqual(caching_proxy.parse_range("bytes=900-", 1000), (900, 1000))
+        self.assertEqual(caching_proxy.parse_range("bytes=-100", 1000), (900, 1000))
+        self.assertEqual(caching_proxy.parse_range("bytes=-2000", 1000), (0, 1000))
+        # end beyond the file is truncated, multiple ranges are not supported and whole file is served
+        self.assertEqual(caching_proxy.parse_range("bytes=500-5000", 1000), (500, 1000))
+        self.assertEqual(caching_proxy.parse_range("bytes=0-1,5-6", 1000), (0, 1000))
+        self.assertEqual(caching_proxy.parse_range("bytes=1000-", 1000), (None, None))
+        self.assertEqual(caching_proxy.parse_range("bytes=10-5", 1000), (None, None))
+
+    def test_get_cache_key(self):
+        checksums = {"X-Checksum-Sha1": "ABC", "X-Checksum-Sha256": "DEF"}
+        self.assertEqual(caching_proxy.get_cache_key(checksums), "sha256_def")
+        self.assertEqual(caching_proxy.get_cache_key({"X-Checksum-Md5": "123"}), "md5_123")
+
+
+class CacheStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.content = os.urandom(3000)
+        self.checksums = {"X-Checksum-Sha256": hashlib.sha256(self.content).hexdigest()}
+        self.key = caching_proxy.get_cache_key(self.checksums)
+        cache_dir = TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.store = caching_proxy.CacheStore(cache_dir.name, 10000)
+
+    def open(self, checksums=None):
+        return self.store.open(self.key, FILE_URL, {}, len(self.content), checksums or self.checksums)
+
+    @responses.activate
+    def test_open(self):
+        responses.add(responses.GET, url=FILE_URL, status=200, body=self.content)
+
+        file, fill = self.open()
+        # concurrent miss joins running download
+        coalesced_file, coalesced_fill = self.open()
+        self.assertIs(coalesced_fill, fill)
+        fill.join()
+        for opened in [file, coalesced_file]:
+            with opened:
+                self.assertEqual(opened.read(), self.content)
+
+        # completed file is removed from running downloads together with the move to the store
+        self.assertEqual(self.store.fills, {})
+        file, fill = self.open()
+        with file:
+            self.assertIsNone(fill)
+            self.assertEqual(file.read(), self.content)
+
+        self.assertEqual(len(responses.calls), 1)
+        status = self.store.get_status()
+        self.assertEqual((status["misses"], status["coalesced"], status["hits"]), (1, 1, 1))
+        self.assertEqual((status["files"], status["size"], status["active_downloads"]), (1, 3000, 0))
+
+    @responses.activate
+    def test_open_failed(self):
+        responses.add(responses.GET, url=FILE_URL, status=200, body=self.content)
+
+        file, fill = self.open({"X-Checksum-Sha256": "0" * 64})
+        fill.join()
+        file.close()
+        with self.assertRaises(caching_proxy.ProxyError):
+            fill.wait_for(len(self.content))
+
+        # failed download is forgotten and its file removed, next client starts a new download
+        self.assertEqual(self.store.fills, {})
+        self.assertFalse(os.path.isfile(fill.path))
+        file, next_fill = self.open()
+        file.close()
+        self.assertIsNot(next_fill, fill)
+        next_fill.join()
+        self.assertTrue(os.path.isfile(self.store.object_path(self.key)))
+
+    def test_release(self):
+        fill = caching_proxy.FileFill(self.store, self.key, FILE_URL, {}, len(self.content), self.checksums)
+        next_fill = caching_proxy.FileFill(self.store, self.key, FILE_URL, {}, len(self.content), self.checksums)
+        self.store.fills[self.key] = next_fill
+
+        # finished fill does not forget newer fill of the same file
+        self.store.release(fill)
+        self.assertIs(self.store.fills[self.key], next_fill)
+        self.store.release(next_fill)
+        self.assertEqual(self.store.fills, {})
+
+    def test_evict(self):
+        for index, name in enumerate(["old", "recent", "new"]):
+            with open(self.store.object_path(name), "wb") as file:
+                file.write(os.urandom(4000))
+            os.utime(self.store.object_path(name), (index, index))
+
+        self.store.evict()
+        self.assertEqual(sorted(os.listdir(self.store.objects_dir)), ["new", "recent"])